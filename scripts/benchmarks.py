@@ -0,0 +1,262 @@
+# Benchmarks of the grid, population, generation & rendering hot paths.
+# Every scenario runs from fixed seeds; results are written as JSON and can
+# be compared against a stored baseline to flag regressions, e.g.
+#   python benchmarks.py --output ../out/baseline.json
+#   python benchmarks.py --compare ../out/baseline.json
+# import_time guards the startup cost of headless simulation workers
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+from typing import Callable, Dict
+
+from ecosystems.generation import probability
+from ecosystems.generation.config import load_config
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.region import Region, get_region_affinities
+from ecosystems.generation.tile import FoodTile
+from ecosystems.simulation.lod import RegionSimulation
+from ecosystems.simulation.population import (CreaturePopulation,
+                                              POPULATION_FIELDS)
+from ecosystems.viz.grid_tile import plot_grid
+from ecosystems.viz.grid_raster import plot_grid_raster
+
+from creature_combiner import generate_taxonomy
+from regional_guidebook import region_food_web
+
+SEED = 420
+# Modules a headless simulation worker should never import
+PLOTTING_MODULES = ("matplotlib", "networkx", "pygraphviz")
+# Scenario name: (function, parameter sets). Functions take the parameters
+# as keyword arguments and return {metric: (value, unit, higher_is_better)}
+SCENARIOS: Dict[str, tuple] = {}
+
+
+def scenario(*params: Dict):
+    def register(function: Callable) -> Callable:
+        SCENARIOS[function.__name__] = (function, params or ({},))
+        return function
+    return register
+
+
+def seed_all(seed=SEED):
+    random.seed(seed)
+    np.random.seed(seed)
+    probability.seed(seed)
+
+
+def best_time(function: Callable, repeat: int) -> float:
+    # Fastest of 'repeat' runs, the least noisy estimate of the cost
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def food_grid(size: int) -> Grid:
+    grid = Grid(size + 1, size + 1, 0., float(size), 0., float(size))
+    grid.init_tiles(tile_type=FoodTile(),
+                    mask=np.random.random(grid.tile_shape) <= 0.1)
+    return grid
+
+
+@scenario({"module": "ecosystems.generation"},
+          {"module": "ecosystems.simulation.island"})
+def import_time(module: str, repeat=5):
+    # Cold import cost in a fresh interpreter, as paid by each new worker
+    # process, and the number of plotting / graph packages it pulls in
+    code = "import sys, time\n"\
+        "start = time.perf_counter()\n"\
+        f"import {module}\n"\
+        "print(time.perf_counter() - start)\n"\
+        f"print(sum(name in sys.modules for name in {PLOTTING_MODULES}))"
+    runs = [subprocess.run([sys.executable, "-c", code], check=True,
+                           capture_output=True, text=True).stdout.split()
+            for _ in range(repeat)]
+    return {"seconds": (min(float(seconds) for seconds, _ in runs), "s",
+                        False),
+            "plotting_modules": (max(int(loaded) for _, loaded in runs), "",
+                                 False)}
+
+
+@scenario({"size": 64}, {"size": 256}, {"size": 1024})
+def grid_construction(size: int, repeat=5):
+    seconds = best_time(lambda: food_grid(size), repeat)
+    return {"seconds": (seconds, "s", False)}
+
+
+@scenario({"size": 64, "points": 100_000}, {"size": 1024, "points": 100_000})
+def nearest_coord_idxs(size: int, points: int, repeat=5):
+    grid = Grid(size + 1, size + 1, 0., float(size), 0., float(size))
+    positions = np.random.uniform(0., size, (points, 2))
+    seconds = best_time(lambda: grid.nearest_coord_idxs(positions), repeat)
+    return {"lookups_per_second": (points / seconds, "1/s", True)}
+
+
+@scenario({"creatures": 1_000}, {"creatures": 10_000})
+def population_tick(creatures: int, ticks=20, repeat=3):
+    # Needs & state updates only
+    def run():
+        population = CreaturePopulation()
+        species = population.add_species(Creature(["Overgrown"], "Cow-like",
+                                                  "Natural"))
+        population.spawn(np.full(creatures, species),
+                         np.random.uniform(0., 100., (creatures, 2)))
+        start = time.perf_counter()
+        for _ in range(ticks):
+            population.step(1.)
+        return time.perf_counter() - start
+
+    seconds = min(run() for _ in range(repeat))
+    population = CreaturePopulation(capacity=creatures)
+    bytes_per_creature = sum(getattr(population, field).nbytes
+                             for field in POPULATION_FIELDS) / creatures
+    return {"creature_ticks_per_second": (creatures * ticks / seconds,
+                                          "1/s", True),
+            "bytes_per_creature": (bytes_per_creature, "B", False)}
+
+
+@scenario({"creatures": 500, "size": 64}, {"creatures": 5_000, "size": 128})
+def region_tick(creatures: int, size: int, ticks=10):
+    # Full agent-mode tick: needs, regrowth, foraging & flocking
+    species = [Creature(["Overgrown"], "Cow-like", "Natural",
+                        creature_name="Prey"),
+               Creature(["Overgrown"], "Canine", "Natural",
+                        creature_name="Hunter")]
+    eats = np.array([[False, False], [True, False]])
+    counts = [0.9 * creatures, 0.1 * creatures]
+    region = RegionSimulation("Benchmark", food_grid(size), species, eats,
+                              counts, on_screen=True, seed=SEED)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        region.step()
+    seconds = time.perf_counter() - start
+    return {"creature_ticks_per_second": (creatures * ticks / seconds,
+                                          "1/s", True),
+            "seconds_per_tick": (seconds / ticks, "s", False)}
+
+
+@scenario({"creatures": 10}, {"creatures": 50})
+def food_web_generation(creatures: int, repeat=3):
+    config = load_config("../res")
+    region = Region("Meadow", "Meadow",
+                    get_region_affinities(config, "Meadow"))
+
+    def run():
+        region_food_web(region, creatures,
+                        ["Cow-like", "Rabbit-like", "Rodent-like"],
+                        ["Lizard-like", "Snake-like", "Feline"],
+                        ["Crocodilian", "Canine"])
+
+    seconds = best_time(run, repeat)
+    return {"webs_per_second": (1. / seconds, "1/s", True)}
+
+
+@scenario({"base": 1, "middle": 2, "final": 8},
+          {"base": 10, "middle": 2, "final": 8})
+def taxonomy_generation(base: int, middle: int, final: int, repeat=3):
+    traits = load_config("../res").traits
+    seconds = best_time(lambda: generate_taxonomy(traits, base, middle,
+                                                  final), repeat)
+    return {"taxonomies_per_second": (1. / seconds, "1/s", True)}
+
+
+@scenario({"size": 16, "raster": False}, {"size": 64, "raster": False},
+          {"size": 64, "raster": True}, {"size": 512, "raster": True})
+def grid_render(size: int, raster: bool, repeat=3):
+    grid = food_grid(size)
+
+    def run():
+        fig, _ = plot_grid_raster(grid) if raster else plot_grid(grid)
+        fig.canvas.draw()
+        plt.close(fig)
+
+    return {"seconds": (best_time(run, repeat), "s", False)}
+
+
+def run_scenarios(selected=None) -> Dict:
+    results = {}
+    for name, (function, params) in SCENARIOS.items():
+        if selected and name not in selected:
+            continue
+        for param in params:
+            seed_all()
+            label = ",".join(f"{key}={value}" for key, value in param.items())
+            key = f"{name}[{label}]"
+            print(key, end=" ", flush=True)
+            metrics = function(**param)
+            for metric, (value, unit, higher_is_better) in metrics.items():
+                results[f"{key}.{metric}"] = {
+                    "value": value, "unit": unit,
+                    "higher_is_better": higher_is_better}
+            print(", ".join(f"{metric}={value:.4g} {unit}" for metric,
+                            (value, unit, _) in metrics.items()))
+    return results
+
+
+def compare(results: Dict, baseline: Dict, threshold: float) -> list:
+    # Metrics that got worse than the baseline by more than 'threshold'
+    # (a fraction), as (key, baseline value, value, relative change)
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        old, new = baseline[key]["value"], result["value"]
+        if old:
+            change = (new - old) / old
+        else:
+            # e.g. a count going up from zero
+            change = np.inf * np.sign(new) if new else 0.
+        worse = -change if result["higher_is_better"] else change
+        print(f"{key}: {old:.4g} -> {new:.4g} ({change:+.1%})"
+              f"{'  REGRESSION' if worse > threshold else ''}")
+        if worse > threshold:
+            regressions.append((key, old, new, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the grid, population, generation & rendering")
+    parser.add_argument("scenarios", nargs="*",
+                        help=f"Scenarios to run, from {list(SCENARIOS)}")
+    parser.add_argument("--output", help="JSON file to write results to")
+    parser.add_argument("--compare", help="Baseline JSON file to compare to")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    results = run_scenarios(args.scenarios)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as outfile:
+            json.dump({
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "seed": SEED,
+                "results": results,
+            }, outfile, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as infile:
+            baseline = json.load(infile)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over "
+                  f"{args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,8 @@ import numpy as np
 import random
 from typing import Dict, List
 
+from ecosystems.generation import probability
+from ecosystems.generation.config import load_config
 from ecosystems.generation.creature import Creature, CreatureChain
 from ecosystems.generation.probability import generate_from_list, generate_potential_pair, weighted_randint
 from ecosystems.viz.pgv_nx import visualize_taxonomy
@@ -17,6 +19,7 @@ from ecosystems.viz.pgv_nx import visualize_taxonomy
 SEED = 420
 random.seed(SEED)
 np.random.seed(SEED)
+probability.seed(SEED)
 
 
 def read_traits_json(json_file: str) -> Dict:
@@ -193,13 +196,16 @@ def generate_taxonomy(traits: Dict, num_base: int, max_middle_branches: int,
 
 
 def main():
-    traits_file = "../res/creature_traits.json"
-    traits_data = read_traits_json(traits_file)
+    traits_data = load_config("../res").traits
 
     # Write out random creatures in chains as potential inspiration
     # building blocks
     # creature_chains = write_random_creature_chains(traits_data, 100,
     #                                                "../out/random_creatures.csv")
+    # Many candidate chains to filter, streamed to file in chunks with
+    # ecosystems.generation.chains.write_chain_csv
+    # write_chain_csv(traits_data, 1_000_000, "../out/candidate_creatures.csv",
+    #                 seed=SEED, num_workers=4)
 
     # Creature taxonomy
     taxonomy = generate_taxonomy(traits_data, 1, 2, 8)
@@ -15,8 +15,6 @@
 # Small discoveries like this will help make the game feel alive, sell the
 # realism, engage the player, and remind them that they are a part of this
 # ecosystem now.
-import json
-
 import matplotlib as mpl
 import matplotlib.colors as colors
 import matplotlib.pyplot as plt
@@ -25,7 +23,9 @@ import numpy as np
 import random
 from typing import Dict, List, Tuple
 
+from ecosystems.generation.config import load_config
 from ecosystems.generation.creature import Creature
+from ecosystems.generation.food_web import FoodWeb
 from ecosystems.generation.region import Region, get_region_affinities, add_region_affinities
 from ecosystems.generation.probability import generate_from_list, generate_potential_pair, weighted_randint
 
@@ -166,9 +166,10 @@ def viz_graph(G: nx.MultiDiGraph, filename: str):
 def region_food_web(region: Region, num_creatures: int,
                     prey_creature_family: List[str],
                     middle_creature_family: List[str],
-                    apex_creature_family: List[str]) -> Tuple[Dict, nx.MultiDiGraph]:
+                    apex_creature_family: List[str]) -> Tuple[Dict, FoodWeb]:
     # Generate creatures based on the region's affinities, then create a
-    # graph showing the predator-prey relations
+    # food web of the predator-prey relations (species IDs in the order
+    # Prey, Middle, Apex)
     # Rules:
     # 30% of creatures are herbivore prey animals
     # 50% of creatures are omnivorous middle-of-the-pack animals
@@ -178,7 +179,7 @@ def region_food_web(region: Region, num_creatures: int,
     num_middle = num_creatures // 2
     num_apex = num_creatures - num_middle - num_prey
     creatures = {"Prey": [], "Middle": [], "Apex": []}
-    food_web = nx.MultiDiGraph()  # predator -> prey
+    edges = []  # predator -> prey
     # Create prey
     for i in range(num_prey):
         affinities = [random.choice(possible_affinities), ""]  # 1 affinity
@@ -186,7 +187,6 @@ def region_food_web(region: Region, num_creatures: int,
         prey_creature = Creature(affinities, family, "Random", f"Prey_{i}")
 
         creatures["Prey"].append(prey_creature)
-        food_web.add_node(prey_creature)
 
     # Create middle
     for i in range(num_middle):
@@ -199,8 +199,7 @@ def region_food_web(region: Region, num_creatures: int,
         hunted_prey = random.sample(creatures["Prey"],
                                     weighted_randint(1, num_prey))
         for j, prey in enumerate(hunted_prey):
-            food_web.add_edge(middle_creature, prey,
-                              hunter=middle_creature.name)  # predator -> prey
+            edges.append((middle_creature, prey))  # predator -> prey
 
             middle_creature.prey.append(prey)
             prey.predators.append(middle_creature)
@@ -218,38 +217,38 @@ def region_food_web(region: Region, num_creatures: int,
             random.sample(creatures["Middle"],
                           random.randint(1, num_middle))
         for j, prey in enumerate(hunted_prey):
-            food_web.add_edge(apex_creature, prey,
-                              hunter=apex_creature.name)  # predator -> prey
+            edges.append((apex_creature, prey))  # predator -> prey
 
             apex_creature.prey.append(prey)
             prey.predators.append(apex_creature)
 
+    species = creatures["Prey"] + creatures["Middle"] + creatures["Apex"]
+    ids = {id(creature): i for i, creature in enumerate(species)}
+    food_web = FoodWeb([creature.name for creature in species],
+                       [(ids[id(predator)], ids[id(prey)])
+                        for predator, prey in edges])
+
     return creatures, food_web
 
 
 def main():
     # Load data
-    with open("../res/region_affinities.json", "r", encoding="utf-8") as infile:
-        region_affinities = json.load(infile)
-
-    with open("../res/creature_traits.json", "r", encoding="utf-8") as infile:
-        creature_traits = json.load(infile)
+    config = load_config("../res")
 
-    island = simple_island_regions(region_affinities)
+    island = simple_island_regions(config)
     # View (just for sanity)
     # visualize_island_regions(island, "../out/simple_island.png")
     # Test with meadow
 
     creatures, food_web = region_food_web(
-        Region("Meadow", "Meadow", get_region_affinities(region_affinities,
-                                                         "Meadow")),
+        Region("Meadow", "Meadow", get_region_affinities(config, "Meadow")),
         10,
         ["Cow-like", "Rabbit-like", "Rodent-like"],
         ["Lizard-like", "Snake-like", "Feline"],
         ["Crocodilian", "Canine"])
 
     # print(creatures)
-    viz_graph(food_web, "../out/meadow_food_web.png")
+    viz_graph(food_web.to_networkx(), "../out/meadow_food_web.png")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+# Simulate every region of the simple island in parallel, with creatures
+# migrating between connected regions. With --port or --socket, the regions
+# keep ticking in the background while serving JSON line queries instead
+import argparse
+import asyncio
+import numpy as np
+import random
+import time
+
+from ecosystems.generation import probability
+from ecosystems.generation.config import load_config
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.tile import FoodTile
+from ecosystems.simulation.island import IslandSimulation, combine_food_webs
+from ecosystems.simulation.lod import RegionSimulation
+from ecosystems.simulation.service import SimulationHost
+
+from regional_guidebook import simple_island_regions, region_food_web
+
+SEED = 420
+random.seed(SEED)
+np.random.seed(SEED)
+probability.seed(SEED)
+
+
+def build_island():
+    island = simple_island_regions(load_config("../res"))
+    regions = list(island.nodes())
+
+    # One food web per region, species names are made unique per region
+    food_webs = []
+    for region in regions:
+        creatures, food_web = region_food_web(
+            region, 10,
+            ["Cow-like", "Rabbit-like", "Rodent-like"],
+            ["Lizard-like", "Snake-like", "Feline"],
+            ["Crocodilian", "Canine"])
+        for creature in creatures["Prey"] + creatures["Middle"] +\
+                creatures["Apex"]:
+            creature.name = f"{region.name}_{creature.name}"
+        food_webs.append((creatures, food_web))
+    species, eats = combine_food_webs(food_webs)
+
+    # Each region starts with only its own species
+    region_sims = {}
+    offset = 0
+    for region, (creatures, _) in zip(regions, food_webs):
+        num_species = len(creatures["Prey"] + creatures["Middle"] +
+                          creatures["Apex"])
+        counts = np.zeros(len(species))
+        counts[offset:offset + num_species] = np.random.randint(
+            5, 50, num_species)
+        offset += num_species
+
+        grid = Grid(51, 51)
+        grid.init_tiles(tile_type=FoodTile(),
+                        mask=np.random.random(grid.tile_shape) <= 0.1)
+        region_sims[region.name] = RegionSimulation(
+            region.name, grid, species, eats, counts, seed=SEED,
+            on_screen=region.name == "Starting Beach")
+    return island, region_sims
+
+
+async def serve(region_sims, port=None, path=None, tick_seconds=0.1):
+    host = SimulationHost(region_sims, tick_seconds=tick_seconds)
+    await host.serve(path=path, port=port or 0)
+    print(f"Serving queries on {host.addresses()}")
+    try:
+        await host.run()
+    finally:
+        await host.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Simulate the simple island's ecosystems")
+    parser.add_argument("--port", type=int,
+                        help="Serve queries on this local TCP port")
+    parser.add_argument("--socket", help="Serve queries on this Unix socket")
+    parser.add_argument("--tick-seconds", type=float, default=0.1,
+                        help="Wall time between ticks when serving")
+    args = parser.parse_args()
+
+    island, region_sims = build_island()
+    if args.port is not None or args.socket is not None:
+        asyncio.run(serve(region_sims, args.port, args.socket,
+                          args.tick_seconds))
+        return
+
+    with IslandSimulation(island, region_sims, migration_rate=0.01) as sim:
+        start = time.perf_counter()
+        for _ in range(100):
+            sim.step()
+        print(f"100 ticks in {time.perf_counter() - start:.2f} s")
+
+    for name, region in sim.regions.items():
+        print(f"{name}: {region.counts().sum():.0f} creatures")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,6 @@ from ecosystems.viz.grid_tile import plot_grid
 
 import matplotlib.pyplot as plt
 import numpy as np
-import random
 
 SEED = 420
 np.random.seed(SEED)
@@ -14,13 +13,9 @@ np.random.seed(SEED)
 def main():
     grid = Grid(10, 20, y_end=200)
     # Randomize food tiles
-    tiles = {}
-    for i in range(len(grid.x)):
-        for j in range(len(grid.y)):
-            if random.random() <= 0.1:
-                tiles[(i, j)] = FoodTile("Food", np.random.randint(5, 15))
-
-    grid.init_tiles(tiles)
+    food_mask = np.random.random(grid.tile_shape) <= 0.1
+    grid.init_tiles(tile_type=FoodTile(), mask=food_mask,
+                    regrowth_time=np.random.randint(5, 15, grid.tile_shape))
 
     # Init creatures
 
@@ -1 +1,8 @@
-from . import generation
+from ecosystems._lazy import lazy_exports
+
+# Subpackages are imported on first access
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    "generation": [],
+    "simulation": [],
+    "viz": [],
+})
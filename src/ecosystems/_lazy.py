@@ -0,0 +1,27 @@
+# Lazy attribute loading for packages, so importing a package doesn't
+# import every submodule (and their plotting / graph dependencies)
+import importlib
+from typing import Dict, List
+
+
+def lazy_exports(package: str, exports: Dict[str, List[str]]):
+    # Module-level (__getattr__, __dir__, __all__) for 'package' that import
+    # the submodule defining a name (exports is {submodule: names}) on first
+    # access. Submodules themselves are also loaded on access
+    owners = {name: submodule for submodule, names in exports.items()
+              for name in names}
+    __all__ = list(owners)
+
+    def __getattr__(name: str):
+        if name in exports:
+            return importlib.import_module(f"{package}.{name}")
+        if name not in owners:
+            raise AttributeError(
+                f"module '{package}' has no attribute '{name}'")
+        module = importlib.import_module(f"{package}.{owners[name]}")
+        return getattr(module, name)
+
+    def __dir__() -> List[str]:
+        return sorted(set(__all__) | set(exports))
+
+    return __getattr__, __dir__, __all__
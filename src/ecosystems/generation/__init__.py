@@ -1,4 +1,21 @@
-from .creature import *
-from .grid import *
-from .region import *
-from .tile import *
+from ecosystems._lazy import lazy_exports
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    "chunked_grid": ["CHUNK_DTYPE", "BLANK_RECORD", "ChunkedLayer",
+                     "ChunkedCoords", "ChunkedGrid"],
+    "chains": ["CHAIN_HEADER", "PROGRESSION_PATHS", "NUM_STAGES",
+               "generate_chain_arrays", "chain_csv_rows", "write_chain_csv"],
+    "config": ["CONFIG_FILES", "CACHE_FILE", "CACHE_VERSION",
+               "TILE_CLASS_NAMES", "ConfigError", "validate_traits",
+               "validate_regions", "validate_tiles", "GameConfig",
+               "load_config"],
+    "creature": ["Creature", "CreatureChain"],
+    "food_web": ["FoodWeb"],
+    "food_web_analytics": ["FoodWebAnalytics", "web_analytics"],
+    "grid": ["TILE_LAYERS", "tile_layer_values", "bulk_layer_values",
+             "TileView", "UniformCoords", "Grid"],
+    "probability": [],
+    "region": ["Region", "add_region_affinities", "get_region_affinities"],
+    "tile": ["Tile", "BlankTile", "FoodTile", "WaterTile", "RockTile",
+             "TILE_CLASSES"],
+})
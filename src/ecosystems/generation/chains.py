@@ -0,0 +1,143 @@
+# Batch generation of 3-stage creature evolution chains as arrays, streamed
+# to CSV in fixed-size chunks
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from typing import Dict
+
+from ecosystems.generation.probability import Sampler
+
+
+CHAIN_HEADER = "CreatureName,Family1,Family2,affinity1,affinity2,"\
+    "ProgressionPath,EvolvesFrom\n"
+PROGRESSION_PATHS = ["Natural", "Robotic", "Mixed"]
+NUM_STAGES = 3
+
+
+def _other(rng: np.random.Generator, excluded: np.ndarray,
+           n: int) -> np.ndarray:
+    # Uniform index in 0..n-1 that differs from 'excluded'
+    draw = rng.integers(0, n - 1, len(excluded))
+    return draw + (draw >= excluded)
+
+
+def _secondary(rng: np.random.Generator, primary: np.ndarray, n: int,
+               chance: float, base_chance: float) -> np.ndarray:
+    # Secondary index per stage (N, 3), -1 for none. The base stage gets
+    # one with 'base_chance', later stages keep it or, if empty, get one
+    # with 'chance'. Never equal to the primary
+    secondary = np.full((len(primary), NUM_STAGES), -1, dtype=np.int32)
+    if n < 2:
+        return secondary
+    secondary[:, 0] = np.where(rng.random(len(primary)) <= base_chance,
+                               _other(rng, primary, n), -1)
+    for stage in range(1, NUM_STAGES):
+        previous = secondary[:, stage - 1]
+        pick = (previous < 0) & (rng.random(len(primary)) <= chance)
+        secondary[:, stage] = np.where(pick, _other(rng, primary, n),
+                                       previous)
+
+    return secondary
+
+
+def generate_chain_arrays(traits: Dict, num_chains: int, sampler: Sampler,
+                          secondary_affinity_chance=0.5,
+                          secondary_family_chance=0.5) -> Dict[str, np.ndarray]:
+    # Draw 'num_chains' chains with the rules of create_evolution_chain as
+    # index arrays into traits["affinity"], traits["family"] and
+    # PROGRESSION_PATHS. Primaries and paths are (N,), secondaries are
+    # (N, 3) per stage with -1 for none. Base creatures have one family
+    rng = sampler.rng
+    num_affinities = len(traits["affinity"])
+    num_families = len(traits["family"])
+    affinity1 = rng.integers(0, num_affinities, num_chains)
+    family1 = rng.integers(0, num_families, num_chains)
+
+    return {
+        "affinity1": affinity1,
+        "affinity2": _secondary(rng, affinity1, num_affinities,
+                                secondary_affinity_chance,
+                                secondary_affinity_chance),
+        "family1": family1,
+        "family2": _secondary(rng, family1, num_families,
+                              secondary_family_chance, 0.),
+        "progression_path": rng.integers(0, len(PROGRESSION_PATHS),
+                                         num_chains),
+    }
+
+
+def chain_csv_rows(traits: Dict, chains: Dict[str, np.ndarray],
+                   first_chain=0) -> str:
+    # CSV rows (3 per chain, see CHAIN_HEADER) for 'chains' from
+    # generate_chain_arrays(), numbered from 'first_chain'
+    affinities = np.array(traits["affinity"] + [""])
+    families = np.array(traits["family"] + [""])
+    paths = np.array(PROGRESSION_PATHS)
+    num_chains = len(chains["affinity1"])
+    ids = np.arange(first_chain, first_chain + num_chains).astype(str)
+
+    columns = []
+    for stage in range(NUM_STAGES):
+        name = np.char.add(ids, f"_{stage + 1}")
+        evolves_from = np.char.add(ids, f"_{stage}") if stage else\
+            np.full(num_chains, "")
+        columns.append([
+            name,
+            families[chains["family1"]],
+            families[chains["family2"][:, stage]],
+            affinities[chains["affinity1"]],
+            affinities[chains["affinity2"][:, stage]],
+            paths[chains["progression_path"]],
+            evolves_from,
+        ])
+
+    # Interleave stages so each chain's rows are together
+    rows = []
+    for stage_columns in columns:
+        row = stage_columns[0]
+        for column in stage_columns[1:]:
+            row = np.char.add(np.char.add(row, ","), column)
+        rows.append(row)
+    rows = np.stack(rows, axis=1).ravel()
+    return "\n".join(rows.tolist()) + "\n" if num_chains else ""
+
+
+def _chain_chunk(traits: Dict, seed, chunk: int, first_chain: int,
+                 num_chains: int, secondary_affinity_chance: float,
+                 secondary_family_chance: float) -> str:
+    # CSV text of one chunk, each chunk has its own random stream so the
+    # output doesn't depend on the number of workers
+    sampler = Sampler(seed).spawn(f"chains/{chunk}")
+    chains = generate_chain_arrays(traits, num_chains, sampler,
+                                   secondary_affinity_chance,
+                                   secondary_family_chance)
+    return chain_csv_rows(traits, chains, first_chain)
+
+
+def write_chain_csv(traits: Dict, num_chains: int, output_file: str,
+                    chunk_size=100_000, seed=None, num_workers=0,
+                    secondary_affinity_chance=0.5,
+                    secondary_family_chance=0.5):
+    # Generate 'num_chains' chains and stream them to 'output_file' one
+    # chunk at a time, so memory stays bounded by 'chunk_size'. With
+    # 'num_workers' > 0, chunks are generated in worker processes (at most
+    # two per worker in flight) and still written in order
+    chunks = [(k, first, min(chunk_size, num_chains - first))
+              for k, first in enumerate(range(0, num_chains, chunk_size))]
+    args = (secondary_affinity_chance, secondary_family_chance)
+
+    with open(output_file, "w", encoding="utf-8") as outfile:
+        outfile.write(CHAIN_HEADER)
+        if not num_workers:
+            for chunk in chunks:
+                outfile.write(_chain_chunk(traits, seed, *chunk, *args))
+            return
+
+        with ProcessPoolExecutor(num_workers) as executor:
+            pending = []
+            for chunk in chunks:
+                pending.append(executor.submit(_chain_chunk, traits, seed,
+                                               *chunk, *args))
+                if len(pending) >= 2 * num_workers:
+                    outfile.write(pending.pop(0).result())
+            for future in pending:
+                outfile.write(future.result())
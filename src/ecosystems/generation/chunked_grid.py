@@ -0,0 +1,344 @@
+# Sparse world grid split into fixed-size square chunks, so maps can grow far
+# beyond what a dense Grid fits in memory. Chunks are allocated on first
+# write, blank chunks are never stored, and the least recently used chunks
+# are paged out to a memory-mapped backing file
+from collections import OrderedDict
+import numpy as np
+import os
+import tempfile
+from typing import Dict, Iterator, Tuple
+import weakref
+
+from ecosystems.generation.grid import (bulk_layer_values, Grid, TileView,
+                                        TILE_LAYERS, UniformCoords)
+
+
+# One record per tile holding every tile layer, so a chunk pages in & out
+# as a single block
+CHUNK_DTYPE = np.dtype([(name, dtype)
+                        for name, (dtype, _) in TILE_LAYERS.items()])
+BLANK_RECORD = np.array(tuple(blank for _, blank in TILE_LAYERS.values()),
+                        dtype=CHUNK_DTYPE)
+
+
+def _remove_file(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class ChunkedLayer:
+    # Array-like view of one tile layer of a ChunkedGrid, indexed like the
+    # dense layers as [i, j] with ints, integer arrays (broadcast together)
+    # or slices (combined as an outer product). Reads return dense copies
+    def __init__(self, grid: "ChunkedGrid", name: str) -> None:
+        self.grid = grid
+        self.name = name
+        self.dtype = CHUNK_DTYPE[name]
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.grid.tile_shape
+
+    def _indices(self, key) -> Tuple[np.ndarray, np.ndarray]:
+        i, j = key
+        nx, ny = self.grid.tile_shape
+        if isinstance(i, slice) and isinstance(j, slice):
+            return (np.arange(nx)[i][:, None], np.arange(ny)[j][None, :])
+        i = np.arange(nx)[i] if isinstance(i, slice) else np.asarray(i)
+        j = np.arange(ny)[j] if isinstance(j, slice) else np.asarray(j)
+        i = np.where(i < 0, i + nx, i)
+        j = np.where(j < 0, j + ny, j)
+        if ((i < 0) | (i >= nx)).any() or ((j < 0) | (j >= ny)).any():
+            raise IndexError(f"Tile index {key} out of bounds for "
+                             f"{self.grid.tile_shape}")
+        return i, j
+
+    def __getitem__(self, key) -> np.ndarray:
+        values = self.grid._gather(self.name, *self._indices(key))
+        return values[()] if values.ndim == 0 else values
+
+    def __setitem__(self, key, value):
+        self.grid._scatter(self.name, *self._indices(key), value)
+
+
+class ChunkedCoords:
+    # Array-like view of a ChunkedGrid's coordinates, reading like the dense
+    # Grid.coords array of shape (num_x, num_y, 2) without allocating it:
+    # 'coords[i, j]' takes the same keys as ChunkedLayer and returns the
+    # (..., 2) coordinates of just those points
+    def __init__(self, grid: "ChunkedGrid") -> None:
+        self.grid = grid
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return len(self.grid.x), len(self.grid.y), 2
+
+    def __getitem__(self, key) -> np.ndarray:
+        i, j = key if isinstance(key, tuple) else (key, slice(None))
+        x, y = self.grid.x[i], self.grid.y[j]
+        if isinstance(i, slice) and isinstance(j, slice):
+            x, y = x[:, None], y[None, :]
+        x, y = np.broadcast_arrays(x, y)
+        return np.stack([x, y], axis=-1)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        # Materializes every coordinate, only sensible for small grids
+        return np.asarray(self[:, :], dtype=dtype)
+
+
+class ChunkedGrid(UniformCoords):
+    # Same coordinates and tile queries as Grid (x, y, coords, tile_idxs,
+    # nearest_coord, is_passable, tile_data, 'layer[i, j]' reads & writes)
+    # over 'chunk_size' x 'chunk_size' chunks of tiles. Tiles in chunks that
+    # were never written read as blank. At most 'max_resident' chunks are
+    # kept in memory, the least recently used ones being written to the
+    # 'backing_path' file (a temporary file removed on close() by default)
+    # and read back through its memory map when touched again. The backing
+    # file is scratch space, save worlds with checkpoint snapshots of dense
+    # windows
+    def __init__(self, num_x: int, num_y: int,
+                 x_start=0., x_end=100., y_start=0., y_end=100.,
+                 chunk_size=64, max_resident=256,
+                 backing_path: str = None) -> None:
+        super().__init__(num_x, num_y, x_start, x_end, y_start, y_end)
+        self.chunk_size = chunk_size
+        self.max_resident = max(max_resident, 1)
+        self.chunk_counts = tuple(-(-n // chunk_size)
+                                  for n in self.tile_shape)
+        for name in TILE_LAYERS:
+            setattr(self, name, ChunkedLayer(self, name))
+        self.coords = ChunkedCoords(self)
+        self._tile_view = TileView(self)
+
+        # Chunk key (flat chunk index): chunk records, in LRU order
+        self._resident: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        # Resident chunks changed since they were last written out
+        self._dirty = set()
+        # Chunk key: slot in the backing file
+        self._slots: Dict[int, int] = {}
+        self._free_slots = []
+        self._backing = None
+        self._temporary = backing_path is None
+        if self._temporary:
+            handle, backing_path = tempfile.mkstemp(suffix=".chunks")
+            os.close(handle)
+        self.backing_path = backing_path
+        self._finalizer = weakref.finalize(
+            self, _remove_file, backing_path) if self._temporary else None
+
+    @property
+    def tile_data(self) -> TileView:
+        return self._tile_view
+
+    @property
+    def chunks_allocated(self) -> int:
+        return len(self._slots.keys() | self._resident.keys())
+
+    @property
+    def resident_chunks(self) -> int:
+        return len(self._resident)
+
+    @property
+    def resident_nbytes(self) -> int:
+        return len(self._resident) * self.chunk_size**2 * CHUNK_DTYPE.itemsize
+
+    def chunk_origin(self, key: int) -> Tuple[int, int]:
+        # Tile indices of the first tile of chunk 'key'
+        ci, cj = divmod(key, self.chunk_counts[1])
+        return ci * self.chunk_size, cj * self.chunk_size
+
+    # Paging
+
+    def _chunk(self, key: int, create=False) -> np.ndarray:
+        # Records of chunk 'key', paged in if needed. None for a blank chunk
+        # unless 'create'
+        chunk = self._resident.get(key)
+        if chunk is not None:
+            self._resident.move_to_end(key)
+            return chunk
+        slot = self._slots.get(key)
+        if slot is not None:
+            chunk = np.array(self._backing[slot])
+        elif create:
+            chunk = np.full((self.chunk_size, self.chunk_size), BLANK_RECORD)
+            self._dirty.add(key)
+        else:
+            return None
+        self._resident[key] = chunk
+        self._evict(self.max_resident)
+        return chunk
+
+    def _evict(self, max_resident: int):
+        # Page out least recently used chunks down to 'max_resident'. Chunks
+        # that went back to all blank are dropped instead
+        while len(self._resident) > max_resident:
+            key, chunk = self._resident.popitem(last=False)
+            if key not in self._dirty:
+                continue
+            self._dirty.discard(key)
+            if (chunk == BLANK_RECORD).all():
+                if key in self._slots:
+                    self._free_slots.append(self._slots.pop(key))
+                continue
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._new_slot()
+                self._slots[key] = slot
+            self._backing[slot] = chunk
+
+    def _new_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        slot = len(self._slots)
+        capacity = 0 if self._backing is None else len(self._backing)
+        if slot >= capacity:
+            # Double the file, r+ extends it on remapping
+            if self._backing is not None:
+                self._backing.flush()
+            self._backing = np.memmap(
+                self.backing_path, dtype=CHUNK_DTYPE,
+                mode="w+" if self._backing is None else "r+",
+                shape=(max(2 * capacity, 16), self.chunk_size,
+                       self.chunk_size))
+        return slot
+
+    def flush(self):
+        # Write every changed resident chunk to the backing file, keeping it
+        # resident
+        resident = list(self._resident.items())
+        self._evict(0)
+        for key, chunk in resident:
+            if key in self._slots:
+                self._resident[key] = chunk
+        if self._backing is not None:
+            self._backing.flush()
+
+    def close(self):
+        # Drop every chunk and release the backing file
+        self._resident.clear()
+        self._dirty.clear()
+        self._slots.clear()
+        self._free_slots.clear()
+        self._backing = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Vectorised layer access
+
+    def _groups(self, i: np.ndarray,
+                j: np.ndarray) -> Iterator[Tuple[int, np.ndarray]]:
+        # (chunk key, positions in the flat 'i' & 'j' in that chunk)
+        keys = (i // self.chunk_size) * self.chunk_counts[1] +\
+            j // self.chunk_size
+        if not len(keys):
+            return
+        if (keys == keys[0]).all():
+            yield int(keys[0]), slice(None)
+            return
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        for start, stop in zip(starts, np.r_[starts[1:], len(keys)]):
+            yield int(keys[start]), order[start:stop]
+
+    def _gather(self, name: str, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        i, j = np.broadcast_arrays(i, j)
+        shape = i.shape
+        i, j = i.ravel(), j.ravel()
+        values = np.empty(len(i), dtype=CHUNK_DTYPE[name])
+        size = self.chunk_size
+        for key, members in self._groups(i, j):
+            chunk = self._chunk(key)
+            if chunk is None:
+                values[members] = BLANK_RECORD[name]
+            else:
+                values[members] = chunk[name][i[members] % size,
+                                              j[members] % size]
+        return values.reshape(shape)
+
+    def _scatter(self, name: str, i: np.ndarray, j: np.ndarray, value):
+        value = np.asarray(value)
+        i, j, value = np.broadcast_arrays(i, j, value)
+        i, j, value = i.ravel(), j.ravel(), value.ravel()
+        size = self.chunk_size
+        for key, members in self._groups(i, j):
+            chunk = self._chunk(key, create=True)
+            chunk[name][i[members] % size, j[members] % size] = value[members]
+            self._dirty.add(key)
+
+    def init_tiles(self, tiles: Dict = None, tile_type=None, mask=None,
+                   origin=(0, 0), **layers):
+        # Set up tiles like Grid.init_tiles, except a bulk 'mask' covers the
+        # window starting at tile 'origin' (array values have the mask's
+        # shape) so the world never needs a dense mask. Without a mask, the
+        # scalar values fill the whole world, allocating every chunk
+        if tiles is not None:
+            nx, ny = self.tile_shape
+            for (i, j), tile in tiles.items():
+                # Ignore tiles on the upper edges (no cell there)
+                if i < nx and j < ny:
+                    self.tile_data[(i, j)] = tile
+
+        values = bulk_layer_values(tile_type, layers)
+        if not values:
+            return
+        if mask is None:
+            for key in range(self.chunk_counts[0] * self.chunk_counts[1]):
+                chunk = self._chunk(key, create=True)
+                for name, value in values.items():
+                    chunk[name] = value
+                self._dirty.add(key)
+            return
+
+        mask = np.asarray(mask, dtype=bool)
+        i, j = np.nonzero(mask)
+        for name, value in values.items():
+            value = np.asarray(value)
+            if value.shape == mask.shape:
+                value = value[mask]
+            self._scatter(name, i + origin[0], j + origin[1], value)
+
+    def chunks(self) -> Iterator[Tuple[Tuple[int, int], np.ndarray]]:
+        # (origin tile indices, records) of every allocated chunk. Chunks
+        # extend past the world on the upper edges
+        for key in sorted(self._slots.keys() | self._resident.keys()):
+            yield self.chunk_origin(key), self._chunk(key)
+
+    def tile_mask(self, tile_class, window=None) -> np.ndarray:
+        # Boolean mask of the tiles of type 'tile_class' within 'window'
+        # ((slice, slice) of tiles), the whole (dense) world by default
+        window = window or (slice(None), slice(None))
+        return self.tile_type[window] == tile_class.code
+
+    def find_tiles(self, tile_class) -> np.ndarray:
+        # (N, 2) indices of the tiles of type 'tile_class', only scanning
+        # allocated chunks (blank tiles aren't listed)
+        found = [np.empty((0, 2), dtype=np.intp)]
+        for origin, chunk in self.chunks():
+            idxs = np.argwhere(chunk["tile_type"] == tile_class.code)
+            idxs += origin
+            found.append(idxs[(idxs < self.tile_shape).all(axis=1)])
+        return np.concatenate(found)
+
+    def to_grid(self, origin: Tuple[int, int],
+                shape: Tuple[int, int]) -> Grid:
+        # Dense Grid copy of the 'shape' tiles from 'origin', with matching
+        # coordinates, e.g. to run a RegionSimulation over part of the world
+        (i0, j0), (nx, ny) = origin, shape
+        window = (slice(i0, i0 + nx), slice(j0, j0 + ny))
+        return Grid.from_layers(
+            self.x[i0:i0 + nx + 1], self.y[j0:j0 + ny + 1],
+            {name: getattr(self, name)[window] for name in TILE_LAYERS})
+
+    def write_grid(self, grid: Grid, origin: Tuple[int, int]):
+        # Copy the layers of a dense 'grid' back in from tile 'origin'
+        (i0, j0), (nx, ny) = origin, grid.tile_shape
+        window = (slice(i0, i0 + nx), slice(j0, j0 + ny))
+        for name in TILE_LAYERS:
+            getattr(self, name)[window] = getattr(grid, name)
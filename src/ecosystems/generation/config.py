@@ -0,0 +1,245 @@
+# Game config files (creature traits, region affinities, tile definitions)
+# validated once and compiled into an indexed cache next to the files
+import hashlib
+import json
+import numpy as np
+import os
+from typing import Dict, List
+import zipfile
+
+from ecosystems.generation.tile import Tile, TILE_CLASSES
+
+
+CONFIG_FILES = {
+    "traits": "creature_traits.json",
+    "regions": "region_affinities.json",
+    "tiles": "tile_definitions.json",
+}
+CACHE_FILE = "config_cache.npz"
+CACHE_VERSION = 1
+# Tile class name: Tile class
+TILE_CLASS_NAMES = {cls.__name__: cls for cls in TILE_CLASSES.values()}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def _unique_names(names: List, what: str, source: str) -> List[str]:
+    if not isinstance(names, list) or\
+            not all(isinstance(name, str) and name for name in names):
+        raise ConfigError(f"{source}: '{what}' must be a list of names")
+    if len(set(names)) != len(names):
+        raise ConfigError(f"{source}: duplicate names in '{what}'")
+    return names
+
+
+def _entries(data: Dict, what: str, source: str) -> List[Dict]:
+    # The list of objects under 'what' in a config file
+    entries = data.get(what) if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise ConfigError(f"{source}: missing '{what}' list")
+    if not all(isinstance(entry, dict) for entry in entries):
+        raise ConfigError(f"{source}: every '{what}' entry must be an object")
+    return entries
+
+
+def validate_traits(data: Dict, source="traits") -> Dict:
+    for key in ("affinity", "family"):
+        if key not in data:
+            raise ConfigError(f"{source}: missing '{key}' list")
+        _unique_names(data[key], key, source)
+    if len(data["affinity"]) > 64:
+        raise ConfigError(f"{source}: at most 64 affinities are supported")
+    return data
+
+
+def validate_regions(data: Dict, affinities: List[str],
+                     source="regions") -> Dict:
+    regions = _entries(data, "region", source)
+    _unique_names([region.get("name") for region in regions], "region",
+                  source)
+    known = set(affinities)
+    for region in regions:
+        if not isinstance(region.get("affinities"), list):
+            raise ConfigError(f"{source}: region '{region['name']}' is "
+                              f"missing its 'affinities' list")
+        unknown = set(region["affinities"]) - known
+        if unknown:
+            raise ConfigError(f"{source}: region '{region['name']}' has "
+                              f"unknown affinities {sorted(unknown)}")
+    return data
+
+
+def validate_tiles(data: Dict, source="tiles") -> Dict:
+    tiles = _entries(data, "tile", source)
+    _unique_names([tile.get("name") for tile in tiles], "tile", source)
+    for tile in tiles:
+        tile_class = TILE_CLASS_NAMES.get(tile.get("class"))
+        if tile_class is None:
+            raise ConfigError(f"{source}: tile '{tile['name']}' has unknown "
+                              f"class '{tile.get('class')}'")
+        unknown = set(tile) - {"name", "class"} - set(tile_class.layers)
+        if unknown:
+            raise ConfigError(f"{source}: tile '{tile['name']}' has unknown "
+                              f"attributes {sorted(unknown)}")
+    return data
+
+
+class GameConfig:
+    # Indexed config: names get integer IDs (their index in 'affinities',
+    # 'families', 'regions' & 'tiles') and each region's affinities are a
+    # bitmask over affinity IDs. Lookups are dictionary / array indexing
+    def __init__(self, affinities: List[str], families: List[str],
+                 regions: List[str], region_masks: np.ndarray,
+                 tiles: List[Dict]) -> None:
+        self.affinities = list(affinities)
+        self.families = list(families)
+        self.regions = list(regions)
+        self.region_masks = np.asarray(region_masks, dtype=np.uint64)
+        self.tiles = list(tiles)
+
+        self.affinity_ids = {name: i for i, name in enumerate(self.affinities)}
+        self.family_ids = {name: i for i, name in enumerate(self.families)}
+        self.region_ids = {name: i for i, name in enumerate(self.regions)}
+        self.tile_ids = {tile["name"]: i for i, tile in enumerate(self.tiles)}
+        # Region: affinity names, in affinity ID order
+        self._region_affinities = {
+            name: self.mask_affinities(mask)
+            for name, mask in zip(self.regions, self.region_masks.tolist())}
+
+    @classmethod
+    def compile(cls, traits: Dict, regions: Dict, tiles: Dict) -> "GameConfig":
+        # From the parsed config files, validating them
+        validate_traits(traits)
+        validate_regions(regions, traits["affinity"])
+        validate_tiles(tiles)
+        affinity_ids = {name: i for i, name in enumerate(traits["affinity"])}
+        masks = [sum(1 << affinity_ids[affinity]
+                     for affinity in set(region["affinities"]))
+                 for region in regions["region"]]
+        return cls(traits["affinity"], traits["family"],
+                   [region["name"] for region in regions["region"]],
+                   np.array(masks, dtype=np.uint64), tiles["tile"])
+
+    @property
+    def traits(self) -> Dict:
+        # In the format of creature_traits.json
+        return {"affinity": self.affinities, "family": self.families}
+
+    def affinity_mask(self, affinities: List[str]) -> int:
+        mask = 0
+        for affinity in affinities:
+            mask |= 1 << self.affinity_ids[affinity]
+        return mask
+
+    def mask_affinities(self, mask: int) -> List[str]:
+        return [name for i, name in enumerate(self.affinities)
+                if int(mask) >> i & 1]
+
+    def region_mask(self, region: str) -> int:
+        return int(self.region_masks[self.region_ids[region]])
+
+    def region_affinities(self, region: str) -> List[str]:
+        return list(self._region_affinities[region])
+
+    def regions_with(self, affinities: List[str]) -> np.ndarray:
+        # Boolean mask over 'regions' that have all of 'affinities'
+        mask = np.uint64(self.affinity_mask(affinities))
+        return (self.region_masks & mask) == mask
+
+    def tile(self, name: str) -> Tile:
+        # New Tile instance from the definition called 'name'
+        definition = dict(self.tiles[self.tile_ids[name]])
+        tile_class = TILE_CLASS_NAMES[definition.pop("class")]
+        return tile_class(**definition)
+
+
+def _file_stamp(path: str) -> Dict:
+    stat = os.stat(path)
+    return {"mtime": stat.st_mtime_ns, "size": stat.st_size}
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as infile:
+        return hashlib.sha1(infile.read()).hexdigest()
+
+
+def _read_cache(cache_path: str, paths: Dict[str, str]):
+    # (GameConfig, stale) from the cache, or (None, True) if the files
+    # changed. Only hashes the files if their mtime or size changed
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            header = json.loads(str(cache["header"]))
+            if header["version"] != CACHE_VERSION:
+                return None, True
+            stale = False
+            for key, path in paths.items():
+                stamp = header["files"][key]
+                if _file_stamp(path) != stamp["stamp"]:
+                    if _file_hash(path) != stamp["hash"]:
+                        return None, True
+                    stale = True
+            config = GameConfig(cache["affinities"].tolist(),
+                                cache["families"].tolist(),
+                                cache["regions"].tolist(),
+                                cache["region_masks"], header["tiles"])
+    except (OSError, KeyError, ValueError, EOFError, zipfile.BadZipFile):
+        # Missing, truncated or foreign cache, rebuilt by the caller
+        return None, True
+    return config, stale
+
+
+def _write_cache(cache_path: str, paths: Dict[str, str], config: GameConfig):
+    header = {
+        "version": CACHE_VERSION,
+        "files": {key: {"stamp": _file_stamp(path), "hash": _file_hash(path)}
+                  for key, path in paths.items()},
+        "tiles": config.tiles,
+    }
+    # Written to a temporary file first so readers never see half a cache
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as outfile:
+        np.savez(outfile, header=np.array(json.dumps(header)),
+                 affinities=np.array(config.affinities, dtype=str),
+                 families=np.array(config.families, dtype=str),
+                 regions=np.array(config.regions, dtype=str),
+                 region_masks=config.region_masks)
+    os.replace(temp_path, cache_path)
+
+
+# Directory: (file stamps when loaded, GameConfig)
+_configs = {}
+
+
+def load_config(res_dir="../res", use_cache=True) -> GameConfig:
+    # Load the config files in 'res_dir' from the compiled cache, recompiling
+    # (and rewriting the cache) when a file's contents changed. Memoized per
+    # directory within a process until a file's mtime or size changes, the
+    # compiled cache then checks the contents
+    res_dir = os.path.abspath(res_dir)
+    paths = {key: os.path.join(res_dir, filename)
+             for key, filename in CONFIG_FILES.items()}
+    cache_path = os.path.join(res_dir, CACHE_FILE)
+    # Stamped before reading so a file changing mid-load isn't missed
+    stamps = {key: _file_stamp(path) for key, path in paths.items()}
+    if use_cache and res_dir in _configs:
+        memo_stamps, config = _configs[res_dir]
+        if memo_stamps == stamps:
+            return config
+
+    config = None
+    stale = True
+    if use_cache:
+        config, stale = _read_cache(cache_path, paths)
+    if config is None:
+        data = {}
+        for key, path in paths.items():
+            with open(path, "r", encoding="utf-8") as infile:
+                data[key] = json.load(infile)
+        config = GameConfig.compile(data["traits"], data["regions"],
+                                    data["tiles"])
+    if stale:
+        _write_cache(cache_path, paths, config)
+    _configs[res_dir] = (stamps, config)
+    return config
@@ -4,15 +4,17 @@ from typing import List
 class Creature:
     def __init__(self, affinities: List[str], family: str,
                  progression_path: str, creature_name="",
-                 predators=[], prey=[],
+                 predators=None, prey=None,
                  speed=1, health=100, energy=100, energy_recovery=1) -> None:
         self.affinities = affinities
         self.family = family
         self.progression_path = progression_path
         self.name = creature_name
 
-        self.predators = predators
-        self.prey = prey
+        # Fresh lists per creature, a shared default list would collect
+        # every creature's predators/prey
+        self.predators = predators if predators is not None else []
+        self.prey = prey if prey is not None else []
 
         # Needs, all go from [0, 100]
         self.hunger = 100
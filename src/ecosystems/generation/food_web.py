@@ -0,0 +1,123 @@
+# Compact predator -> prey food web over integer species IDs
+import numpy as np
+from typing import List, Tuple
+
+
+class FoodWeb:
+    # Species get integer IDs (their index in 'names') and predator -> prey
+    # edges are stored in CSR form: the prey of species 'i' are
+    # indices[indptr[i]:indptr[i + 1]]. A reverse CSR (rindptr, rindices)
+    # gives the predators of each species. Duplicate edges are merged.
+    # 'listeners' are called with (predator, prey, added) on edge changes
+    def __init__(self, names: List[str], edges=()) -> None:
+        self.names = list(names)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        if len(self.ids) != len(self.names):
+            raise ValueError("Species names must be unique")
+        self.version = 0
+        self.listeners = []
+        edges = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+        self._build(edges[:, 0], edges[:, 1])
+
+    def _build(self, predators: np.ndarray, prey: np.ndarray):
+        # (Re)build both CSR indices from edge arrays
+        n = self.num_species
+        if len(predators) and (predators.max() >= n or prey.max() >= n):
+            raise ValueError("Edge refers to an unknown species")
+        keys = np.unique(predators * n + prey)
+        self.predators, self.prey = keys // n, keys % n
+
+        self.indptr = np.zeros(n + 1, dtype=np.intp)
+        np.cumsum(np.bincount(self.predators, minlength=n),
+                  out=self.indptr[1:])
+        self.indices = self.prey.copy()  # keys are sorted by predator
+
+        order = np.lexsort((self.predators, self.prey))
+        self.rindptr = np.zeros(n + 1, dtype=np.intp)
+        np.cumsum(np.bincount(self.prey, minlength=n), out=self.rindptr[1:])
+        self.rindices = self.predators[order]
+
+        self._eats = None
+        self.version += 1
+
+    @property
+    def num_species(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    def prey_of(self, species: int) -> np.ndarray:
+        return self.indices[self.indptr[species]:self.indptr[species + 1]]
+
+    def predators_of(self, species: int) -> np.ndarray:
+        return self.rindices[self.rindptr[species]:self.rindptr[species + 1]]
+
+    def edges(self) -> List[Tuple[str, str]]:
+        # (predator name, prey name) pairs
+        return [(self.names[i], self.names[j])
+                for i, j in zip(self.predators.tolist(), self.prey.tolist())]
+
+    @property
+    def eats(self) -> np.ndarray:
+        # Dense boolean (S, S) matrix, True where species 'i' hunts 'j'
+        if self._eats is None:
+            self._eats = np.zeros((self.num_species, self.num_species),
+                                  dtype=bool)
+            self._eats[self.predators, self.prey] = True
+        return self._eats
+
+    def can_eat(self, predators: np.ndarray, prey: np.ndarray) -> np.ndarray:
+        # Element-wise mask of whether species 'predators' hunt 'prey'
+        return self.eats[predators, prey]
+
+    def eats_matrix(self, names: List[str]) -> np.ndarray:
+        # Predation matrix in another species order, e.g. a
+        # CreaturePopulation's species table. Unknown names hunt nothing
+        idxs = np.array([self.ids.get(name, -1) for name in names],
+                        dtype=np.intp)
+        known = idxs >= 0
+        eats = np.zeros((len(names), len(names)), dtype=bool)
+        eats[np.ix_(known, known)] = self.eats[np.ix_(idxs[known],
+                                                      idxs[known])]
+        return eats
+
+    def has_edge(self, predator: int, prey: int) -> bool:
+        return bool(np.any(self.prey_of(predator) == prey))
+
+    def add_edge(self, predator: int, prey: int) -> bool:
+        # Returns False if the edge already exists
+        if self.has_edge(predator, prey):
+            return False
+        self._build(np.r_[self.predators, predator], np.r_[self.prey, prey])
+        for listener in self.listeners:
+            listener(predator, prey, True)
+        return True
+
+    def remove_edge(self, predator: int, prey: int) -> bool:
+        # Returns False if there is no such edge
+        keep = (self.predators != predator) | (self.prey != prey)
+        if keep.all():
+            return False
+        self._build(self.predators[keep], self.prey[keep])
+        for listener in self.listeners:
+            listener(predator, prey, False)
+        return True
+
+    @classmethod
+    def from_networkx(cls, graph) -> "FoodWeb":
+        # From a predator -> prey graph whose nodes are Creatures or names
+        names = [getattr(node, "name", str(node)) for node in graph.nodes()]
+        ids = {node: i for i, node in enumerate(graph.nodes())}
+        return cls(names, [(ids[u], ids[v]) for u, v in graph.edges()])
+
+    def to_networkx(self):
+        # MultiDiGraph of species names for visualization
+        import networkx as nx
+
+        graph = nx.MultiDiGraph()
+        graph.add_nodes_from(self.names)
+        for predator, prey in self.edges():
+            graph.add_edge(predator, prey, hunter=predator)
+        return graph
@@ -0,0 +1,185 @@
+# Cached structural analytics of a FoodWeb for tuning regions
+import numpy as np
+import weakref
+from typing import Dict
+
+from ecosystems.generation.food_web import FoodWeb
+
+
+class FoodWebAnalytics:
+    # Analytics computed from the web's CSR arrays with linear algebra
+    # rather than graph traversals. Results are cached; adding or removing
+    # an edge updates the degree counts in place and only drops the cached
+    # results that edge can change
+    def __init__(self, web: FoodWeb) -> None:
+        # Weak so the memo table below doesn't keep webs alive
+        self._web = weakref.ref(web)
+        # Number of prey of each species & number of predators
+        self.generality = np.diff(web.indptr)
+        self.vulnerability = np.diff(web.rindptr)
+        self._trophic_levels = None
+        self._cycle_species = None
+        web.listeners.append(self._edge_changed)
+
+    @property
+    def web(self) -> FoodWeb:
+        return self._web()
+
+    def _edge_changed(self, predator: int, prey: int, added: bool):
+        change = 1 if added else -1
+        self.generality[predator] += change
+        self.vulnerability[prey] += change
+        self._trophic_levels = None
+        # Removing an edge can't create a cycle, only break a known one
+        if added or (self._cycle_species is not None and
+                     self._cycle_species.any()):
+            self._cycle_species = None
+
+    @property
+    def connectance(self) -> float:
+        # Fraction of all possible links that are present, L / S^2
+        return self.web.num_edges / self.web.num_species**2
+
+    @property
+    def link_density(self) -> float:
+        # Links per species, L / S
+        return self.web.num_edges / self.web.num_species
+
+    @property
+    def basal(self) -> np.ndarray:
+        # Species that hunt nothing (prey / foragers)
+        return self.generality == 0
+
+    @property
+    def apex(self) -> np.ndarray:
+        # Hunters that nothing hunts
+        return (self.vulnerability == 0) & (self.generality > 0)
+
+    @property
+    def intermediate(self) -> np.ndarray:
+        return ~self.basal & ~self.apex
+
+    @property
+    def trophic_levels(self) -> np.ndarray:
+        # Prey-averaged trophic level: 1 for basal species, else 1 + the mean
+        # level of its prey. Solves (I - D) t = 1 where D is the predator ->
+        # prey matrix with rows normalised by generality. Species whose
+        # level depends on a closed loop with no way down to a basal species
+        # have no level (NaN)
+        if self._trophic_levels is None:
+            web = self.web
+            n = web.num_species
+            defined = self._grounded()
+            ids = np.flatnonzero(defined)
+            local = np.cumsum(defined) - 1
+            edges = defined[web.predators]
+            predators, prey = web.predators[edges], web.prey[edges]
+            weights = 1. / np.maximum(self.generality, 1)
+            system = np.eye(len(ids))
+            np.subtract.at(system, (local[predators], local[prey]),
+                           weights[predators])
+            self._trophic_levels = np.full(n, np.nan)
+            self._trophic_levels[ids] = np.linalg.solve(system,
+                                                        np.ones(len(ids)))
+        return self._trophic_levels
+
+    def _grounded(self) -> np.ndarray:
+        # Species whose prey, their prey and so on all lead down to basal
+        # species: the largest set where every species is basal or has all
+        # its prey in the set and reaches a basal species within it
+        web = self.web
+        n = web.num_species
+        defined = np.ones(n, dtype=bool)
+        while True:
+            # Species reaching a basal species through defined prey
+            edges = defined[web.predators] & defined[web.prey]
+            reaches = defined & self.basal
+            while True:
+                grown = reaches | (defined & (np.bincount(
+                    web.predators[edges & reaches[web.prey]],
+                    minlength=n) > 0))
+                if (grown == reaches).all():
+                    break
+                reaches = grown
+            # ... with none of their prey undefined
+            undefined_prey = np.bincount(web.predators[~defined[web.prey]],
+                                         minlength=n) > 0
+            grounded = reaches & ~undefined_prey
+            if (grounded == defined).all():
+                return defined
+            defined = grounded
+
+    @property
+    def cycle_species(self) -> np.ndarray:
+        # Species on (or between) predation cycles: what's left after
+        # repeatedly peeling off species with no remaining prey or no
+        # remaining predators
+        if self._cycle_species is None:
+            web = self.web
+            remaining = np.ones(web.num_species, dtype=bool)
+            while True:
+                live = remaining[web.predators] & remaining[web.prey]
+                prey_left = np.bincount(web.predators[live],
+                                        minlength=web.num_species)
+                predators_left = np.bincount(web.prey[live],
+                                             minlength=web.num_species)
+                peel = remaining & ((prey_left == 0) | (predators_left == 0))
+                if not peel.any():
+                    break
+                remaining &= ~peel
+            self._cycle_species = remaining
+        return self._cycle_species
+
+    @property
+    def has_cycles(self) -> bool:
+        return bool(self.cycle_species.any())
+
+    def may_complexity(self, interaction_strength=1.) -> float:
+        # May's stability criterion: a random web is stable when
+        # interaction_strength * sqrt(S * C) < 1
+        return interaction_strength * np.sqrt(self.web.num_species *
+                                              self.connectance)
+
+    def energy_flow(self, biomass: np.ndarray, efficiency=0.1) -> np.ndarray:
+        # Energy along each edge (aligned with web.predators / web.prey) when
+        # each prey's 'biomass' is split evenly between its predators and
+        # passed on with 'efficiency'
+        biomass = np.asarray(biomass, dtype=float)
+        return efficiency * biomass[self.web.prey] /\
+            self.vulnerability[self.web.prey]
+
+    def energy_intake(self, biomass: np.ndarray, efficiency=0.1) -> np.ndarray:
+        # Total energy flowing into each species from its prey
+        return np.bincount(self.web.predators,
+                           self.energy_flow(biomass, efficiency),
+                           minlength=self.web.num_species)
+
+    def summary(self) -> Dict:
+        return {
+            "species": self.web.num_species,
+            "links": self.web.num_edges,
+            "connectance": self.connectance,
+            "link_density": self.link_density,
+            "basal": int(self.basal.sum()),
+            "intermediate": int(self.intermediate.sum()),
+            "apex": int(self.apex.sum()),
+            "max_trophic_level": float(np.nanmax(self.trophic_levels))
+            if np.isfinite(self.trophic_levels).any() else float("nan"),
+            "mean_generality": float(self.generality[~self.basal].mean())
+            if (~self.basal).any() else 0.,
+            "mean_vulnerability": float(
+                self.vulnerability[self.vulnerability > 0].mean())
+            if self.web.num_edges else 0.,
+            "cycle_species": int(self.cycle_species.sum()),
+            "may_complexity": float(self.may_complexity()),
+        }
+
+
+_analytics = weakref.WeakKeyDictionary()
+
+
+def web_analytics(web: FoodWeb) -> FoodWebAnalytics:
+    # Memoized analytics for 'web', kept up to date as edges change
+    if web not in _analytics:
+        _analytics[web] = FoodWebAnalytics(web)
+    return _analytics[web]
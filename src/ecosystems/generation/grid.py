@@ -1,11 +1,122 @@
 # 2D Grid class for simulations
 import numpy as np
+from collections.abc import MutableMapping
 from typing import Dict, Tuple
 
-from ecosystems.generation.tile import BlankTile, Tile
+from ecosystems.generation.tile import BlankTile, Tile, TILE_CLASSES
 
 
-class Grid:
+# Dense per-tile layers stored on the Grid, name: (dtype, blank value)
+TILE_LAYERS = {
+    "tile_type": (np.int8, BlankTile.code),
+    "regrowth_time": (np.int32, 0),
+    "food_quantity": (np.float32, 0.),
+    "food_capacity": (np.float32, 0.),
+    # Terrain: movement speed factor and whether creatures can enter
+    "speed_multiplier": (np.float32, 1.),
+    "passable": (np.bool_, True),
+}
+
+
+# Layers set by a tile's code alone
+TERRAIN_LAYERS = ("speed_multiplier", "passable")
+
+
+def tile_layer_values(tile: Tile) -> Dict:
+    # Value of every tile layer for a single 'tile', blank values where the
+    # tile has no corresponding attribute
+    values = {name: blank for name, (_, blank) in TILE_LAYERS.items()}
+    values["tile_type"] = tile.code
+    for attribute, layer in tile.layers.items():
+        values[layer] = getattr(tile, attribute)
+    # Food tiles start fully grown
+    values["food_quantity"] = values["food_capacity"]
+
+    return values
+
+
+# Terrain layer: value per tile code, from the Tile class defaults
+_TERRAIN_TABLES = {layer: np.array([
+    tile_layer_values(TILE_CLASSES[code]())[layer]
+    if code in TILE_CLASSES else TILE_LAYERS[layer][1]
+    for code in range(max(TILE_CLASSES) + 1)], dtype=TILE_LAYERS[layer][0])
+    for layer in TERRAIN_LAYERS}
+
+
+def code_layer_values(codes) -> Dict:
+    # Terrain layer values of tiles given only by code (scalar or array),
+    # from the defaults of each code's Tile class
+    codes = np.asarray(codes)
+    unknown = ~np.isin(codes, list(TILE_CLASSES))
+    if unknown.any():
+        raise ValueError(f"Unknown tile codes {np.unique(codes[unknown])}")
+    return {layer: table[codes] for layer, table in _TERRAIN_TABLES.items()}
+
+
+def bulk_layer_values(tile_type, layers: Dict) -> Dict:
+    # {layer: value} for a bulk tile update, 'tile_type' being a Tile or a
+    # Tile class (its values, or its defaults, are used for every layer), a
+    # code or an array of codes (setting the terrain of each code too) or
+    # None, and 'layers' other entries of TILE_LAYERS, which take precedence
+    values = {}
+    if isinstance(tile_type, type):
+        tile_type = tile_type()
+    if isinstance(tile_type, Tile):
+        values = tile_layer_values(tile_type)
+    elif tile_type is not None:
+        values["tile_type"] = tile_type
+        values.update(code_layer_values(tile_type))
+    values.update(layers)
+    if "food_capacity" in layers and "food_quantity" not in layers:
+        values["food_quantity"] = values["food_capacity"]
+
+    for name in values:
+        if name not in TILE_LAYERS:
+            raise ValueError(f"Unknown tile layer '{name}'")
+    return values
+
+
+class TileView(MutableMapping):
+    # Compatibility view over a Grid's tile layers that behaves like the old
+    # {(i, j): Tile} dictionary. Tiles are built on access, so prefer the
+    # layer arrays for anything in a hot loop
+    def __init__(self, grid) -> None:
+        self.grid = grid
+
+    def _check(self, key: Tuple[int, int]):
+        i, j = key
+        nx, ny = self.grid.tile_shape
+        if not (0 <= i < nx and 0 <= j < ny):
+            raise KeyError(key)
+
+    def __getitem__(self, key: Tuple[int, int]) -> Tile:
+        self._check(key)
+        tile_class = TILE_CLASSES[int(self.grid.tile_type[key])]
+        kwargs = {attribute: getattr(self.grid, layer)[key].item()
+                  for attribute, layer in tile_class.layers.items()}
+        return tile_class(**kwargs)
+
+    def __setitem__(self, key: Tuple[int, int], tile: Tile):
+        self._check(key)
+        for layer, value in tile_layer_values(tile).items():
+            getattr(self.grid, layer)[key] = value
+
+    def __delitem__(self, key: Tuple[int, int]):
+        self[key] = BlankTile()
+
+    def __iter__(self):
+        nx, ny = self.grid.tile_shape
+        for i in range(nx):
+            for j in range(ny):
+                yield (i, j)
+
+    def __len__(self) -> int:
+        return int(np.prod(self.grid.tile_shape))
+
+
+class UniformCoords:
+    # Uniformly spaced x & y coordinates with arithmetic position to index
+    # lookups, shared by Grid and ChunkedGrid
     def __init__(self, num_x: int, num_y: int,
                  x_start=0., x_end=100., y_start=0., y_end=100.) -> None:
         # Coordinates
@@ -16,28 +127,107 @@ class Grid:
         self.dx = self.x[1] - self.x[0]
         self.dy = self.y[1] - self.y[0]
 
-        self.coords = np.array(np.meshgrid(
-            self.x, self.y, indexing='ij')).transpose(1, 2, 0)
+        # Used to map positions to indices arithmetically
+        self._origin = np.array([self.x[0], self.y[0]])
+        self._inv_spacing = 1. / np.array([self.dx, self.dy])
 
-        # Initialize empty array of tiles
         # Note the "minus 1" because we have cell centers vs edges
-        self.tile_data = {}
-        for i in range(num_x - 1):
-            for j in range(num_y - 1):
-                self.tile_data[(i, j)] = BlankTile("Blank")
+        self.tile_shape = (num_x - 1, num_y - 1)
+        self._coord_upper = np.array([num_x - 1, num_y - 1])
+        self._tile_upper = np.array([num_x - 2, num_y - 2])
 
-    def init_tiles(self, tiles: Dict):
-        # Set up tiles: 'tiles' dictionary should be a ndarray: Tile map
-        for coord, tile in tiles.items():
-            self.tile_data[coord] = tile
+    def is_passable(self, position: np.ndarray) -> np.ndarray:
+        # Whether the tile under each position ((2,) or (N, 2)) is passable
+        idxs = self.tile_idxs(position)
+        return self.passable[idxs[..., 0], idxs[..., 1]]
+
+    def _position_idxs(self, position: np.ndarray, upper: np.ndarray,
+                       offset: float) -> np.ndarray:
+        # Uniform spacing means the index is just (position - origin) / dx,
+        # 'offset' of 0.5 rounds to the nearest point, 0 floors to the cell.
+        # Clipping before the cast makes truncation equal to flooring
+        idxs = np.subtract(position, self._origin, dtype=float)
+        idxs *= self._inv_spacing
+        idxs += offset
+        np.clip(idxs, 0, upper, out=idxs)
+        return idxs.astype(np.intp)
 
-# Maybe these could be optimized but it's good enough for now
     def nearest_coord_idxs(self, position: np.ndarray) -> np.ndarray:
-        # Find the indices of the nearest coordinate to the position
-        i = np.abs(self.x - position[0]).argmin()
-        j = np.abs(self.y - position[1]).argmin()
-        return np.array([i, j])
+        # Find the indices of the nearest coordinate to 'position', either a
+        # single (2,) position or an (N, 2) array. Positions outside the grid
+        # are clamped to the border
+        return self._position_idxs(position, self._coord_upper, 0.5)
 
     def nearest_coord(self, position: np.ndarray) -> np.ndarray:
-        # Find nearest coordinate to position
-        return self.coords[self.nearest_coord_idxs(position)]
+        # Find nearest coordinate to 'position', (2,) or (N, 2)
+        idxs = self.nearest_coord_idxs(position)
+        return np.stack([self.x[idxs[..., 0]], self.y[idxs[..., 1]]],
+                        axis=-1)
+
+    def tile_idxs(self, position: np.ndarray) -> np.ndarray:
+        # Indices of the tile containing 'position', (2,) or (N, 2), clamped
+        # to the border tiles
+        return self._position_idxs(position, self._tile_upper, 0.)
+
+
+class Grid(UniformCoords):
+    def __init__(self, num_x: int, num_y: int,
+                 x_start=0., x_end=100., y_start=0., y_end=100.) -> None:
+        super().__init__(num_x, num_y, x_start, x_end, y_start, y_end)
+        # Initialize blank tile layers
+        self._attach({name: np.full(self.tile_shape, blank, dtype=dtype)
+                      for name, (dtype, blank) in TILE_LAYERS.items()})
+
+    @classmethod
+    def from_layers(cls, x: np.ndarray, y: np.ndarray,
+                    layers: Dict[str, np.ndarray]) -> "Grid":
+        # Grid over the coordinates 'x' & 'y' using the existing arrays in
+        # 'layers' (every entry of TILE_LAYERS) as its tile layers, without
+        # allocating or copying any, e.g. memory maps of a snapshot
+        grid = cls.__new__(cls)
+        UniformCoords.__init__(grid, len(x), len(y), x[0], x[-1], y[0], y[-1])
+        grid._attach(layers)
+        return grid
+
+    def _attach(self, layers: Dict[str, np.ndarray]):
+        for name in TILE_LAYERS:
+            if layers[name].shape != self.tile_shape:
+                raise ValueError(f"Tile layer '{name}' has shape "
+                                 f"{layers[name].shape}, expected "
+                                 f"{self.tile_shape}")
+            setattr(self, name, layers[name])
+        self.coords = np.array(np.meshgrid(
+            self.x, self.y, indexing='ij')).transpose(1, 2, 0)
+        self._tile_view = TileView(self)
+
+    @property
+    def tile_data(self) -> TileView:
+        return self._tile_view
+
+    def init_tiles(self, tiles: Dict = None, tile_type=None, mask=None,
+                   **layers):
+        # Set up tiles, either from a {(i, j): Tile} dictionary or in bulk.
+        # In bulk, 'tile_type' is a Tile (its values are used for every
+        # layer), a Tile class or code, or an array of codes; 'layers' are
+        # scalar or array values for other entries of TILE_LAYERS. Values are
+        # applied where the boolean 'mask' is True, everywhere if no mask
+        if tiles is not None:
+            nx, ny = self.tile_shape
+            for (i, j), tile in tiles.items():
+                # Ignore tiles on the upper edges (no cell there)
+                if i < nx and j < ny:
+                    self.tile_data[(i, j)] = tile
+
+        for name, value in bulk_layer_values(tile_type, layers).items():
+            layer = getattr(self, name)
+            value = np.asarray(value)
+            if mask is None:
+                layer[...] = value
+            elif value.shape == self.tile_shape:
+                layer[mask] = value[mask]
+            else:
+                layer[mask] = value
+
+    def tile_mask(self, tile_class) -> np.ndarray:
+        # Boolean mask of all tiles of type 'tile_class'
+        return self.tile_type == tile_class.code
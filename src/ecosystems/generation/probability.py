@@ -1,28 +1,113 @@
-import random
+import zlib
 import numpy as np
-from typing import List
+from typing import Dict, List, Tuple
+
+
+class AliasTable:
+    # Vose's alias method: O(n) to build, O(1) per draw from a fixed
+    # discrete distribution over 0..n-1
+    def __init__(self, probs: np.ndarray) -> None:
+        probs = np.asarray(probs, dtype=float)
+        n = len(probs)
+        scaled = probs * n / np.sum(probs)
+        self.prob = np.ones(n)
+        self.alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.]
+        large = [i for i in range(n) if scaled[i] >= 1.]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1. - scaled[s]
+            if scaled[l] < 1.:
+                small.append(l)
+            else:
+                large.append(l)
+
+    def sample(self, rng: np.random.Generator, size=None) -> np.ndarray:
+        k = rng.integers(0, len(self.prob), size)
+        return np.where(rng.random(size) < self.prob[k], k, self.alias[k])
+
+
+class Sampler:
+    # Seeded source of random draws built on numpy.random.Generator.
+    # Independent streams (e.g. one per region) are spawned by name, so runs
+    # are reproducible and parallel workers never share state. Draws take
+    # an optional 'size' to draw a whole batch in one call
+    def __init__(self, seed=None, stream: Tuple[int, ...] = ()) -> None:
+        root = np.random.SeedSequence(seed)
+        self.seed = root.entropy
+        self.stream = stream
+        self.rng = np.random.Generator(np.random.PCG64(
+            np.random.SeedSequence(self.seed, spawn_key=stream)))
+        self._alias_tables: Dict[Tuple[int, int], AliasTable] = {}
+
+    def spawn(self, name: str) -> "Sampler":
+        # Independent child stream identified by 'name'
+        return Sampler(self.seed, self.stream + (zlib.crc32(name.encode()),))
+
+    def choice(self, lst: List[str], size=None):
+        # Uniform element(s) of 'lst'
+        if size is None:
+            return lst[self.rng.integers(0, len(lst))]
+        return np.asarray(lst)[self.rng.integers(0, len(lst), size)]
+
+    def from_list(self, lst: List[str], chance: float, size=None):
+        # Element(s) of 'lst' with probability 'chance', else ""
+        if size is None:
+            return self.choice(lst) if self.rng.random() <= chance else ""
+        picks = self.choice(lst, size)
+        return np.where(self.rng.random(size) <= chance, picks, "")
+
+    def potential_pair(self, lst: List[str], secondary_chance: float,
+                       size=None):
+        # One or two distinct elements of 'lst', the second is "" when only
+        # one is picked. A list for a single draw, else a (size, 2) array
+        n = len(lst)
+        first = self.rng.integers(0, n, size)
+        has_second = (self.rng.random(size) <= secondary_chance) & (n > 1)
+        # Skip over 'first' so the pair is distinct
+        second = self.rng.integers(0, max(n - 1, 1), size)
+        second = second + (second >= first)
+        values = np.asarray(lst + [""])
+        pairs = np.stack([values[first],
+                          values[np.where(has_second, second, n)]], axis=-1)
+        return pairs.tolist() if size is None else pairs
+
+    def weighted_randint(self, a: int, b: int, size=None):
+        # Random integer(s) between 'a' and 'b' inclusive, weighted 1 / k so
+        # higher numbers are less likely
+        if (a, b) not in self._alias_tables:
+            self._alias_tables[(a, b)] = AliasTable(
+                1 / (2 * np.arange(a, b + 1)))
+        draws = a + self._alias_tables[(a, b)].sample(self.rng, size)
+        return int(draws) if size is None else draws
+
+
+# Shared sampler behind the functions below
+_sampler = Sampler()
+
+
+def seed(seed: int):
+    # Reseed the shared sampler
+    global _sampler
+    _sampler = Sampler(seed)
 
 
 def generate_from_list(lst: List[str],
                        chance: float) -> str:
     # Generate a an elememt from "lst" based on "chance", else return ""
-    return random.choice(lst) if random.random() <= chance else ""
+    return _sampler.from_list(lst, chance)
 
 
 def generate_potential_pair(lst: List[str],
                             secondary_chance: float) -> List[str]:
-    # Pick one or two animal families from the list
-    if random.random() <= secondary_chance:
-        return random.sample(lst, 2)
-    else:
-        return [random.choice(lst), ""]
+    # Pick one or two animal families from the list, only one if that's all
+    # there is
+    return _sampler.potential_pair(lst, secondary_chance)
 
 
 def weighted_randint(a: int, b: int) -> int:
     # Generates random number between 'a' and 'b' inclusive with weighting
     # so higher numbers are less likely
-    choices = list(range(a, b+1))
-    probs = 1 / (2*np.array(choices))
-    # Normalize
-    probs /= np.sum(probs)
-    return np.random.choice(choices, p=probs)
+    return _sampler.weighted_randint(a, b)
@@ -1,5 +1,7 @@
 from typing import Dict, List
 
+from ecosystems.generation.config import GameConfig
+
 
 class Region:
     def __init__(self, name: str, region_type: str,
@@ -35,7 +37,14 @@ def add_region_affinities(*regions) -> List[str]:
 def get_region_affinities(region_affinities: Dict,
                           region_type: str) -> List[str]:
     # Search through the dictionary of region affinities to find where
-    # a name is 'region_type', return the corresponding affinities
+    # a name is 'region_type', return the corresponding affinities. A
+    # GameConfig (see config.load_config) is looked up directly instead
+    if isinstance(region_affinities, GameConfig):
+        if region_type in region_affinities.region_ids:
+            return region_affinities.region_affinities(region_type)
+        print(f"\'{region_type}\' not found in list.")
+        return []
+
     for region in region_affinities["region"]:
         if region["name"] == region_type:
             return region["affinities"]
@@ -1,15 +1,54 @@
 # Tiels for the Grid
+# Each tile type has an integer 'code' used by the Grid's dense tile layers
 class Tile:
-    def __init__(self, name: str) -> None:
+    code = -1
+    # Tile attribute: Grid tile layer it is stored in. Every tile has a
+    # terrain speed multiplier and passability
+    layers = {"speed_multiplier": "speed_multiplier", "passable": "passable"}
+
+    def __init__(self, name: str, speed_multiplier=1., passable=True) -> None:
         self.name = name
+        self.speed_multiplier = speed_multiplier
+        self.passable = passable
 
 
 class BlankTile(Tile):
-    def __init__(self, name="Blank") -> None:
-        super().__init__(name)
+    code = 0
+
+    def __init__(self, name="Blank", **terrain) -> None:
+        super().__init__(name, **terrain)
 
 
 class FoodTile(Tile):
-    def __init__(self, name="Food", regrowth_time=10) -> None:
-        super().__init__(name)
+    code = 1
+    layers = {**Tile.layers, "regrowth_time": "regrowth_time",
+              "quantity": "food_capacity"}
+
+    def __init__(self, name="Food", regrowth_time=10, quantity=10.,
+                 **terrain) -> None:
+        super().__init__(name, **terrain)
         self.regrowth_time = regrowth_time
+        self.quantity = quantity
+
+
+class WaterTile(Tile):
+    # Unlimited water source, slow to move through
+    code = 2
+
+    def __init__(self, name="Water", speed_multiplier=0.5,
+                 passable=True) -> None:
+        super().__init__(name, speed_multiplier, passable)
+
+
+class RockTile(Tile):
+    # Impassable terrain
+    code = 3
+
+    def __init__(self, name="Rock", speed_multiplier=0.,
+                 passable=False) -> None:
+        super().__init__(name, speed_multiplier, passable)
+
+
+# Tile code: Tile class
+TILE_CLASSES = {cls.code: cls for cls in (BlankTile, FoodTile, WaterTile,
+                                          RockTile)}
@@ -0,0 +1,29 @@
+from ecosystems._lazy import lazy_exports
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    "population": ["IDLE", "HUNTING", "EATING", "THIRSTY", "DRINKING",
+                   "SLEEPING", "DEAD", "POPULATION_FIELDS", "TRAIT_FIELDS",
+                   "NEED_FIELDS", "species_key", "CreaturePopulation"],
+    "profiler": ["NUM_BUCKETS", "TICK", "TickProfiler", "dump_snapshots",
+                 "over_budget_regions"],
+    "spatial": ["SpatialHash", "predation_matrix", "neighbour_pairs",
+                "within", "nearest_predator", "nearest_tile"],
+    "boids": ["STEERING_TERMS", "HERDING_WEIGHTS", "SOLITARY_WEIGHTS",
+              "FAMILY_WEIGHTS", "species_weights", "steer", "flock_step"],
+    "movement": ["BOUNCE", "CLAMP", "WRAP", "BOUNDARIES", "integrate"],
+    "regrowth": ["DEPLETED", "REGROWN", "SPAWNED", "serve_in_order",
+                 "SpawnArea", "RegrowthScheduler"],
+    "carcass": ["CARCASS_FIELDS", "CarcassPool"],
+    "predation": ["HuntResult", "nearest_prey", "resolve_hunts"],
+    "flow_field": ["FOOD", "WATER", "CARCASS", "STEPS", "resource_mask",
+                   "FlowField"],
+    "lod": ["AGENT_MODE", "AGGREGATE_MODE", "food_web_edges",
+            "AggregateModel", "RegionSimulation"],
+    "routing": ["IslandRouter"],
+    "island": ["WorkerError", "MigrantBatch", "combine_food_webs",
+               "balance_shards", "step_shard", "IslandSimulation"],
+    "checkpoint": ["MAGIC", "ALIGNMENT", "POPULATION_PARAMETERS",
+                   "write_arrays", "read_arrays", "Snapshot",
+                   "save_snapshot", "save_delta", "load_snapshot"],
+    "service": ["RegionState", "SnapshotBuffer", "SimulationHost"],
+})
@@ -0,0 +1,146 @@
+# Boids steering (README "Creature AI") for a whole CreaturePopulation
+import numpy as np
+from typing import List
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.movement import BOUNCE, integrate
+from ecosystems.simulation.population import DRINKING, EATING, SLEEPING
+from ecosystems.simulation.spatial import (SpatialHash, nearest_predator,
+                                           neighbour_pairs, within)
+
+
+# Order of the weights in each steering weight tuple
+STEERING_TERMS = ("separation", "alignment", "cohesion", "flee", "seek")
+HERDING_WEIGHTS = (1.5, 1., 1., 3., 1.)
+SOLITARY_WEIGHTS = (2., 0.05, 0., 3., 1.)
+FAMILY_WEIGHTS = {
+    "Canine": (1.5, 0.75, 0.75, 2., 1.),  # packs
+    "Cow-like": HERDING_WEIGHTS,
+    "Deer-like": HERDING_WEIGHTS,
+    "Ostrich-like": HERDING_WEIGHTS,
+    "Primate": (1.5, 0.5, 1., 3., 1.),  # troops
+    "Rabbit-like": (1.5, 0.5, 0.5, 4., 1.),
+    "Rodent-like": (1.5, 0.5, 0.5, 4., 1.),
+    "Crab-like": SOLITARY_WEIGHTS,
+    "Crocodilian": SOLITARY_WEIGHTS,
+    "Feline": SOLITARY_WEIGHTS,
+    "Frog-like": SOLITARY_WEIGHTS,
+    "Lizard-like": SOLITARY_WEIGHTS,
+    "Octopus-like": SOLITARY_WEIGHTS,
+    "Raptor-like": SOLITARY_WEIGHTS,
+    "Scorpion-like": SOLITARY_WEIGHTS,
+    "Snake-like": SOLITARY_WEIGHTS,
+    "Spider-like": SOLITARY_WEIGHTS,
+}
+
+
+def species_weights(species_table: List[Creature]) -> np.ndarray:
+    # (S, 5) steering weights per species from each template's family
+    # (the first family for mixed creatures), solitary if unknown
+    weights = np.empty((len(species_table), len(STEERING_TERMS)))
+    for i, creature in enumerate(species_table):
+        family = creature.family
+        if not isinstance(family, str):
+            family = family[0]
+        weights[i] = FAMILY_WEIGHTS.get(family, SOLITARY_WEIGHTS)
+
+    return weights
+
+
+def _sum_by(groups: np.ndarray, values: np.ndarray, n: int) -> np.ndarray:
+    # Sum (M, 2) 'values' into 'n' bins by 'groups'
+    return np.stack([np.bincount(groups, values[:, 0], minlength=n),
+                     np.bincount(groups, values[:, 1], minlength=n)], axis=1)
+
+
+def _unit(vectors: np.ndarray) -> np.ndarray:
+    # Normalise (N, 2) vectors, leaving zero vectors as zero
+    norm = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))
+    return vectors / np.maximum(norm, 1e-12)[:, None]
+
+
+def steer(population, index: SpatialHash, dt=1., radius=5.,
+          flee_radius=10., food_target=None, weights=None, eats=None,
+          pairs=None):
+    # Update the velocity of every living creature in 'population' (indexed
+    # by slot in 'index') with separation, alignment and cohesion within
+    # 'radius' (flocking with the same species only), fleeing the nearest
+    # predator within 'flee_radius' and seeking 'food_target' (capacity, 2)
+    # positions (food, water, ...), NaN where a creature has no target.
+    # Speed is capped by the creature's speed and resting creatures stop.
+    # Neighbours come from one query at the larger radius, or 'pairs' from
+    # neighbour_pairs() if the tick already has them
+    if weights is None:
+        weights = species_weights(population.species_table)
+    slots = population.active
+    n = len(slots)
+    position = population.position[slots]
+    velocity = population.velocity[slots]
+    species = population.species[slots]
+    w = weights[species]
+
+    if pairs is None:
+        pairs = neighbour_pairs(population, index, max(radius, flee_radius))
+    query, neighbour, distance = within(pairs, radius)
+    local = np.empty(population.capacity, dtype=np.intp)
+    local[slots] = np.arange(n)
+    query, neighbour = local[query], local[neighbour]
+
+    # Separation: push away from every neighbour, harder when closer
+    offset = position[query] - position[neighbour]
+    separation = _sum_by(query, offset / np.maximum(distance, 1e-6)[:, None]**2,
+                         n)
+
+    # Alignment & cohesion with the flock (same species)
+    same = species[query] == species[neighbour]
+    flock_query, flock_neighbour = query[same], neighbour[same]
+    flock_size = np.bincount(flock_query, minlength=n)[:, None]
+    has_flock = flock_size > 0
+    flock_size = np.maximum(flock_size, 1)
+    alignment = np.where(has_flock, _sum_by(flock_query,
+                                            velocity[flock_neighbour], n) /
+                         flock_size - velocity, 0.)
+    cohesion = np.where(has_flock, _sum_by(flock_query,
+                                           position[flock_neighbour], n) /
+                        flock_size - position, 0.)
+
+    acceleration = w[:, 0:1] * separation + w[:, 1:2] * alignment +\
+        w[:, 2:3] * _unit(cohesion)
+
+    # Flee the nearest predator
+    predator, _ = nearest_predator(population, index, flee_radius, eats=eats,
+                                   pairs=pairs)
+    predator = predator[slots]
+    threatened = predator >= 0
+    away = np.zeros((n, 2))
+    away[threatened] = _unit(position[threatened] -
+                             population.position[predator[threatened]])
+    acceleration += w[:, 3:4] * away
+
+    # Seek food
+    if food_target is not None:
+        target = food_target[slots]
+        has_target = ~np.isnan(target[:, 0])
+        seek = np.zeros((n, 2))
+        seek[has_target] = _unit(target[has_target] - position[has_target])
+        acceleration += w[:, 4:5] * seek
+
+    # Integrate & cap speed
+    velocity += acceleration * dt
+    max_speed = population.speed[slots]
+    speed = np.sqrt(np.einsum("ij,ij->i", velocity, velocity))
+    velocity *= np.minimum(1., max_speed / np.maximum(speed, 1e-12))[:, None]
+    state = population.state[slots]
+    velocity[(state == SLEEPING) | (state == EATING) |
+             (state == DRINKING)] = 0.
+    population.velocity[slots] = velocity
+
+
+def flock_step(population, index: SpatialHash, grid: Grid, dt=1.,
+               boundary=BOUNCE, **kwargs):
+    # Re-index, steer and move every creature one step over the terrain of
+    # 'grid' (see movement.integrate). 'kwargs' are passed to steer()
+    index.build_population(population)
+    steer(population, index, dt=dt, **kwargs)
+    integrate(population, grid, dt, boundary)
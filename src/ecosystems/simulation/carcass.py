@@ -0,0 +1,213 @@
+# Pooled carcasses left behind by dead creatures for scavengers (README
+# "Scavengers"), stored in slot arrays so deaths & decay every tick don't
+# allocate Python objects
+import numpy as np
+from typing import Dict, List, Tuple
+
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.regrowth import DEPLETED, SPAWNED, serve_in_order
+from ecosystems.simulation.spatial import SpatialHash
+
+
+# Per-carcass arrays, name: (dtype, trailing shape, value of an empty slot)
+CARCASS_FIELDS = {
+    "present": (np.bool_, (), False),
+    "species": (np.int32, (), -1),  # of the creature that died
+    "position": (np.float64, (2,), 0.),
+    "tile": (np.intp, (), -1),  # flat index of the tile it lies on
+    "meat": (np.float32, (), 0.),
+    "decay": (np.float32, (), 0.),  # time left before it rots away
+}
+
+
+class CarcassPool:
+    # Carcasses in slot arrays with a free-list stack like
+    # CreaturePopulation. They rot away 'decay_time' after spawning (every
+    # timer advances at once) or once their meat is eaten. Carcasses are
+    # indexed by slot in a SpatialHash for neighbour & per-tile queries, and
+    # tiles gaining their first carcass or losing their last are recorded as
+    # SPAWNED / DEPLETED 'events' for a CARCASS FlowField. A full pool
+    # doubles up to 'max_capacity' (unbounded if None), past which new
+    # carcasses are dropped. stats() reports the growth for tuning
+    def __init__(self, grid: Grid, capacity=256, max_capacity=None,
+                 decay_time=100.) -> None:
+        self.grid = grid
+        self.max_capacity = max_capacity
+        self.decay_time = decay_time
+        self.capacity = 0
+        for name, (dtype, shape, empty) in CARCASS_FIELDS.items():
+            setattr(self, name, np.full((0, *shape), empty, dtype=dtype))
+        # Stack of free slots, the next slot handed out is at the top
+        self._free = np.empty(0, dtype=np.intp)
+        self._num_free = 0
+        self._tile_counts = np.zeros(grid.tile_shape[0] * grid.tile_shape[1],
+                                     dtype=np.int32)
+        self.index = SpatialHash(grid)
+        self._index_stale = False
+        self.events: List[Tuple[int, np.ndarray]] = []
+
+        self.num_spawned = 0
+        self.num_decayed = 0
+        self.num_eaten = 0
+        self.num_dropped = 0
+        self.num_grown = 0
+        self.peak = 0
+        self._grow(capacity)
+        self.initial_capacity = self.capacity
+
+    def __len__(self) -> int:
+        return self.capacity - self._num_free
+
+    def _grow(self, capacity: int):
+        # Resize every array to 'capacity' slots, new slots are free
+        old_capacity = self.capacity
+        for name, (dtype, shape, empty) in CARCASS_FIELDS.items():
+            array = np.full((capacity, *shape), empty, dtype=dtype)
+            array[:old_capacity] = getattr(self, name)
+            setattr(self, name, array)
+
+        new_slots = np.arange(capacity - 1, old_capacity - 1, -1)
+        free = np.empty(capacity, dtype=np.intp)
+        free[:len(new_slots)] = new_slots
+        free[len(new_slots):len(new_slots) + self._num_free] =\
+            self._free[:self._num_free]
+        self._free = free
+        self._num_free += len(new_slots)
+        self.capacity = capacity
+
+    @property
+    def active(self) -> np.ndarray:
+        # Slots of all carcasses
+        return np.flatnonzero(self.present)
+
+    def spawn(self, position: np.ndarray, meat, species=-1) -> np.ndarray:
+        # Leave carcasses with 'meat' (scalar or per carcass) at 'position'
+        # (N, 2), e.g. where creatures of 'species' died. Returns the slots,
+        # fewer than asked for if the pool is at 'max_capacity'
+        position = np.asarray(position, dtype=float).reshape(-1, 2)
+        n = len(position)
+        meat = np.broadcast_to(np.asarray(meat, dtype=np.float32), n)
+        species = np.broadcast_to(np.asarray(species, dtype=np.int32), n)
+        if n > self._num_free:
+            capacity = max(2 * self.capacity, len(self) + n)
+            if self.max_capacity is not None:
+                capacity = min(capacity, self.max_capacity)
+            if capacity > self.capacity:
+                self._grow(capacity)
+                self.num_grown += 1
+            if n > self._num_free:
+                self.num_dropped += n - self._num_free
+                n = self._num_free
+        if not n:
+            return np.empty(0, dtype=np.intp)
+
+        slots = self._free[self._num_free - n:self._num_free][::-1].copy()
+        self._num_free -= n
+        tiles = self.grid.tile_idxs(position[:n])
+        tiles = tiles[:, 0] * self.grid.tile_shape[1] + tiles[:, 1]
+        self.present[slots] = True
+        self.species[slots] = species[:n]
+        self.position[slots] = position[:n]
+        self.tile[slots] = tiles
+        self.meat[slots] = meat[:n]
+        self.decay[slots] = self.decay_time
+
+        unique = np.unique(tiles)
+        was_empty = self._tile_counts[unique] == 0
+        np.add.at(self._tile_counts, tiles, 1)
+        if was_empty.any():
+            self.events.append((SPAWNED, unique[was_empty]))
+        self.num_spawned += n
+        self.peak = max(self.peak, len(self))
+        self._index_stale = True
+        return slots
+
+    def remove(self, slots):
+        # Remove the carcasses in 'slots', freeing them for reuse
+        slots = np.atleast_1d(np.asarray(slots, dtype=np.intp))
+        slots = np.unique(slots[self.present[slots]])
+        if not len(slots):
+            return
+        tiles = self.tile[slots]
+        np.subtract.at(self._tile_counts, tiles, 1)
+        unique = np.unique(tiles)
+        emptied = unique[self._tile_counts[unique] == 0]
+        if len(emptied):
+            self.events.append((DEPLETED, emptied))
+
+        for name, (_, _, empty) in CARCASS_FIELDS.items():
+            getattr(self, name)[slots] = empty
+        self._free[self._num_free:self._num_free + len(slots)] = slots[::-1]
+        self._num_free += len(slots)
+        self._index_stale = True
+
+    def clear(self):
+        self.remove(self.active)
+
+    def advance(self, dt=1.) -> int:
+        # Age every carcass by 'dt' (empty slots too, it's cheaper than
+        # masking and they are reset on spawn), removing the ones that have
+        # rotted away. Returns how many did
+        self.decay -= dt
+        rotten = np.flatnonzero(self.present & (self.decay <= 0.))
+        self.remove(rotten)
+        self.num_decayed += len(rotten)
+        return len(rotten)
+
+    def eat(self, slots: np.ndarray, amount) -> np.ndarray:
+        # Eat up to 'amount' (scalar or per eater) of meat from 'slots',
+        # where a carcass may appear several times (eaters are served in
+        # order). Returns the amount each eater got. Carcasses picked clean
+        # are removed
+        slots = np.asarray(slots, dtype=np.intp)
+        amount = np.broadcast_to(np.asarray(amount, dtype=np.float32),
+                                 slots.shape)
+        if not len(slots):
+            return np.zeros(0, dtype=np.float32)
+        eaten = serve_in_order(slots, amount, self.meat)
+        unique = np.unique(slots)
+        finished = unique[self.present[unique] & (self.meat[unique] <= 0.)]
+        self.remove(finished)
+        self.num_eaten += len(finished)
+        return eaten
+
+    def build_index(self) -> SpatialHash:
+        # Re-index the carcasses by slot if any came or went
+        if self._index_stale:
+            slots = self.active
+            self.index.build(self.position[slots], slots)
+            self._index_stale = False
+        return self.index
+
+    def on_tiles(self, points: np.ndarray) -> np.ndarray:
+        # Slot of a carcass (the lowest slot) on the tile under each of
+        # 'points' (N, 2), -1 if there is none
+        return self.build_index().first_in_tile(points)
+
+    def nearest(self, points: np.ndarray,
+                radius: float) -> Tuple[np.ndarray, np.ndarray]:
+        # Slot of the nearest carcass within 'radius' of each of 'points'
+        # (N, 2), -1 if none, and its distance
+        ids, distances = self.build_index().query_knn(points, 1, radius)
+        return ids[:, 0], distances[:, 0]
+
+    def drain_events(self) -> List[Tuple[int, np.ndarray]]:
+        # Return and clear the events since the last call
+        events = self.events
+        self.events = []
+        return events
+
+    def stats(self) -> Dict:
+        # Pool usage & growth, e.g. to pick an initial capacity that never
+        # has to grow
+        return {
+            "capacity": self.capacity,
+            "initial_capacity": self.initial_capacity,
+            "in_use": len(self),
+            "peak": self.peak,
+            "grown": self.num_grown,
+            "spawned": self.num_spawned,
+            "decayed": self.num_decayed,
+            "eaten": self.num_eaten,
+            "dropped": self.num_dropped,
+        }
@@ -0,0 +1,243 @@
+# Binary snapshots of simulation state (grid layers, population, food web
+# & RNG) as raw aligned arrays that load through memory mapping, plus delta
+# checkpoints holding only what changed since a full snapshot
+import json
+import numpy as np
+from typing import Dict, Tuple
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.food_web import FoodWeb
+from ecosystems.generation.grid import Grid, TILE_LAYERS
+from ecosystems.simulation.population import (CreaturePopulation,
+                                              POPULATION_FIELDS)
+
+
+# File layout: MAGIC, uint64 header size, JSON header, then every array's
+# raw bytes starting on an ALIGNMENT boundary
+MAGIC = b"ECOSNAP1"
+ALIGNMENT = 64
+POPULATION_PARAMETERS = ("hunger_rate", "thirst_rate", "sleep_rate",
+                         "sleep_recovery", "starvation_damage",
+                         "movement_cost", "hungry_threshold",
+                         "thirsty_threshold", "tired_threshold")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_arrays(path: str, arrays: Dict[str, np.ndarray], meta: Dict):
+    # Write named arrays and a JSON-serialisable 'meta' dictionary
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                        "offset": offset}
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({"meta": meta, "arrays": layout}).encode("utf-8")
+    data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+    with open(path, "wb") as outfile:
+        outfile.write(MAGIC)
+        outfile.write(np.uint64(len(header)).tobytes())
+        outfile.write(header)
+        for name, array in arrays.items():
+            outfile.seek(data_start + layout[name]["offset"])
+            outfile.write(np.ascontiguousarray(array).tobytes())
+        outfile.truncate(data_start + offset)
+
+
+def read_arrays(path: str, mode="c") -> Tuple[Dict[str, np.ndarray], Dict]:
+    # Memory map every array in 'path' (copy-on-write by default, so the
+    # restored state can be modified without touching the file) and return
+    # them with the meta dictionary
+    with open(path, "rb") as infile:
+        if infile.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not a snapshot file")
+        header_size = int(np.frombuffer(infile.read(8), dtype=np.uint64)[0])
+        header = json.loads(infile.read(header_size).decode("utf-8"))
+    data_start = _aligned(len(MAGIC) + 8 + header_size)
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        shape = tuple(entry["shape"])
+        if not np.prod(shape):
+            arrays[name] = np.empty(shape, dtype=entry["dtype"])
+            continue
+        arrays[name] = np.memmap(path, dtype=entry["dtype"], mode=mode,
+                                 offset=data_start + entry["offset"],
+                                 shape=shape)
+    return arrays, header["meta"]
+
+
+def _species_meta(creature: Creature) -> Dict:
+    return {"name": creature.name, "affinities": creature.affinities,
+            "family": creature.family,
+            "progression_path": creature.progression_path,
+            "speed": float(creature.speed), "health": float(creature.health),
+            "energy": float(creature.energy),
+            "energy_recovery": float(creature.energy_recovery)}
+
+
+def _state(grid: Grid, population: CreaturePopulation = None,
+           food_web: FoodWeb = None,
+           rng: np.random.Generator = None) -> Tuple[Dict, Dict]:
+    # Arrays and meta of the full state
+    arrays = {"grid/x": grid.x, "grid/y": grid.y}
+    for layer in TILE_LAYERS:
+        arrays[f"grid/{layer}"] = getattr(grid, layer)
+    meta = {}
+    if population is not None:
+        for field in POPULATION_FIELDS:
+            arrays[f"population/{field}"] = getattr(population, field)
+        arrays["population/free"] = population._free[:population._num_free]
+        meta["population"] = {
+            "species": [_species_meta(c) for c in population.species_table],
+            "parameters": {name: getattr(population, name)
+                           for name in POPULATION_PARAMETERS},
+        }
+    if food_web is not None:
+        arrays["food_web/predators"] = food_web.predators
+        arrays["food_web/prey"] = food_web.prey
+        meta["food_web"] = {"names": food_web.names}
+    if rng is not None:
+        meta["rng"] = rng.bit_generator.state
+
+    return arrays, meta
+
+
+class Snapshot:
+    # State restored from a snapshot file. The grid layers & population
+    # arrays are copy-on-write memory maps of the file until modified
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict) -> None:
+        self.arrays = arrays
+        self.meta = meta
+        self.tick = meta["tick"]
+
+        self.grid = Grid.from_layers(
+            arrays["grid/x"], arrays["grid/y"],
+            {layer: arrays[f"grid/{layer}"] for layer in TILE_LAYERS})
+
+        self.population = None
+        if "population" in meta:
+            population = CreaturePopulation(
+                capacity=0, **meta["population"]["parameters"])
+            for species in meta["population"]["species"]:
+                population.add_species(Creature(
+                    species["affinities"], species["family"],
+                    species["progression_path"],
+                    creature_name=species["name"],
+                    speed=species["speed"], health=species["health"],
+                    energy=species["energy"],
+                    energy_recovery=species["energy_recovery"]))
+            for field in POPULATION_FIELDS:
+                setattr(population, field, arrays[f"population/{field}"])
+            population.capacity = len(population.alive)
+            free = arrays["population/free"]
+            population._free = np.empty(population.capacity, dtype=np.intp)
+            population._free[:len(free)] = free
+            population._num_free = len(free)
+            self.population = population
+
+        self.food_web = None
+        if "food_web" in meta:
+            self.food_web = FoodWeb(meta["food_web"]["names"], np.stack(
+                [arrays["food_web/predators"], arrays["food_web/prey"]],
+                axis=1))
+
+        self.rng = None
+        if "rng" in meta:
+            bit_generator = getattr(np.random,
+                                    meta["rng"]["bit_generator"])()
+            bit_generator.state = meta["rng"]
+            self.rng = np.random.Generator(bit_generator)
+
+
+def save_snapshot(path: str, grid: Grid, population: CreaturePopulation = None,
+                  food_web: FoodWeb = None, rng: np.random.Generator = None,
+                  tick=0):
+    # Write a full snapshot of the state to 'path'
+    arrays, meta = _state(grid, population, food_web, rng)
+    meta["kind"] = "full"
+    meta["tick"] = tick
+    write_arrays(path, arrays, meta)
+
+
+def save_delta(path: str, base_path: str, grid: Grid,
+               population: CreaturePopulation = None,
+               food_web: FoodWeb = None, rng: np.random.Generator = None,
+               tick=0):
+    # Write only the tiles and population slots that differ from the full
+    # snapshot at 'base_path' (read through memory mapping). The food web &
+    # RNG state are small and stored whole
+    base, _ = read_arrays(base_path, mode="r")
+    arrays, meta = _state(grid, population, food_web, rng)
+    meta["kind"] = "delta"
+    meta["tick"] = tick
+    meta["base"] = base_path
+    delta = {}
+
+    changed = np.zeros(grid.tile_shape, dtype=bool)
+    for layer in TILE_LAYERS:
+        changed |= getattr(grid, layer) != base[f"grid/{layer}"]
+    tiles = np.flatnonzero(changed)
+    delta["grid/changed"] = tiles
+    for layer in TILE_LAYERS:
+        delta[f"grid/{layer}"] = getattr(grid, layer).ravel()[tiles]
+
+    if population is not None:
+        # Slots beyond the base capacity (the population grew) all count
+        base_capacity = len(base["population/alive"])
+        shared = min(base_capacity, population.capacity)
+        changed = np.zeros(population.capacity, dtype=bool)
+        changed[shared:] = True
+        for field in POPULATION_FIELDS:
+            difference = getattr(population, field)[:shared] !=\
+                base[f"population/{field}"][:shared]
+            if difference.ndim > 1:
+                difference = difference.any(axis=1)
+            changed[:shared] |= difference
+        slots = np.flatnonzero(changed)
+        delta["population/changed"] = slots
+        for field in POPULATION_FIELDS:
+            delta[f"population/{field}"] = getattr(population, field)[slots]
+        delta["population/free"] = arrays["population/free"]
+        meta["population"]["capacity"] = population.capacity
+
+    if food_web is not None:
+        delta["food_web/predators"] = arrays["food_web/predators"]
+        delta["food_web/prey"] = arrays["food_web/prey"]
+
+    write_arrays(path, delta, meta)
+
+
+def load_snapshot(path: str, delta_path: str = None) -> Snapshot:
+    # Restore a full snapshot, then apply the delta at 'delta_path' if given
+    arrays, meta = read_arrays(path)
+    if delta_path is None:
+        return Snapshot(arrays, meta)
+
+    delta, delta_meta = read_arrays(delta_path)
+    tiles = delta["grid/changed"]
+    for layer in TILE_LAYERS:
+        array = np.array(arrays[f"grid/{layer}"])
+        array.ravel()[tiles] = delta[f"grid/{layer}"]
+        arrays[f"grid/{layer}"] = array
+
+    if "population" in delta_meta:
+        capacity = delta_meta["population"]["capacity"]
+        slots = delta["population/changed"]
+        for field, (dtype, shape, empty) in POPULATION_FIELDS.items():
+            array = np.full((capacity, *shape), empty, dtype=dtype)
+            base = arrays[f"population/{field}"][:capacity]
+            array[:len(base)] = base
+            array[slots] = delta[f"population/{field}"]
+            arrays[f"population/{field}"] = array
+        arrays["population/free"] = delta["population/free"]
+
+    for name in ("food_web/predators", "food_web/prey"):
+        if name in delta:
+            arrays[name] = delta[name]
+    delta_meta = dict(delta_meta)
+    del delta_meta["base"]
+    return Snapshot(arrays, delta_meta)
@@ -0,0 +1,222 @@
+# Shared multi-source distance & flow fields over a Grid, so any number of
+# creatures can head for the nearest resource with one array lookup
+import numpy as np
+from typing import List, Tuple
+
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.tile import FoodTile, WaterTile
+from ecosystems.simulation.regrowth import DEPLETED, REGROWN, SPAWNED
+
+
+# Resource types with a field
+FOOD = "food"
+WATER = "water"
+CARCASS = "carcass"
+# 8-connected tile steps (di, dj)
+STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def resource_mask(grid: Grid, resource: str) -> np.ndarray:
+    # Tiles that are sources of 'resource'. Carcasses aren't tiles, their
+    # field starts empty and sources are added as they appear
+    if resource == FOOD:
+        return (grid.tile_type == FoodTile.code) & (grid.food_quantity > 0.)
+    if resource == WATER:
+        return grid.tile_type == WaterTile.code
+    if resource == CARCASS:
+        return np.zeros(grid.tile_shape, dtype=bool)
+    raise ValueError(f"Unknown resource '{resource}'")
+
+
+def _shift_slices(step: Tuple[int, int],
+                  shape: Tuple[int, int]) -> Tuple[Tuple, Tuple]:
+    # (destination, source) slices of an array of 'shape' where each
+    # destination tile is the source tile moved by 'step'
+    (di, dj), (h, w) = step, shape
+    destination = (slice(max(di, 0), h + min(di, 0)),
+                   slice(max(dj, 0), w + min(dj, 0)))
+    source = (slice(max(-di, 0), h + min(-di, 0)),
+              slice(max(-dj, 0), w + min(-dj, 0)))
+    return destination, source
+
+
+def _bounds(mask: np.ndarray, margin: int) -> Tuple[slice, slice]:
+    # Bounding box of 'mask' grown by 'margin' tiles, clipped to the array.
+    # 'mask' must have a True entry
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    return (slice(max(rows[0] - margin, 0),
+                  min(rows[-1] + margin + 1, mask.shape[0])),
+            slice(max(cols[0] - margin, 0),
+                  min(cols[-1] + margin + 1, mask.shape[1])))
+
+
+class FlowField:
+    # Shortest 8-connected path 'distance' (world units, inf if unreachable
+    # or beyond 'max_distance') from every tile to its 'nearest' source tile
+    # (flat index, -1 for none) through 'passable' tiles, with the unit
+    # 'direction' of the next step along that path. Sources can be added or
+    # removed and only the affected tiles are relaxed again, wavefront by
+    # wavefront within the bounding box of the tiles that changed
+    def __init__(self, grid: Grid, sources: np.ndarray = None,
+                 passable: np.ndarray = None, max_distance=np.inf) -> None:
+        self.grid = grid
+        self.max_distance = max_distance
+        shape = grid.tile_shape
+        self.passable = np.ones(shape, dtype=bool) if passable is None else\
+            np.asarray(passable, dtype=bool)
+        self.sources = np.zeros(shape, dtype=bool)
+        self.distance = np.full(shape, np.inf, dtype=np.float32)
+        self.nearest = np.full(shape, -1, dtype=np.intp)
+        self._direction = np.zeros((*shape, 2), dtype=np.float32)
+        self._dirty = np.zeros(shape, dtype=bool)
+
+        dx, dy = abs(grid.dx), abs(grid.dy)
+        self._costs = [np.float32(np.hypot(di * dx, dj * dy))
+                       for di, dj in STEPS]
+        self._unit_steps = np.array([(di * dx / cost, dj * dy / cost)
+                                     for (di, dj), cost in
+                                     zip(STEPS, self._costs)],
+                                    dtype=np.float32)
+        # Tiles a change can reach, for bounding invalidation
+        self._reach = int(np.ceil(max_distance / min(dx, dy)))\
+            if np.isfinite(max_distance) else max(shape)
+        if sources is not None:
+            self.add_sources(np.flatnonzero(sources))
+
+    @classmethod
+    def for_resource(cls, grid: Grid, resource: str, **kwargs) -> "FlowField":
+        # Field to 'resource' through the grid's passable tiles
+        kwargs.setdefault("passable", grid.passable)
+        return cls(grid, resource_mask(grid, resource), **kwargs)
+
+    def _relax(self, frontier: np.ndarray):
+        # Propagate distances out from the 'frontier' tiles until nothing
+        # improves. 'frontier' is modified
+        distance, nearest = self.distance, self.nearest
+        while frontier.any():
+            window = _bounds(frontier, 1)
+            d, n = distance[window], nearest[window]
+            f, p = frontier[window], self.passable[window]
+            changed = np.zeros_like(f)
+            for step, cost in zip(STEPS, self._costs):
+                dst, src = _shift_slices(step, d.shape)
+                candidate = np.where(f[src], d[src] + cost, np.inf)
+                better = (candidate < d[dst]) & p[dst] &\
+                    (candidate <= self.max_distance)
+                if not better.any():
+                    continue
+                d[dst][better] = candidate[better]
+                n[dst][better] = n[src][better]
+                changed[dst] |= better
+            frontier[window] = changed
+            self._dirty[window] |= changed
+
+    def add_sources(self, tiles: np.ndarray):
+        # Make flat 'tiles' sources
+        tiles = np.asarray(tiles, dtype=np.intp)
+        tiles = tiles[~self.sources.ravel()[tiles] &
+                      self.passable.ravel()[tiles]]
+        if not len(tiles):
+            return
+        self.sources.ravel()[tiles] = True
+        self.distance.ravel()[tiles] = 0.
+        self.nearest.ravel()[tiles] = tiles
+        self._dirty.ravel()[tiles] = True
+        frontier = np.zeros_like(self.sources)
+        frontier.ravel()[tiles] = True
+        self._relax(frontier)
+
+    def remove_sources(self, tiles: np.ndarray):
+        # Stop flat 'tiles' being sources. Tiles that were closest to them
+        # are reset, then refilled from the valid tiles around them
+        tiles = np.asarray(tiles, dtype=np.intp)
+        tiles = tiles[self.sources.ravel()[tiles]]
+        if not len(tiles):
+            return
+        self.sources.ravel()[tiles] = False
+        removed = np.zeros(self.sources.size + 1, dtype=bool)
+        removed[tiles] = True  # removed[-1] stays False for 'nearest' -1
+
+        region = np.zeros_like(self.sources)
+        region.ravel()[tiles] = True
+        window = _bounds(region, self._reach)
+        invalid = removed[self.nearest[window]]
+        self.distance[window][invalid] = np.inf
+        self.nearest[window][invalid] = -1
+        self._dirty[window] |= invalid
+
+        # Tiles next to the reset ones that still have a source
+        frontier = np.zeros_like(self.sources)
+        grown = frontier[window]
+        for step in STEPS:
+            dst, src = _shift_slices(step, invalid.shape)
+            grown[dst] |= invalid[src]
+        grown &= ~invalid & np.isfinite(self.distance[window])
+        self._relax(frontier)
+
+    def set_sources(self, sources: np.ndarray):
+        # Recompute from scratch with a new source mask
+        self.remove_sources(np.flatnonzero(self.sources))
+        self.add_sources(np.flatnonzero(sources))
+
+    def apply_events(self, events: List[Tuple[int, np.ndarray]]):
+        # Update a food field from RegrowthScheduler events in order
+        for kind, tiles in events:
+            if kind == DEPLETED:
+                self.remove_sources(tiles)
+            elif kind in (REGROWN, SPAWNED):
+                self.add_sources(tiles)
+
+    @property
+    def direction(self) -> np.ndarray:
+        # (nx, ny, 2) unit step towards the nearest source, zero on sources
+        # and unreachable tiles. Only tiles near changes are recomputed
+        if self._dirty.any():
+            window = _bounds(self._dirty, 1)
+            self._dirty[:] = False
+            d = self.distance[window]
+            (r0, r1), (c0, c1) = [(w.start, w.stop) for w in window]
+            # Neighbours outside the window are read from an inf-padded halo
+            nx, ny = d.shape
+            halo = np.full((nx + 2, ny + 2), np.inf, dtype=np.float32)
+            h0, h1 = max(r0 - 1, 0), min(r1 + 1, self.distance.shape[0])
+            k0, k1 = max(c0 - 1, 0), min(c1 + 1, self.distance.shape[1])
+            halo[h0 - r0 + 1:h1 - r0 + 1, k0 - c0 + 1:k1 - c0 + 1] =\
+                self.distance[h0:h1, k0:k1]
+
+            # Unreachable tiles keep 'best' at -inf so no step is better
+            best = np.where(np.isfinite(d), np.float32(np.inf),
+                            np.float32(-np.inf))
+            direction = np.zeros((*d.shape, 2), dtype=np.float32)
+            for unit_step, (di, dj), cost in zip(self._unit_steps, STEPS,
+                                                 self._costs):
+                neighbour = halo[1 + di:1 + di + nx, 1 + dj:1 + dj + ny]
+                better = (neighbour < d) & (neighbour + cost < best)
+                best[better] = neighbour[better] + cost
+                direction[better] = unit_step
+            self._direction[window] = direction
+        return self._direction
+
+    def distance_at(self, points: np.ndarray) -> np.ndarray:
+        tiles = self.grid.tile_idxs(points)
+        return self.distance[tiles[:, 0], tiles[:, 1]]
+
+    def direction_at(self, points: np.ndarray) -> np.ndarray:
+        tiles = self.grid.tile_idxs(points)
+        return self.direction[tiles[:, 0], tiles[:, 1]]
+
+    def targets(self, points: np.ndarray) -> np.ndarray:
+        # Position (N, 2) for creatures at 'points' to seek: one tile along
+        # the field, or the tile centre on a source. NaN if out of reach
+        grid = self.grid
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        tiles = grid.tile_idxs(points)
+        i, j = tiles[:, 0], tiles[:, 1]
+        target = points + self.direction[i, j] *\
+            np.array([abs(grid.dx), abs(grid.dy)])
+        on_source = self.sources[i, j]
+        target[on_source, 0] = grid.x[i[on_source]] + 0.5 * grid.dx
+        target[on_source, 1] = grid.y[j[on_source]] + 0.5 * grid.dy
+        target[~np.isfinite(self.distance[i, j])] = np.nan
+        return target
@@ -0,0 +1,319 @@
+# Island-level simulation: regions stepped in parallel worker processes,
+# exchanging migrating creatures along the island's region graph
+import multiprocessing as mp
+import numpy as np
+import traceback
+from typing import Dict, List, Tuple
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.food_web import FoodWeb
+from ecosystems.simulation.lod import RegionSimulation, food_web_edges
+from ecosystems.simulation.routing import IslandRouter
+
+
+class WorkerError(RuntimeError):
+    # A worker process failed, with the worker's traceback as the message
+    pass
+
+
+class MigrantBatch:
+    # Creatures travelling to one region, as compact arrays: species IDs
+    # (shared by every region on the island) and an (N, 7) float32 array of
+    # their NEED_FIELDS + TRAIT_FIELDS values
+    def __init__(self, species: np.ndarray, values: np.ndarray) -> None:
+        self.species = species
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.species)
+
+    @classmethod
+    def concatenate(cls, batches: List["MigrantBatch"]) -> "MigrantBatch":
+        return cls(np.concatenate([b.species for b in batches]),
+                   np.concatenate([b.values for b in batches]))
+
+
+def combine_food_webs(food_webs: List[Tuple[Dict, object]]
+                      ) -> Tuple[List[Creature], np.ndarray]:
+    # Merge several region_food_web outputs (creatures, food web) into one
+    # species list and (S, S) predation matrix so species IDs are shared
+    # across regions. Creature names must be unique across the webs
+    species = []
+    for creatures, _ in food_webs:
+        species.extend(creatures["Prey"] + creatures["Middle"] +
+                       creatures["Apex"])
+    ids = {creature.name: i for i, creature in enumerate(species)}
+    if len(ids) != len(species):
+        raise ValueError("Creature names must be unique across food webs")
+
+    eats = np.zeros((len(species), len(species)), dtype=bool)
+    offset = 0
+    for creatures, food_web in food_webs:
+        if isinstance(food_web, FoodWeb):
+            # Species IDs follow the Prey, Middle, Apex order
+            eats[offset + food_web.predators, offset + food_web.prey] = True
+        else:
+            for predator, prey in food_web_edges(food_web):
+                eats[ids[predator], ids[prey]] = True
+        offset += len(creatures["Prey"] + creatures["Middle"] +
+                      creatures["Apex"])
+
+    return species, eats
+
+
+def balance_shards(loads: Dict[str, float], num_shards: int) -> List[List[str]]:
+    # Split regions into 'num_shards' groups of similar total load, greedily
+    # giving the heaviest remaining region to the lightest shard
+    shards = [[] for _ in range(num_shards)]
+    totals = np.zeros(num_shards)
+    for name in sorted(loads, key=lambda name: (-loads[name], name)):
+        shard = int(np.argmin(totals))
+        shards[shard].append(name)
+        totals[shard] += loads[name]
+
+    return shards
+
+
+def step_shard(regions: Dict[str, RegionSimulation],
+               routes: Dict[str, List[str]],
+               incoming: Dict[str, MigrantBatch], dt: float,
+               migration_rate: float
+               ) -> Tuple[Dict[str, Dict[str, MigrantBatch]],
+                          Dict[str, float]]:
+    # Deliver 'incoming' migrants, step every region, then pick emigrants
+    # and their destination regions (uniformly over outgoing edges).
+    # Returns the migrants per destination per source region and each
+    # region's load
+    outgoing = {}
+    loads = {}
+    for name, region in regions.items():
+        if name in incoming:
+            batch = incoming[name]
+            with region.profiler.phase("migration"):
+                region.immigrate(batch.species, batch.values)
+            region.profiler.count("immigrants", len(batch))
+        region.step(dt)
+
+        destinations = routes[name]
+        if destinations and migration_rate > 0.:
+            with region.profiler.phase("migration"):
+                species, values = region.emigrate(migration_rate)
+            region.profiler.count("emigrants", len(species))
+            rng = region._rng("destination")
+            choice = rng.integers(0, len(destinations), len(species))
+            for k in np.unique(choice):
+                leaving = choice == k
+                outgoing.setdefault(destinations[k], {}).setdefault(
+                    name, []).append(MigrantBatch(species[leaving],
+                                                  values[leaving]))
+        loads[name] = float(region.counts().sum())
+
+    return {destination: {source: MigrantBatch.concatenate(batches)
+                          for source, batches in sources.items()}
+            for destination, sources in outgoing.items()}, loads
+
+
+def _merge_migrants(sources: Dict[str, MigrantBatch]) -> MigrantBatch:
+    # One batch per destination, ordered by source region so arrivals don't
+    # depend on how regions are sharded
+    return MigrantBatch.concatenate([sources[name] for name in sorted(sources)])
+
+
+def _worker(connection, regions: Dict[str, RegionSimulation],
+            routes: Dict[str, List[str]], migration_rate: float):
+    # Worker process loop, owns the regions of one shard. An exception is
+    # sent back as a WorkerError (read in place of the next reply) and ends
+    # the worker
+    try:
+        while True:
+            command, payload = connection.recv()
+            if command == "step":
+                dt, incoming = payload
+                connection.send(step_shard(regions, routes, incoming, dt,
+                                           migration_rate))
+            elif command == "add":
+                regions.update(payload)
+            elif command == "routes":
+                routes.clear()
+                routes.update(payload)
+            elif command == "remove":
+                connection.send({name: regions.pop(name)
+                                 for name in payload})
+            elif command == "collect":
+                connection.send(regions)
+            elif command == "stop":
+                break
+    except Exception:
+        connection.send(WorkerError(traceback.format_exc()))
+    connection.close()
+
+
+class IslandSimulation:
+    # Steps every region on the 'island' graph (nodes are Regions, edges are
+    # allowed migrations, one-way edges included) each tick. Regions are
+    # sharded across 'num_workers' processes balanced by population and
+    # re-balanced every 'rebalance_every' ticks. Migrants picked during a
+    # tick are delivered at the start of the next one. With 0 workers
+    # everything runs in this process. Edges can be closed with set_edge().
+    # A worker failing raises WorkerError here, after which the simulation
+    # can only be closed
+    def __init__(self, island, regions: Dict[str, RegionSimulation],
+                 num_workers=None, migration_rate=0.001,
+                 rebalance_every=100) -> None:
+        self.regions = regions
+        self.router = IslandRouter(island)
+        self._edges = [(str(source), str(destination))
+                       for source, destination in island.edges()]
+        self.routes = self._open_routes()
+        self.migration_rate = migration_rate
+        self.rebalance_every = rebalance_every
+        self.num_workers = mp.cpu_count() if num_workers is None\
+            else num_workers
+        self.num_workers = min(self.num_workers, len(regions))
+        self.tick = 0
+        self.loads = {name: float(region.counts().sum())
+                      for name, region in regions.items()}
+        self._incoming: Dict[str, MigrantBatch] = {}
+        self._workers = []
+        self._connections = []
+        self._shard_of: Dict[str, int] = {}
+        self._failed = False
+
+    def _open_routes(self) -> Dict[str, List[str]]:
+        # Destinations of each region's open outgoing edges
+        routes = {name: [] for name in self.regions}
+        for source, destination in self._edges:
+            if self.router.is_open(source, destination):
+                routes[source].append(destination)
+        return routes
+
+    def set_edge(self, source: str, destination: str, open=True):
+        # Open or close migration from 'source' to 'destination'
+        if not self.router.set_edge(source, destination, open):
+            return
+        self.routes = self._open_routes()
+        for connection in self._connections:
+            self._send(connection, ("routes", self.routes))
+
+    def start(self):
+        # Launch the worker processes, each owning one shard of regions
+        if not self.num_workers or self._workers:
+            return
+        shards = balance_shards(self.loads, self.num_workers)
+        for k, shard in enumerate(shards):
+            parent, child = mp.Pipe()
+            worker = mp.Process(target=_worker, daemon=True,
+                                args=(child, {name: self.regions[name]
+                                              for name in shard},
+                                      self.routes, self.migration_rate))
+            worker.start()
+            # Only the worker holds its end, so reads fail once it exits
+            child.close()
+            self._workers.append(worker)
+            self._connections.append(parent)
+            for name in shard:
+                self._shard_of[name] = k
+
+    def _send(self, connection, message: Tuple):
+        try:
+            connection.send(message)
+        except OSError:
+            # The worker is gone, raise its error if it sent one
+            self._recv(connection)
+            raise
+
+    def _recv(self, connection):
+        # Next reply from a worker, raising the worker's error instead if it
+        # failed
+        try:
+            reply = connection.recv()
+        except EOFError:
+            self._failed = True
+            raise WorkerError("Worker process exited unexpectedly") from None
+        if isinstance(reply, WorkerError):
+            self._failed = True
+            raise reply
+        return reply
+
+    def _rebalance(self):
+        # Move regions whose best shard has changed between workers
+        shards = balance_shards(self.loads, self.num_workers)
+        moves = {}
+        for k, shard in enumerate(shards):
+            for name in shard:
+                if self._shard_of[name] != k:
+                    moves[name] = (self._shard_of[name], k)
+        if not moves:
+            return
+
+        for source in set(source for source, _ in moves.values()):
+            self._send(self._connections[source], (
+                "remove", [name for name, (s, _) in moves.items()
+                            if s == source]))
+        moved = {}
+        for source in set(source for source, _ in moves.values()):
+            moved.update(self._recv(self._connections[source]))
+        for target in set(target for _, target in moves.values()):
+            self._send(self._connections[target], (
+                "add", {name: moved[name] for name, (_, t) in moves.items()
+                        if t == target}))
+        for name, (_, target) in moves.items():
+            self._shard_of[name] = target
+
+    def step(self, dt=1.):
+        # Advance every region one tick, then exchange migrants
+        incoming = self._incoming
+        if not self.num_workers:
+            outgoing, self.loads = step_shard(self.regions, self.routes,
+                                              incoming, dt,
+                                              self.migration_rate)
+        else:
+            self.start()
+            for k, connection in enumerate(self._connections):
+                self._send(connection, ("step", (dt, {
+                    name: batch for name, batch in incoming.items()
+                    if self._shard_of[name] == k})))
+            outgoing = {}
+            for connection in self._connections:
+                shard_outgoing, loads = self._recv(connection)
+                self.loads.update(loads)
+                for name, sources in shard_outgoing.items():
+                    outgoing.setdefault(name, {}).update(sources)
+
+        self._incoming = {name: _merge_migrants(sources)
+                          for name, sources in outgoing.items()}
+        self.tick += 1
+        if self.num_workers and self.tick % self.rebalance_every == 0:
+            self._rebalance()
+
+    def collect(self) -> Dict[str, RegionSimulation]:
+        # Pull the current state of every region back from the workers
+        for connection in self._connections:
+            self._send(connection, ("collect", None))
+        for connection in self._connections:
+            self.regions.update(self._recv(connection))
+        return self.regions
+
+    def close(self):
+        # Collect the regions (unless a worker failed) and stop the workers
+        try:
+            if self._workers and not self._failed:
+                self.collect()
+        finally:
+            for connection in self._connections:
+                try:
+                    connection.send(("stop", None))
+                except OSError:
+                    pass
+                connection.close()
+            for worker in self._workers:
+                worker.join()
+            self._workers = []
+            self._connections = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,412 @@
+# Level-of-detail region simulation: full agents while a region is on
+# screen, an aggregate population model while it is off screen
+import numpy as np
+from typing import Dict, List, Tuple
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.food_web import FoodWeb
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.probability import Sampler
+from ecosystems.generation.tile import FoodTile, WaterTile
+from ecosystems.simulation.boids import species_weights, steer
+from ecosystems.simulation.carcass import CarcassPool
+from ecosystems.simulation.flow_field import CARCASS, FlowField, FOOD, WATER
+from ecosystems.simulation.movement import BOUNCE, integrate
+from ecosystems.simulation.population import (CreaturePopulation, HUNTING,
+                                              NEED_FIELDS, SLEEPING,
+                                              THIRSTY, TRAIT_FIELDS)
+from ecosystems.simulation.predation import (HuntResult, nearest_prey,
+                                             resolve_hunts)
+from ecosystems.simulation.profiler import TickProfiler
+from ecosystems.simulation.regrowth import RegrowthScheduler
+from ecosystems.simulation.spatial import neighbour_pairs, SpatialHash
+
+
+AGENT_MODE = "agent"
+AGGREGATE_MODE = "aggregate"
+
+
+def food_web_edges(food_web) -> List[Tuple[str, str]]:
+    # (predator name, prey name) pairs from a FoodWeb or a predator -> prey
+    # graph of Creatures
+    if isinstance(food_web, FoodWeb):
+        return food_web.edges()
+    return [(predator.name, prey.name) for predator, prey in food_web.edges()]
+
+
+class AggregateModel:
+    # Generalised Lotka-Volterra model over species counts:
+    # dN/dt = N * (r + A N). Species that hunt nothing grow logistically,
+    # predators die off without prey and gain from what they eat
+    def __init__(self, counts: np.ndarray, growth: np.ndarray,
+                 interaction: np.ndarray) -> None:
+        self.counts = np.asarray(counts, dtype=float)
+        self.growth = np.asarray(growth, dtype=float)
+        self.interaction = np.asarray(interaction, dtype=float)
+
+    @classmethod
+    def from_food_web(cls, eats: np.ndarray, counts: np.ndarray,
+                      prey_growth=0.1, predator_death=0.05, attack_rate=0.01,
+                      efficiency=0.1, carrying_capacity=100.):
+        # Build the model from a (S, S) predation matrix, True where species
+        # 'i' hunts species 'j'
+        eats = np.asarray(eats, dtype=float)
+        is_predator = eats.any(axis=1)
+        growth = np.where(is_predator, -predator_death, prey_growth)
+        interaction = efficiency * attack_rate * eats -\
+            attack_rate * eats.T
+        interaction[np.diag_indices_from(interaction)] -=\
+            np.abs(growth) / carrying_capacity
+        return cls(counts, growth, interaction)
+
+    def step(self, dt=1., substeps=1):
+        # Integrate forward by 'dt' with explicit Euler substeps
+        h = dt / substeps
+        counts = self.counts
+        for _ in range(substeps):
+            counts += h * counts * (self.growth + self.interaction @ counts)
+            np.maximum(counts, 0., out=counts)
+
+
+def _largest_remainder(counts: np.ndarray) -> np.ndarray:
+    # Round non-negative 'counts' to integers preserving the rounded total,
+    # giving the extra units to the largest remainders (lowest ID on ties)
+    whole = np.floor(counts).astype(np.int64)
+    remainder = counts - whole
+    extra = int(round(remainder.sum()))
+    order = np.argsort(-remainder, kind="stable")
+    whole[order[:extra]] += 1
+    return whole
+
+
+class RegionSimulation:
+    # Simulates one region's ecosystem on its own 'grid' at the level of
+    # detail the player needs. Switching modes converts between agents and
+    # counts deterministically from 'seed', the current tick and the state
+    def __init__(self, name: str, grid: Grid, species: List[Creature],
+                 eats: np.ndarray, counts, on_screen=False, seed=0,
+                 flock_radius=5., flee_radius=10., forage_radius=15.,
+                 bite=2., food_value=5., drink_value=25., carcass_meat=50.,
+                 carcass_decay=100., scavengers=None, hunt_reach=1.,
+                 hunt_damage=40., boundary=BOUNCE,
+                 profiler: TickProfiler = None, **aggregate_kwargs) -> None:
+        self.name = name
+        self.grid = grid
+        self.seed = seed
+        self.sampler = Sampler(seed).spawn(name)
+        self.tick = 0
+        self.flock_radius = flock_radius
+        self.flee_radius = flee_radius
+        self.forage_radius = forage_radius
+        self.bite = bite
+        self.food_value = food_value
+        self.drink_value = drink_value
+        self.carcass_meat = carcass_meat
+        self.hunt_reach = hunt_reach
+        self.hunt_damage = hunt_damage
+        self.boundary = boundary
+        # Disabled unless one is given
+        self.profiler = profiler if profiler is not None else\
+            TickProfiler(enabled=False)
+        if not self.profiler.name:
+            self.profiler.name = self.name
+
+        self.population = CreaturePopulation()
+        for creature in species:
+            self.population.add_species(creature)
+        self.eats = np.asarray(eats, dtype=bool)
+        # Creatures that don't hunt eat from food tiles
+        self.foragers = ~self.eats.any(axis=1)
+        # Creatures that eat carcasses, by default the ones that hunt
+        self.scavengers = ~self.foragers if scavengers is None else\
+            np.asarray(scavengers, dtype=bool)
+        self.weights = species_weights(self.population.species_table)
+        self.index = SpatialHash(grid)
+        self.regrowth = RegrowthScheduler(grid, rng=self._rng("regrowth"))
+        self.food_field = FlowField.for_resource(grid, FOOD,
+                                                 max_distance=forage_radius)
+        self.water_field = FlowField.for_resource(grid, WATER,
+                                                  max_distance=forage_radius)
+        self.carcasses = CarcassPool(grid, decay_time=carcass_decay)
+        self.carcass_field = FlowField.for_resource(
+            grid, CARCASS, max_distance=forage_radius)
+
+        self.aggregate = AggregateModel.from_food_web(self.eats, counts,
+                                                      **aggregate_kwargs)
+        # Fractional creatures left over from the last promotion
+        self._residual = np.zeros(len(species))
+        self.mode = AGGREGATE_MODE
+        if on_screen:
+            self.promote()
+
+    @classmethod
+    def from_food_web(cls, name: str, grid: Grid, creatures: Dict,
+                      food_web, counts, **kwargs):
+        # Build from the output of region_food_web, 'counts' per species in
+        # the order of creatures["Prey"] + creatures["Middle"] +
+        # creatures["Apex"]
+        species = creatures["Prey"] + creatures["Middle"] + creatures["Apex"]
+        if isinstance(food_web, FoodWeb):
+            # Species IDs are already in this order
+            eats = food_web.eats.copy()
+        else:
+            ids = {creature.name: i for i, creature in enumerate(species)}
+            eats = np.zeros((len(species), len(species)), dtype=bool)
+            for predator, prey in food_web_edges(food_web):
+                eats[ids[predator], ids[prey]] = True
+
+        return cls(name, grid, species, eats, counts, **kwargs)
+
+    def _rng(self, purpose: str) -> np.random.Generator:
+        # Generator that only depends on the region seed, tick & 'purpose'
+        return self.sampler.spawn(f"{purpose}/{self.tick}").rng
+
+    @property
+    def on_screen(self) -> bool:
+        return self.mode == AGENT_MODE
+
+    def counts(self) -> np.ndarray:
+        # Creatures per species in either representation
+        if self.mode == AGENT_MODE:
+            return self._agent_counts()
+        return self.aggregate.counts.copy()
+
+    def _agent_counts(self) -> np.ndarray:
+        # Agents plus the fractions left from promotion. A species rounded
+        # up has a negative fraction, which can't go below no creatures once
+        # its agents die out
+        return np.maximum(self.population.counts() + self._residual, 0.)
+
+    def _points_in(self, tiles: np.ndarray, n: int,
+                   rng: np.random.Generator) -> np.ndarray:
+        # 'n' uniformly random positions (n, 2) in random flat 'tiles'
+        grid = self.grid
+        i, j = np.unravel_index(rng.choice(tiles, n), grid.tile_shape)
+        return np.column_stack([grid.x[i], grid.y[j]]) +\
+            rng.random((n, 2)) * np.array([grid.dx, grid.dy])
+
+    def promote(self):
+        # Aggregate -> agents, when the player enters the region
+        if self.mode == AGENT_MODE:
+            return
+        rng = self._rng("promote")
+        counts = self.aggregate.counts
+        whole = _largest_remainder(counts)
+        self._residual = counts - whole
+        species = np.repeat(np.arange(len(whole)), whole)
+        # Uniformly over the passable tiles
+        position = self._points_in(np.flatnonzero(self.grid.passable),
+                                   len(species), rng)
+        slots = self.population.spawn(species, position)
+        # Stagger needs so the new creatures don't all act in lockstep
+        for need in NEED_FIELDS:
+            getattr(self.population, need)[slots] = rng.uniform(
+                50., 100., len(slots))
+        self.mode = AGENT_MODE
+
+    def demote(self):
+        # Agents -> aggregate, when the player leaves the region
+        if self.mode == AGGREGATE_MODE:
+            return
+        self.aggregate.counts = self._agent_counts()
+        self._residual = np.zeros_like(self._residual)
+        self.population.kill(self.population.active)
+        self.carcasses.clear()
+        self.carcass_field.apply_events(self.carcasses.drain_events())
+        self.mode = AGGREGATE_MODE
+
+    def set_on_screen(self, on_screen: bool):
+        if on_screen:
+            self.promote()
+        else:
+            self.demote()
+
+    def emigrate(self, fraction: float) -> Tuple[np.ndarray, np.ndarray]:
+        # Remove about 'fraction' of the region's creatures (none asleep) to
+        # send elsewhere. Returns their species IDs and an (N, 7) array of
+        # their NEED_FIELDS + TRAIT_FIELDS values
+        rng = self._rng("emigrate")
+        population = self.population
+        fields = NEED_FIELDS + TRAIT_FIELDS
+        if self.mode == AGENT_MODE:
+            slots = population.active
+            slots = slots[(population.state[slots] != SLEEPING) &
+                          (rng.random(len(slots)) < fraction)]
+            species = population.species[slots]
+            values = np.stack([getattr(population, field)[slots]
+                               for field in fields], axis=1)
+            population.kill(slots)
+        else:
+            leaving = rng.binomial(
+                np.floor(self.aggregate.counts).astype(np.int64), fraction)
+            self.aggregate.counts -= leaving
+            species = np.repeat(np.arange(len(leaving)),
+                                leaving).astype(np.int32)
+            values = np.empty((len(species), len(fields)), dtype=np.float32)
+            values[:, :len(NEED_FIELDS)] = 100.
+            values[:, len(NEED_FIELDS):] = population._species_traits[species]
+
+        return species, values
+
+    def immigrate(self, species: np.ndarray, values: np.ndarray):
+        # Add creatures arriving from another region, as returned by
+        # emigrate(). Agents arrive at a random point in a tile on the
+        # region's edge they can move from, anywhere passable if the whole
+        # edge is blocked
+        if not len(species):
+            return
+        if self.mode == AGGREGATE_MODE:
+            self.aggregate.counts += np.bincount(
+                species, minlength=len(self.aggregate.counts))
+            return
+
+        # Tiles creatures can move out of, on the edge if there are any
+        grid = self.grid
+        open_tiles = grid.passable & (grid.speed_multiplier > 0.)
+        edge = np.zeros(grid.tile_shape, dtype=bool)
+        edge[[0, -1], :] = True
+        edge[:, [0, -1]] = True
+        for candidates in (open_tiles & edge, open_tiles, grid.passable):
+            tiles = np.flatnonzero(candidates)
+            if len(tiles):
+                break
+        position = self._points_in(tiles, len(species),
+                                   self._rng("immigrate"))
+        fields = NEED_FIELDS + TRAIT_FIELDS
+        self.population.spawn(species, position,
+                              **{field: values[:, k]
+                                 for k, field in enumerate(fields)})
+
+    def _forage(self):
+        # Hungry foragers eat from the food tile they're on, or follow the
+        # food flow field towards the nearest food tile in range. Returns
+        # their food targets
+        population = self.population
+        grid = self.grid
+        food_target = np.full((population.capacity, 2), np.nan)
+        slots = population.active
+        slots = slots[(population.state[slots] == HUNTING) &
+                      self.foragers[population.species[slots]]]
+
+        tiles = grid.tile_idxs(population.position[slots])
+        on_food = (grid.tile_type[tiles[:, 0], tiles[:, 1]] ==
+                   FoodTile.code) &\
+            (grid.food_quantity[tiles[:, 0], tiles[:, 1]] > 0.)
+        eaten = self.regrowth.consume(tiles[on_food], self.bite)
+        population.eat(slots[on_food], eaten * self.food_value)
+
+        # Food depleted, regrown & spawned since the last update
+        self.food_field.apply_events(self.regrowth.drain_events())
+        searching = slots[~on_food]
+        food_target[searching] = self.food_field.targets(
+            population.position[searching])
+        return food_target
+
+    def _scavenge(self, target: np.ndarray):
+        # Hungry scavengers eat from a carcass on their tile, or follow the
+        # carcass flow field, their targets are written into 'target'
+        population = self.population
+        carcasses = self.carcasses
+        slots = population.active
+        slots = slots[(population.state[slots] == HUNTING) &
+                      self.scavengers[population.species[slots]]]
+        carcass = carcasses.on_tiles(population.position[slots])
+        at_carcass = carcass >= 0
+        eaten = carcasses.eat(carcass[at_carcass], self.bite)
+        population.eat(slots[at_carcass], eaten * self.food_value)
+
+        # Carcasses left, rotted & eaten since the last update
+        self.carcass_field.apply_events(carcasses.drain_events())
+        searching = slots[~at_carcass]
+        target[searching] = self.carcass_field.targets(
+            population.position[searching])
+
+    def _hunt(self) -> HuntResult:
+        # Resolve attacks by hunting predators within reach of prey, leaving
+        # carcasses for the kills
+        population = self.population
+        result = resolve_hunts(population, self.index, self.eats,
+                               reach=self.hunt_reach, damage=self.hunt_damage,
+                               carcass_meat=self.carcass_meat,
+                               food_value=self.food_value)
+        if len(result.killed):
+            self.carcasses.spawn(result.position, result.meat,
+                                 result.species)
+            self.index.build_population(population)
+        return result
+
+    def _chase(self, target: np.ndarray, pairs: Tuple):
+        # Send hunters without a carcass after the nearest prey in range,
+        # their targets are written into 'target'. Prey notice predators
+        # from as far as predators notice prey
+        population = self.population
+        prey, _ = nearest_prey(population, self.index, self.flee_radius,
+                               self.eats, pairs=pairs)
+        chasing = (prey >= 0) & np.isnan(target[:, 0])
+        target[chasing] = population.position[prey[chasing]]
+
+    def _drink(self, target: np.ndarray):
+        # Thirsty creatures drink from the water tile they're on, or follow
+        # the water flow field, their targets are written into 'target'
+        population = self.population
+        grid = self.grid
+        slots = population.active
+        slots = slots[population.state[slots] == THIRSTY]
+        tiles = grid.tile_idxs(population.position[slots])
+        on_water = grid.tile_type[tiles[:, 0], tiles[:, 1]] == WaterTile.code
+        population.drink(slots[on_water], self.drink_value)
+
+        searching = slots[~on_water]
+        target[searching] = self.water_field.targets(
+            population.position[searching])
+
+    def step(self, dt=1.):
+        # Advance the region by one tick in its current mode, timing each
+        # phase with the profiler
+        profiler = self.profiler
+        with profiler.tick():
+            if self.mode == AGENT_MODE:
+                population = self.population
+                with profiler.phase("needs"):
+                    dead = population.step(dt)
+                profiler.count("creatures", len(population) + len(dead))
+                profiler.count("deaths", len(dead))
+                with profiler.phase("carcasses"):
+                    profiler.count("carcasses_decayed",
+                                   self.carcasses.advance(dt))
+                    self.carcasses.spawn(population.position[dead],
+                                         self.carcass_meat,
+                                         population.species[dead])
+                with profiler.phase("regrowth"):
+                    profiler.count("tiles_regrown", self.regrowth.advance())
+                with profiler.phase("foraging"):
+                    target = self._forage()
+                with profiler.phase("scavenging"):
+                    self._scavenge(target)
+                with profiler.phase("drinking"):
+                    self._drink(target)
+                with profiler.phase("spatial_index"):
+                    self.index.build_population(population)
+                with profiler.phase("hunting"):
+                    hunts = self._hunt()
+                profiler.count("hunts_resolved", len(hunts))
+                profiler.count("kills", len(hunts.killed))
+                # One neighbour query for chasing, flocking & fleeing
+                with profiler.phase("neighbours"):
+                    pairs = neighbour_pairs(
+                        population, self.index,
+                        max(self.flock_radius, self.flee_radius))
+                with profiler.phase("chasing"):
+                    self._chase(target, pairs)
+                with profiler.phase("steering"):
+                    steer(population, self.index, dt=dt,
+                          radius=self.flock_radius,
+                          flee_radius=self.flee_radius,
+                          food_target=target, weights=self.weights,
+                          eats=self.eats, pairs=pairs)
+                with profiler.phase("movement"):
+                    integrate(population, self.grid, dt, self.boundary)
+            else:
+                with profiler.phase("aggregate"):
+                    self.aggregate.step(dt)
+        self.tick += 1
@@ -0,0 +1,68 @@
+# Vectorized movement of every creature over the Grid's terrain
+import numpy as np
+
+from ecosystems.generation.grid import Grid
+
+
+# Grid border handling
+BOUNCE = "bounce"  # reflect the velocity and clamp to the border
+CLAMP = "clamp"  # stop at the border
+WRAP = "wrap"  # come back in on the opposite side
+BOUNDARIES = (BOUNCE, CLAMP, WRAP)
+
+
+def _wrap_or_clamp(position: np.ndarray, velocity: np.ndarray,
+                   low: np.ndarray, high: np.ndarray, boundary: str):
+    # Apply 'boundary' to (N, 2) 'position' & 'velocity' in place
+    if boundary == WRAP:
+        position -= low
+        np.mod(position, high - low, out=position)
+        position += low
+        return
+    outside = (position < low) | (position > high)
+    if boundary == BOUNCE:
+        velocity[outside] *= -1.
+    else:
+        velocity[outside] = 0.
+    np.clip(position, low, high, out=position)
+
+
+def integrate(population, grid: Grid, dt=1., boundary=BOUNCE):
+    # Move every living creature by its velocity (already capped by its
+    # Creature speed when steering) scaled by the terrain speed multiplier
+    # of the tile it's on. Moves into impassable tiles slide along the
+    # blocking axis if possible and stop otherwise, with the velocity along
+    # a blocked axis zeroed. Creatures move less than a tile per step at
+    # normal speeds, so only the destination tile is checked
+    if boundary not in BOUNDARIES:
+        raise ValueError(f"Unknown boundary '{boundary}', "
+                         f"expected one of {BOUNDARIES}")
+    slots = population.active
+    position = population.position[slots]
+    velocity = population.velocity[slots]
+    tiles = grid.tile_idxs(position)
+    multiplier = grid.speed_multiplier[tiles[:, 0], tiles[:, 1]]
+    new_position = position + velocity * (multiplier * dt)[:, None]
+
+    low = np.array([grid.x.min(), grid.y.min()])
+    high = np.array([grid.x.max(), grid.y.max()])
+    _wrap_or_clamp(new_position, velocity, low, high, boundary)
+
+    blocked = ~grid.is_passable(new_position)
+    if blocked.any():
+        old, new = position[blocked], new_position[blocked]
+        # Try moving along x only, then along y only
+        along_x = np.column_stack([new[:, 0], old[:, 1]])
+        along_y = np.column_stack([old[:, 0], new[:, 1]])
+        x_free = grid.is_passable(along_x)
+        y_free = grid.is_passable(along_y) & ~x_free
+        resolved = np.where(x_free[:, None], along_x,
+                            np.where(y_free[:, None], along_y, old))
+        new_position[blocked] = resolved
+        blocked_velocity = velocity[blocked]
+        blocked_velocity[~x_free, 0] = 0.
+        blocked_velocity[~y_free, 1] = 0.
+        velocity[blocked] = blocked_velocity
+
+    population.position[slots] = new_position
+    population.velocity[slots] = velocity
@@ -0,0 +1,260 @@
+# Structure-of-arrays creature population for the simulation loop
+import numpy as np
+from typing import Dict, List, Tuple
+
+from ecosystems.generation.creature import Creature
+
+
+# Creature states (README "Creature Needs")
+IDLE = 0
+HUNTING = 1  # looking for food
+EATING = 2
+THIRSTY = 3  # looking for water
+DRINKING = 4
+SLEEPING = 5
+DEAD = 6
+
+# Per-creature arrays, name: (dtype, trailing shape, value of an empty slot)
+POPULATION_FIELDS = {
+    "alive": (np.bool_, (), False),
+    "species": (np.int32, (), -1),
+    "state": (np.int8, (), DEAD),
+    "position": (np.float64, (2,), 0.),
+    "velocity": (np.float64, (2,), 0.),
+    # Needs, all go from [0, 100]
+    "hunger": (np.float32, (), 100.),
+    "thirst": (np.float32, (), 100.),
+    "sleep": (np.float32, (), 100.),
+    # Traits
+    "speed": (np.float32, (), 1.),
+    "health": (np.float32, (), 100.),
+    "energy": (np.float32, (), 100.),
+    "energy_recovery": (np.float32, (), 1.),
+}
+TRAIT_FIELDS = ("speed", "health", "energy", "energy_recovery")
+NEED_FIELDS = ("hunger", "thirst", "sleep")
+
+
+def species_key(creature: Creature) -> Tuple:
+    # What makes two Creatures the same species (mixed families are lists)
+    family = creature.family
+    if not isinstance(family, str):
+        family = tuple(family)
+    return (creature.name, family, tuple(creature.affinities),
+            creature.progression_path)
+
+
+class CreaturePopulation:
+    # Every creature in a region stored as contiguous arrays (one slot per
+    # creature) so needs, traits and states update with vectorized ops.
+    # Static data (name, family, affinities) lives in 'species_table', one
+    # Creature template per species, and slots refer to it by index
+    def __init__(self, capacity=1024,
+                 hunger_rate=0.5, thirst_rate=0.75, sleep_rate=0.25,
+                 sleep_recovery=2., starvation_damage=5., movement_cost=0.05,
+                 hungry_threshold=40., thirsty_threshold=40.,
+                 tired_threshold=20.) -> None:
+        self.capacity = 0
+        for name, (dtype, shape, empty) in POPULATION_FIELDS.items():
+            setattr(self, name, np.full((0, *shape), empty, dtype=dtype))
+        # Stack of free slots, the next slot handed out is at the top
+        self._free = np.empty(0, dtype=np.intp)
+        self._num_free = 0
+        self._grow(capacity)
+
+        self.species_table: List[Creature] = []
+        # Species key: ID, and the first ID registered under each name
+        self._species_ids: Dict[Tuple, int] = {}
+        self._species_names: Dict[str, int] = {}
+        self._species_traits = np.empty((0, len(TRAIT_FIELDS)),
+                                        dtype=np.float32)
+
+        # Rates are per unit time
+        self.hunger_rate = hunger_rate
+        self.thirst_rate = thirst_rate
+        self.sleep_rate = sleep_rate
+        self.sleep_recovery = sleep_recovery
+        self.starvation_damage = starvation_damage
+        self.movement_cost = movement_cost
+        self.hungry_threshold = hungry_threshold
+        self.thirsty_threshold = thirsty_threshold
+        self.tired_threshold = tired_threshold
+
+    def __len__(self) -> int:
+        return self.capacity - self._num_free
+
+    def _grow(self, capacity: int):
+        # Resize every array to 'capacity' slots, new slots are free
+        old_capacity = self.capacity
+        for name, (dtype, shape, empty) in POPULATION_FIELDS.items():
+            array = np.full((capacity, *shape), empty, dtype=dtype)
+            array[:old_capacity] = getattr(self, name)
+            setattr(self, name, array)
+
+        # New slots go under the existing free slots, lowest new slot last,
+        # so slots keep being handed out in ascending order
+        new_slots = np.arange(capacity - 1, old_capacity - 1, -1)
+        free = np.empty(capacity, dtype=np.intp)
+        free[:len(new_slots)] = new_slots
+        free[len(new_slots):len(new_slots) + self._num_free] =\
+            self._free[:self._num_free]
+        self._free = free
+        self._num_free += len(new_slots)
+        self.capacity = capacity
+
+    def add_species(self, creature: Creature) -> int:
+        # Register 'creature' as a species template, returning its ID.
+        # Species are identified by name, family, affinities & progression
+        # path, so unnamed creatures of different kinds stay apart
+        key = species_key(creature)
+        if key in self._species_ids:
+            return self._species_ids[key]
+
+        species_id = len(self.species_table)
+        self.species_table.append(creature)
+        self._species_ids[key] = species_id
+        self._species_names.setdefault(creature.name, species_id)
+        traits = [getattr(creature, trait) for trait in TRAIT_FIELDS]
+        self._species_traits = np.vstack([self._species_traits,
+                                          np.array(traits, dtype=np.float32)])
+        return species_id
+
+    def species_id(self, name: str) -> int:
+        return self._species_names[name]
+
+    @property
+    def active(self) -> np.ndarray:
+        # Slots of all living creatures
+        return np.flatnonzero(self.alive)
+
+    def spawn(self, species, position=None, **fields) -> np.ndarray:
+        # Spawn creatures of 'species' (ID or array of IDs) at 'position'
+        # ((2,) or (N, 2)), reusing freed slots first. Traits default to the
+        # species template's and needs to full; any POPULATION_FIELDS entry
+        # can be overridden with 'fields'. Returns the new slots
+        species = np.atleast_1d(np.asarray(species, dtype=np.int32))
+        if position is not None:
+            position = np.asarray(position, dtype=float)
+            if position.ndim == 2 and len(species) == 1:
+                species = np.repeat(species, len(position))
+        n = len(species)
+        if n > self._num_free:
+            self._grow(max(2 * self.capacity, len(self) + n))
+
+        slots = self._free[self._num_free - n:self._num_free][::-1].copy()
+        self._num_free -= n
+
+        for name, (_, _, empty) in POPULATION_FIELDS.items():
+            getattr(self, name)[slots] = empty
+        self.alive[slots] = True
+        self.species[slots] = species
+        self.state[slots] = IDLE
+        traits = self._species_traits[species]
+        for k, trait in enumerate(TRAIT_FIELDS):
+            getattr(self, trait)[slots] = traits[:, k]
+        if position is not None:
+            self.position[slots] = position
+        for name, value in fields.items():
+            if name not in POPULATION_FIELDS:
+                raise ValueError(f"Unknown population field '{name}'")
+            getattr(self, name)[slots] = value
+
+        return slots
+
+    def kill(self, slots):
+        # Remove the creatures in 'slots', freeing them for reuse
+        slots = np.atleast_1d(np.asarray(slots, dtype=np.intp))
+        slots = slots[self.alive[slots]]
+        slots = np.unique(slots)
+        self.alive[slots] = False
+        self.state[slots] = DEAD
+        self.velocity[slots] = 0.
+        self._free[self._num_free:self._num_free + len(slots)] = slots[::-1]
+        self._num_free += len(slots)
+
+    def counts(self) -> np.ndarray:
+        # Number of living creatures per species ID
+        return np.bincount(self.species[self.alive],
+                           minlength=len(self.species_table))
+
+    def eat(self, slots, amount):
+        # Restore hunger for the creatures in 'slots', who are now eating
+        self.hunger[slots] = np.minimum(self.hunger[slots] + amount, 100.)
+        self.state[slots] = EATING
+
+    def drink(self, slots, amount):
+        # Restore thirst for the creatures in 'slots', who are now drinking
+        self.thirst[slots] = np.minimum(self.thirst[slots] + amount, 100.)
+        self.state[slots] = DRINKING
+
+    def step(self, dt=1.) -> np.ndarray:
+        # Advance needs, energy, health and states by 'dt' for every creature.
+        # Empty slots are updated too (it's cheaper than masking) and reset
+        # on spawn. Returns the slots of creatures that died this step
+        sleeping = self.state == SLEEPING
+        resting = sleeping | (self.state == EATING) |\
+            (self.state == DRINKING)
+
+        # Needs decay, sleep recovers while asleep
+        self.hunger -= self.hunger_rate * dt
+        self.thirst -= self.thirst_rate * dt
+        self.sleep += np.where(sleeping, self.sleep_recovery,
+                               -self.sleep_rate) * dt
+        for need in NEED_FIELDS:
+            np.clip(getattr(self, need), 0., 100., out=getattr(self, need))
+
+        # Energy: depleted by movement, restored by eating/drinking/sleeping
+        # and capped by hunger & thirst
+        speed = np.sqrt(np.einsum("ij,ij->i", self.velocity, self.velocity))
+        self.energy += (resting * self.energy_recovery -
+                        self.movement_cost * speed) * dt
+        np.clip(self.energy, 0., np.minimum(self.hunger, self.thirst),
+                out=self.energy)
+
+        # Starving or dehydrated creatures lose health
+        self.health -= self.starvation_damage * dt *\
+            ((self.hunger <= 0.).astype(np.float32) + (self.thirst <= 0.))
+        died = np.flatnonzero(self.alive & (self.health <= 0.))
+        self.kill(died)
+
+        # State transitions, in order of priority
+        still_tired = sleeping & (self.sleep < 100.)
+        state = np.full(self.capacity, IDLE, dtype=np.int8)
+        state[self.hunger < self.hungry_threshold] = HUNTING
+        state[self.thirst < np.minimum(self.thirsty_threshold,
+                                       self.hunger)] = THIRSTY
+        state[still_tired | (self.sleep < self.tired_threshold)] = SLEEPING
+        state[~self.alive] = DEAD
+        self.state[...] = state
+        self.velocity[state == SLEEPING] = 0.
+
+        return died
+
+    @classmethod
+    def from_creatures(cls, creatures: List[Creature], positions=None,
+                       **kwargs):
+        # Build a population with one slot per Creature in 'creatures',
+        # copying their needs and traits
+        population = cls(capacity=max(len(creatures), 1), **kwargs)
+        species = [population.add_species(c) for c in creatures]
+        slots = population.spawn(species, positions)
+        for name in NEED_FIELDS + TRAIT_FIELDS:
+            getattr(population, name)[slots] = [getattr(c, name)
+                                                for c in creatures]
+        return population
+
+    def to_creatures(self) -> List[Creature]:
+        # Creature objects for every living creature, for the existing
+        # scripts. Predator & prey lists are shared with the species template
+        creatures = []
+        for slot in self.active:
+            template = self.species_table[self.species[slot]]
+            creature = Creature(list(template.affinities), template.family,
+                                template.progression_path, template.name,
+                                predators=template.predators,
+                                prey=template.prey)
+            for name in NEED_FIELDS + TRAIT_FIELDS:
+                setattr(creature, name, getattr(self, name)[slot].item())
+            creatures.append(creature)
+
+        return creatures
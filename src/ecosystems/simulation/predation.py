@@ -0,0 +1,127 @@
+# Batched hunt resolution: every predator & prey pair in reach is resolved in
+# one pass over a predation matrix built from the food web
+import numpy as np
+from typing import Tuple
+
+from ecosystems.simulation.population import HUNTING
+from ecosystems.simulation.spatial import (SpatialHash, _first_per_group,
+                                           _nearest_per_group, within)
+
+
+class HuntResult:
+    # Outcome of one round of hunts: the 'hunters' that attacked and their
+    # 'prey' (slots, pairwise), then the slots 'killed' and their 'killers',
+    # with the 'position', 'species' and leftover 'meat' of each kill for
+    # spawning carcasses
+    def __init__(self, hunters: np.ndarray, prey: np.ndarray,
+                 killed: np.ndarray, killers: np.ndarray,
+                 position: np.ndarray, species: np.ndarray,
+                 meat: np.ndarray) -> None:
+        self.hunters = hunters
+        self.prey = prey
+        self.killed = killed
+        self.killers = killers
+        self.position = position
+        self.species = species
+        self.meat = meat
+
+    def __len__(self) -> int:
+        # Number of attacks
+        return len(self.hunters)
+
+
+def _hunters(population, eats: np.ndarray, min_energy=0.) -> np.ndarray:
+    # Slots of hungry creatures of species that hunt, with 'min_energy'
+    slots = population.active
+    return slots[(population.state[slots] == HUNTING) &
+                 eats.any(axis=1)[population.species[slots]] &
+                 (population.energy[slots] >= min_energy)]
+
+
+def _prey_pairs(population, index: SpatialHash, hunters: np.ndarray,
+                radius: float, eats: np.ndarray
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (hunter, prey, distance) for every prey within 'radius' of 'hunters'
+    # that the hunter's species eats
+    query, prey, distance = index.query_radius(
+        population.position[hunters], radius, exclude=hunters)
+    hunter = hunters[query]
+    edible = eats[population.species[hunter], population.species[prey]]
+    return hunter[edible], prey[edible], distance[edible]
+
+
+def nearest_prey(population, index: SpatialHash, radius: float,
+                 eats: np.ndarray,
+                 pairs=None) -> Tuple[np.ndarray, np.ndarray]:
+    # Slot of the nearest prey within 'radius' of every hunting predator in
+    # a CreaturePopulation (indexed in 'index' by slot), -1 if none or not
+    # hunting, and its distance. 'pairs' from neighbour_pairs() at 'radius'
+    # or more saves querying 'index'
+    hunters = _hunters(population, eats)
+    if pairs is None:
+        hunter, prey, distance = _prey_pairs(population, index, hunters,
+                                             radius, eats)
+    else:
+        hunter, prey, distance = within(pairs, radius)
+        hunting = np.zeros(population.capacity, dtype=bool)
+        hunting[hunters] = True
+        keep = hunting[hunter]
+        hunter, prey, distance = hunter[keep], prey[keep], distance[keep]
+        edible = eats[population.species[hunter], population.species[prey]]
+        hunter, prey, distance = hunter[edible], prey[edible],\
+            distance[edible]
+    # Pairs are grouped by hunter
+    first = _nearest_per_group(hunter, prey, distance)
+    target = np.full(population.capacity, -1, dtype=np.intp)
+    target_distance = np.full(population.capacity, np.inf)
+    target[hunter[first]] = prey[first]
+    target_distance[hunter[first]] = distance[first]
+    return target, target_distance
+
+
+def resolve_hunts(population, index: SpatialHash, eats: np.ndarray,
+                  reach=1., damage=40., attack_cost=5., struggle_cost=10.,
+                  carcass_meat=50., meal=10., food_value=5.) -> HuntResult:
+    # Resolve one round of hunts for a CreaturePopulation indexed by slot in
+    # 'index'. Hunting predators with at least 'attack_cost' energy attack
+    # the nearest prey within 'reach' that their species eats ('eats' is the
+    # (S, S) predation matrix). When several go for the same prey, only the
+    # closest attacks, ties going to the lowest slot, so the outcome doesn't
+    # depend on the order of the pairs. Attackers spend 'attack_cost'
+    # energy, prey lose 'damage' health and 'struggle_cost' energy. Prey at
+    # 0 health are killed and their killer, if it survived the round, eats
+    # a 'meal' of their 'carcass_meat' (restoring 'food_value' hunger per
+    # unit), the rest is left in the result for carcasses
+    hunters = _hunters(population, eats, attack_cost)
+    hunter, prey, distance = _prey_pairs(population, index, hunters, reach,
+                                         eats)
+
+    # Each hunter's nearest prey
+    order = np.lexsort((prey, distance, hunter))
+    first = order[_first_per_group(hunter[order])]
+    hunter, prey, distance = hunter[first], prey[first], distance[first]
+    # Each prey's closest hunter
+    order = np.lexsort((hunter, distance, prey))
+    first = order[_first_per_group(prey[order])]
+    hunter, prey = hunter[first], prey[first]
+
+    population.energy[hunter] = np.maximum(
+        population.energy[hunter] - attack_cost, 0.)
+    population.energy[prey] = np.maximum(
+        population.energy[prey] - struggle_cost, 0.)
+    population.health[prey] -= damage
+
+    dead = population.health[prey] <= 0.
+    killed, killers = prey[dead], hunter[dead]
+    position = population.position[killed].copy()
+    species = population.species[killed].copy()
+    population.kill(killed)
+    # Hunters killed in the same round (e.g. predators of each other) don't
+    # get to eat, their kill is left whole
+    fed = population.alive[killers]
+    eaten = min(meal, carcass_meat)
+    population.eat(killers[fed], eaten * food_value)
+
+    return HuntResult(hunter, prey, killed, killers, position, species,
+                      np.where(fed, carcass_meat - eaten,
+                               carcass_meat).astype(np.float32))
@@ -0,0 +1,204 @@
+# Per-phase tick timing & counters for the simulation loop
+from contextlib import nullcontext
+import csv
+import json
+import numpy as np
+import os
+import time
+from typing import Dict, List
+
+# Phase timings are histogrammed in log2 buckets of nanoseconds, bucket 'k'
+# holding durations in [2^(k - 1), 2^k) ns (bucket 0 is < 1 ns), so the
+# last bucket starts at ~1.1 s
+NUM_BUCKETS = 32
+TICK = "tick"
+_NULL_PHASE = nullcontext()
+
+
+class _Phase:
+    # Reusable timer around one phase
+    def __init__(self, profiler: "TickProfiler", index: int) -> None:
+        self.profiler = profiler
+        self.index = index
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler._record(self.index,
+                              time.perf_counter_ns() - self.start)
+
+
+class _TickPhase(_Phase):
+    def __exit__(self, *args):
+        duration = time.perf_counter_ns() - self.start
+        self.profiler._record(self.index, duration)
+        self.profiler._end_tick(duration)
+
+
+class TickProfiler:
+    # Times named phases of a tick with the monotonic clock and counts
+    # events (creatures processed, tiles regrown, ...). Durations go into
+    # fixed-size histograms, plus a ring buffer of the last 'window' tick
+    # durations for checking against a 'budget' (seconds per tick). When
+    # disabled, phase() returns a shared no-op context and count() returns
+    # straight away. With 'dump_path' (.json or .csv), a snapshot is
+    # written every 'dump_every' ticks, keyed by the profiler's 'name' (the
+    # region's, set by RegionSimulation) which is also added to the file
+    # name so regions sharing a 'dump_path' don't overwrite each other
+    def __init__(self, enabled=True, budget=None, window=100,
+                 dump_path: str = None, dump_every=1000, name="") -> None:
+        self.enabled = enabled
+        self.name = name
+        self.budget = budget
+        self.dump_path = dump_path
+        self.dump_every = dump_every
+        self._phases: Dict[str, _Phase] = {}
+        self._tick_phase = None
+        self._recent = np.zeros(window, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        num_phases = len(self._phases)
+        self.ticks = 0
+        self.ticks_over_budget = 0
+        self.counters: Dict[str, int] = {}
+        self._histograms = np.zeros((num_phases, NUM_BUCKETS), dtype=np.int64)
+        self._total_ns = np.zeros(num_phases, dtype=np.int64)
+        self._max_ns = np.zeros(num_phases, dtype=np.int64)
+        self._recent[:] = 0
+
+    def _add_phase(self, name: str, phase_class=_Phase) -> _Phase:
+        self._phases[name] = phase_class(self, len(self._phases))
+        self._histograms = np.vstack([self._histograms,
+                                      np.zeros(NUM_BUCKETS, dtype=np.int64)])
+        self._total_ns = np.r_[self._total_ns, 0]
+        self._max_ns = np.r_[self._max_ns, 0]
+        return self._phases[name]
+
+    def phase(self, name: str):
+        # Context manager timing one phase of the tick
+        if not self.enabled:
+            return _NULL_PHASE
+        phase = self._phases.get(name)
+        return phase if phase is not None else self._add_phase(name)
+
+    def tick(self):
+        # Context manager around a whole tick
+        if not self.enabled:
+            return _NULL_PHASE
+        if self._tick_phase is None:
+            self._tick_phase = self._add_phase(TICK, _TickPhase)
+        return self._tick_phase
+
+    def count(self, name: str, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def _record(self, index: int, duration: int):
+        self._histograms[index, min(int(duration).bit_length(),
+                                    NUM_BUCKETS - 1)] += 1
+        self._total_ns[index] += duration
+        if duration > self._max_ns[index]:
+            self._max_ns[index] = duration
+
+    def _end_tick(self, duration: int):
+        self._recent[self.ticks % len(self._recent)] = duration
+        self.ticks += 1
+        if self.budget is not None and duration > self.budget * 1e9:
+            self.ticks_over_budget += 1
+        if self.dump_path is not None and self.ticks % self.dump_every == 0:
+            self.dump(self.periodic_dump_path)
+
+    @property
+    def periodic_dump_path(self) -> str:
+        # 'dump_path' with the name before the extension, e.g.
+        # profile.Beach.json
+        if not self.name:
+            return self.dump_path
+        root, extension = os.path.splitext(self.dump_path)
+        return f"{root}.{self.name}{extension}"
+
+    @property
+    def recent_tick_seconds(self) -> float:
+        # Mean duration of the last 'window' ticks
+        num_recent = min(self.ticks, len(self._recent))
+        if not num_recent:
+            return 0.
+        return float(self._recent[:num_recent].mean()) * 1e-9
+
+    def over_budget(self) -> bool:
+        # Whether recent ticks took longer than the budget on average
+        return self.budget is not None and\
+            self.recent_tick_seconds > self.budget
+
+    def _percentile(self, index: int, q: float) -> float:
+        # Upper edge (seconds) of the bucket holding the 'q' quantile
+        histogram = self._histograms[index]
+        calls = histogram.sum()
+        if not calls:
+            return 0.
+        bucket = int(np.searchsorted(np.cumsum(histogram), q * calls))
+        return 2.**bucket * 1e-9
+
+    def snapshot(self) -> Dict:
+        # Plain-data summary of everything recorded so far
+        phases = {}
+        for name, phase in self._phases.items():
+            k = phase.index
+            calls = int(self._histograms[k].sum())
+            phases[name] = {
+                "calls": calls,
+                "total_s": float(self._total_ns[k]) * 1e-9,
+                "mean_s": float(self._total_ns[k]) * 1e-9 / calls
+                if calls else 0.,
+                "max_s": float(self._max_ns[k]) * 1e-9,
+                "p50_s": self._percentile(k, 0.5),
+                "p99_s": self._percentile(k, 0.99),
+                "histogram": self._histograms[k].tolist(),
+            }
+        return {
+            "ticks": self.ticks,
+            "ticks_over_budget": self.ticks_over_budget,
+            "recent_tick_s": self.recent_tick_seconds,
+            "over_budget": self.over_budget(),
+            "phases": phases,
+            "counters": dict(self.counters),
+        }
+
+    def dump(self, path: str, name: str = None):
+        # Write a snapshot to 'path', as JSON or (by extension) CSV, under
+        # 'name' (the profiler's by default)
+        dump_snapshots({self.name if name is None else name:
+                        self.snapshot()}, path)
+
+
+def dump_snapshots(snapshots: Dict[str, Dict], path: str):
+    # Write {region name: snapshot} to 'path'. CSV has one row per phase &
+    # counter of each region
+    if not path.endswith(".csv"):
+        with open(path, "w", encoding="utf-8") as outfile:
+            json.dump(snapshots, outfile, indent=2)
+        return
+
+    columns = ["region", "kind", "name", "value", "calls", "total_s",
+               "mean_s", "max_s", "p50_s", "p99_s"]
+    with open(path, "w", encoding="utf-8", newline="") as outfile:
+        writer = csv.DictWriter(outfile, columns, extrasaction="ignore")
+        writer.writeheader()
+        for region, snapshot in snapshots.items():
+            for name, phase in snapshot["phases"].items():
+                writer.writerow({"region": region, "kind": "phase",
+                                 "name": name, **phase})
+            for name, value in snapshot["counters"].items():
+                writer.writerow({"region": region, "kind": "counter",
+                                 "name": name, "value": value})
+
+
+def over_budget_regions(regions: Dict) -> List[str]:
+    # Names of RegionSimulations whose profilers are over budget, e.g. to
+    # demote them
+    return [name for name, region in regions.items()
+            if region.profiler.over_budget()]
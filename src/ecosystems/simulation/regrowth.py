@@ -0,0 +1,165 @@
+# Event-driven food regrowth & spawning on a Grid
+import heapq
+import numpy as np
+from typing import Dict, List, Tuple
+
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.tile import BlankTile, FoodTile
+
+
+# Tile event kinds, events are (kind, flat tile indices)
+DEPLETED = 0
+REGROWN = 1
+SPAWNED = 2
+
+
+def serve_in_order(keys: np.ndarray, amount: np.ndarray,
+                   available: np.ndarray) -> np.ndarray:
+    # Take up to 'amount' each from 'available[keys]', where a key may
+    # appear several times and earlier entries are served first. Returns
+    # what each entry got, 'available' is reduced in place
+    order = np.argsort(keys, kind="stable")
+    sorted_keys, sorted_amount = keys[order], amount[order]
+    total = np.cumsum(sorted_amount)
+    first = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    group_start = np.repeat(total[first] - sorted_amount[first],
+                            np.diff(np.r_[first, len(keys)]))
+    before = total - sorted_amount - group_start
+    sorted_taken = np.clip(available[sorted_keys] - before, 0., sorted_amount)
+    taken = np.empty_like(sorted_taken)
+    taken[order] = sorted_taken
+    np.subtract.at(available, sorted_keys, sorted_taken)
+    return taken
+
+
+class SpawnArea:
+    # Rectangle of tiles where food spawns like in a game of snake (README
+    # "Spawning Food"): each tick, with 'spawn_chance', up to 'batch_size'
+    # food tiles appear on random blank tiles until the area holds 'max_food'
+    def __init__(self, i_range: Tuple[int, int], j_range: Tuple[int, int],
+                 max_food: int, spawn_chance=0.1, batch_size=1,
+                 regrowth_time=(5, 15), quantity=10.) -> None:
+        self.i_range = i_range
+        self.j_range = j_range
+        self.max_food = max_food
+        self.spawn_chance = spawn_chance
+        self.batch_size = batch_size
+        self.regrowth_time = regrowth_time  # [low, high)
+        self.quantity = quantity
+
+
+class RegrowthScheduler:
+    # Keeps depleted food tiles in buckets keyed on the tick they become
+    # edible again, with a min-heap of the bucket ticks, so each tick only
+    # touches the tiles that change state. Tile changes are recorded in
+    # 'events' for the pathing and rendering layers
+    def __init__(self, grid: Grid, spawn_areas: List[SpawnArea] = None,
+                 rng: np.random.Generator = None) -> None:
+        self.grid = grid
+        self.spawn_areas = spawn_areas if spawn_areas is not None else []
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.tick = 0
+        self.events: List[Tuple[int, np.ndarray]] = []
+        self._due: Dict[int, List[np.ndarray]] = {}
+        self._due_ticks: List[int] = []
+
+        # Food tiles that start out empty
+        empty = (grid.tile_type == FoodTile.code) & (grid.food_quantity <= 0.)
+        self._schedule(np.flatnonzero(empty))
+
+    def __len__(self) -> int:
+        # Number of tiles waiting to regrow
+        return sum(len(tiles) for bucket in self._due.values()
+                   for tiles in bucket)
+
+    def _schedule(self, tiles: np.ndarray):
+        # Bucket flat 'tiles' by the tick they regrow on
+        if not len(tiles):
+            return
+        ready = self.tick + np.maximum(
+            self.grid.regrowth_time.ravel()[tiles], 1)
+        order = np.argsort(ready, kind="stable")
+        ready, tiles = ready[order], tiles[order]
+        ticks, starts = np.unique(ready, return_index=True)
+        for tick, group in zip(ticks.tolist(), np.split(tiles, starts[1:])):
+            if tick not in self._due:
+                self._due[tick] = []
+                heapq.heappush(self._due_ticks, tick)
+            self._due[tick].append(group)
+
+    def consume(self, tiles: np.ndarray, amount) -> np.ndarray:
+        # Eat up to 'amount' (scalar or per-tile) of food from 'tiles', flat
+        # indices or (N, 2) tile indices, where a tile may appear several
+        # times (eaters are served in order). Returns the amount each eater
+        # got. Tiles that run out are scheduled to regrow
+        tiles = np.asarray(tiles, dtype=np.intp)
+        if tiles.ndim == 2:
+            tiles = np.ravel_multi_index(tuple(tiles.T), self.grid.tile_shape)
+        amount = np.broadcast_to(np.asarray(amount, dtype=np.float32),
+                                 tiles.shape)
+        if not len(tiles):
+            return np.zeros(0, dtype=np.float32)
+        quantity = self.grid.food_quantity.ravel()
+
+        unique = np.unique(tiles)
+        was_edible = quantity[unique] > 0.
+        eaten = serve_in_order(tiles, amount, quantity)
+        depleted = unique[was_edible & (quantity[unique] <= 0.)]
+        quantity[depleted] = 0.
+        if len(depleted):
+            self._schedule(depleted)
+            self.events.append((DEPLETED, depleted))
+
+        return eaten
+
+    def _spawn(self):
+        # Top up every spawn area that rolls a spawn this tick
+        grid = self.grid
+        for area in self.spawn_areas:
+            if self.rng.random() > area.spawn_chance:
+                continue
+            (i0, i1), (j0, j1) = area.i_range, area.j_range
+            window = grid.tile_type[i0:i1, j0:j1]
+            num_food = np.count_nonzero(window == FoodTile.code)
+            num_new = min(area.max_food - num_food, area.batch_size)
+            blank = np.flatnonzero(window == BlankTile.code)
+            num_new = min(num_new, len(blank))
+            if num_new <= 0:
+                continue
+
+            chosen = self.rng.choice(blank, num_new, replace=False)
+            i, j = np.unravel_index(chosen, window.shape)
+            i, j = i + i0, j + j0
+            grid.tile_type[i, j] = FoodTile.code
+            grid.regrowth_time[i, j] = self.rng.integers(*area.regrowth_time,
+                                                         size=num_new)
+            grid.food_capacity[i, j] = area.quantity
+            grid.food_quantity[i, j] = area.quantity
+            self.events.append((SPAWNED,
+                                np.ravel_multi_index((i, j), grid.tile_shape)))
+
+    def advance(self, ticks=1) -> int:
+        # Step forward 'ticks' ticks, regrowing due tiles and spawning food.
+        # Returns the number of tiles regrown
+        num_regrown = 0
+        grid = self.grid
+        for _ in range(ticks):
+            self.tick += 1
+            while self._due_ticks and self._due_ticks[0] <= self.tick:
+                tiles = np.concatenate(self._due.pop(
+                    heapq.heappop(self._due_ticks)))
+                # Tiles may have been cleared while waiting
+                tiles = tiles[grid.tile_type.ravel()[tiles] == FoodTile.code]
+                grid.food_quantity.ravel()[tiles] =\
+                    grid.food_capacity.ravel()[tiles]
+                num_regrown += len(tiles)
+                self.events.append((REGROWN, tiles))
+            self._spawn()
+
+        return num_regrown
+
+    def drain_events(self) -> List[Tuple[int, np.ndarray]]:
+        # Return and clear the events since the last call
+        events = self.events
+        self.events = []
+        return events
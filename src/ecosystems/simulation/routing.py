@@ -0,0 +1,155 @@
+# Precomputed routing tables for creatures migrating across the island's
+# region graph
+import numpy as np
+from typing import List
+
+
+class IslandRouter:
+    # All-pairs shortest path 'distance' and 'next_hop' (region ID, -1 if
+    # unreachable) matrices over the 'island' graph (nodes are Regions,
+    # edges are one-way, an edge's 'weight' attribute is its cost, default
+    # 1), plus per-affinity tables of the nearest region with that affinity
+    # from every region. Regions get integer IDs in node order. Edges can be
+    # closed & reopened, only the routes that change are recomputed
+    def __init__(self, island, weight="weight") -> None:
+        self.regions = list(island.nodes())
+        self.names = [str(region) for region in self.regions]
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.affinities = sorted({affinity for region in self.regions
+                                  for affinity in region.affinities})
+        self.affinity_ids = {name: i for i, name in enumerate(self.affinities)}
+        # Region x affinity membership
+        self.has_affinity = np.zeros((len(self.regions), len(self.affinities)),
+                                     dtype=bool)
+        for i, region in enumerate(self.regions):
+            self.has_affinity[i, [self.affinity_ids[affinity]
+                                  for affinity in region.affinities]] = True
+
+        n = len(self.regions)
+        # Cheapest edge between each pair (parallel edges collapse)
+        self.weights = np.full((n, n), np.inf)
+        for source, destination, data in island.edges(data=True):
+            i, j = self.ids[str(source)], self.ids[str(destination)]
+            self.weights[i, j] = min(self.weights[i, j],
+                                     data.get(weight, 1.))
+        self.open = np.isfinite(self.weights)
+        self._floyd_warshall()
+
+    def _edge_costs(self) -> np.ndarray:
+        costs = np.where(self.open, self.weights, np.inf)
+        np.fill_diagonal(costs, 0.)
+        return costs
+
+    def _floyd_warshall(self):
+        n = len(self.regions)
+        self.distance = self._edge_costs()
+        self.next_hop = np.where(np.isfinite(self.distance),
+                                 np.arange(n)[None, :], -1)
+        for k in range(n):
+            via = self.distance[:, k:k + 1] + self.distance[k:k + 1, :]
+            better = via < self.distance
+            self.distance = np.where(better, via, self.distance)
+            self.next_hop = np.where(better, self.next_hop[:, k:k + 1],
+                                     self.next_hop)
+        self._nearest_tables()
+
+    def _recompute_rows(self, rows: np.ndarray):
+        # Shortest paths from the regions 'rows' by min-plus relaxation over
+        # their first hop, the other rows being correct already
+        n = len(self.regions)
+        costs = self._edge_costs()
+        self.distance[rows] = costs[rows]
+        self.next_hop[rows] = np.where(np.isfinite(costs[rows]),
+                                       np.arange(n)[None, :], -1)
+        self.next_hop[rows, rows] = rows
+        while True:
+            # (rows, first hop, destination)
+            via = costs[rows][:, :, None] + self.distance[None, :, :]
+            via[np.arange(len(rows)), rows] = np.inf  # no hop to itself
+            hop = np.argmin(via, axis=1)
+            best = np.take_along_axis(via, hop[:, None, :], axis=1)[:, 0]
+            better = best < self.distance[rows]
+            if not better.any():
+                break
+            distance, next_hop = self.distance[rows], self.next_hop[rows]
+            distance[better] = best[better]
+            next_hop[better] = hop[better]
+            self.distance[rows], self.next_hop[rows] = distance, next_hop
+
+    def _nearest_tables(self):
+        # 'nearest' (region x affinity) region ID with that affinity, -1 if
+        # none is reachable, and its 'nearest_distance'
+        distance = np.where(self.has_affinity.T[:, None, :],
+                            self.distance[None, :, :], np.inf)
+        self.nearest = np.argmin(distance, axis=2).T
+        self.nearest_distance = np.min(distance, axis=2).T
+        self.nearest[~np.isfinite(self.nearest_distance)] = -1
+
+    def set_edge(self, source: str, destination: str, open=True) -> bool:
+        # Open or close the edge 'source' -> 'destination' (e.g. weather
+        # closing a pass). Returns False if nothing changed
+        i, j = self.ids[source], self.ids[destination]
+        if not np.isfinite(self.weights[i, j]):
+            raise ValueError(f"No edge from '{source}' to '{destination}'")
+        if self.open[i, j] == open:
+            return False
+        self.open[i, j] = open
+        cost = self.weights[i, j]
+
+        if open:
+            # Routes can only get shorter by going through the new edge
+            via = self.distance[:, i:i + 1] + cost + self.distance[j:j + 1, :]
+            better = via < self.distance
+            self.distance = np.where(better, via, self.distance)
+            hop = self.next_hop[:, i].copy()
+            hop[i] = j
+            self.next_hop = np.where(better, hop[:, None], self.next_hop)
+        else:
+            # Only sources with a shortest route over the edge are affected
+            via = self.distance[:, i:i + 1] + cost + self.distance[j:j + 1, :]
+            rows = np.flatnonzero((np.isfinite(self.distance) &
+                                   (via <= self.distance)).any(axis=1))
+            if len(rows):
+                self._recompute_rows(rows)
+        self._nearest_tables()
+        return True
+
+    def is_open(self, source: str, destination: str) -> bool:
+        return bool(self.open[self.ids[source], self.ids[destination]])
+
+    def next_hops(self, sources: np.ndarray,
+                  destinations: np.ndarray) -> np.ndarray:
+        # Region IDs of the next hop for each source & destination ID pair
+        return self.next_hop[sources, destinations]
+
+    def next_hops_toward(self, sources: np.ndarray,
+                         affinity: str) -> np.ndarray:
+        # Next hop region IDs from 'sources' towards the nearest region with
+        # 'affinity', -1 if there is none
+        destinations = self.nearest[sources, self.affinity_ids[affinity]]
+        return np.where(destinations >= 0,
+                        self.next_hop[sources, destinations], -1)
+
+    def distance_between(self, source: str, destination: str) -> float:
+        return float(self.distance[self.ids[source], self.ids[destination]])
+
+    def route(self, source: str, destination: str) -> List[str]:
+        # Region names from 'source' to 'destination', empty if unreachable
+        i, j = self.ids[source], self.ids[destination]
+        if self.next_hop[i, j] < 0:
+            return []
+        route = [i]
+        while i != j:
+            i = self.next_hop[i, j]
+            route.append(i)
+        return [self.names[i] for i in route]
+
+    def nearest_with(self, source: str, affinity: str) -> str:
+        # Name of the nearest region with 'affinity', None if unreachable
+        i = self.nearest[self.ids[source], self.affinity_ids[affinity]]
+        return self.names[i] if i >= 0 else None
+
+    def toward(self, source: str, affinity: str) -> str:
+        # Next region on the way to the nearest region with 'affinity'
+        i = self.next_hops_toward(self.ids[source], affinity)
+        return self.names[i] if i >= 0 else None
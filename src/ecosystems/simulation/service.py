@@ -0,0 +1,274 @@
+# Asyncio host that keeps region simulations ticking on a fixed timestep in
+# the background while serving read-only state queries, in process or as
+# JSON lines over a local socket
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import numpy as np
+from typing import Callable, Dict, List
+
+from ecosystems.simulation.lod import RegionSimulation
+
+
+QUERIES = ("regions", "counts", "creatures", "stats", "set_on_screen")
+
+def _frozen(array: np.ndarray) -> np.ndarray:
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
+
+
+class RegionState:
+    # Read-only copy of a region's queryable state after a tick: species
+    # counts in either mode, and creature slots, species IDs, states &
+    # positions (agent mode only, empty otherwise)
+    def __init__(self, region: RegionSimulation) -> None:
+        self.name = region.name
+        self.tick = region.tick
+        self.mode = region.mode
+        population = region.population
+        self.species_names = [creature.name
+                              for creature in population.species_table]
+        self.counts = _frozen(region.counts())
+        slots = population.active
+        self.slots = _frozen(slots)
+        self.species = _frozen(population.species[slots])
+        self.state = _frozen(population.state[slots])
+        self.position = _frozen(population.position[slots])
+
+    def in_view(self, bounds) -> np.ndarray:
+        # Indices of the creatures inside (x_min, y_min, x_max, y_max)
+        x_min, y_min, x_max, y_max = bounds
+        x, y = self.position[:, 0], self.position[:, 1]
+        return np.flatnonzero((x >= x_min) & (x <= x_max) &
+                              (y >= y_min) & (y <= y_max))
+
+    def summary(self) -> Dict:
+        return {"region": self.name, "tick": self.tick, "mode": self.mode,
+                "creatures": float(self.counts.sum())}
+
+    def count_dict(self) -> Dict[str, float]:
+        return {name: float(count) for name, count in
+                zip(self.species_names, self.counts) if count > 0}
+
+    def creatures(self, bounds=None, limit=None) -> Dict:
+        # Creatures in 'bounds' (everywhere by default), at most 'limit'
+        idxs = np.arange(len(self.slots)) if bounds is None else\
+            self.in_view(bounds)
+        idxs = idxs[:limit]
+        return {"region": self.name, "tick": self.tick,
+                "slot": self.slots[idxs].tolist(),
+                "species": self.species[idxs].tolist(),
+                "state": self.state[idxs].tolist(),
+                "position": self.position[idxs].tolist()}
+
+
+class SnapshotBuffer:
+    # Latest published RegionState. The writer builds a complete state and
+    # then swaps the reference (atomic in Python), so readers never see a
+    # partial state and never wait on a lock. Published states are never
+    # modified, a reader holding one keeps a consistent view after later
+    # swaps
+    def __init__(self, state: RegionState) -> None:
+        self._state = state
+
+    def publish(self, state: RegionState):
+        self._state = state
+
+    def read(self) -> RegionState:
+        return self._state
+
+
+class SimulationHost:
+    # Steps each region every 'tick_seconds' of wall time (per region
+    # overrides in 'intervals') by 'dt' of simulation time. Each region has
+    # its own scheduling task and its steps run in 'executor' (a thread pool
+    # of 'max_workers' by default), so a slow region only delays itself.
+    # Ticks missed by more than 'max_lag' intervals are skipped rather than
+    # caught up. The regions are only touched by their step, queries read
+    # the states published after each step and commands are queued until
+    # the region's next step
+    def __init__(self, regions: Dict[str, RegionSimulation],
+                 tick_seconds=0.1, dt=1., intervals: Dict = None,
+                 max_lag=5, executor=None, max_workers=None,
+                 client_timeout=5.) -> None:
+        self.regions = regions
+        self.dt = dt
+        self.intervals = {name: tick_seconds for name in regions}
+        self.intervals.update(intervals or {})
+        self.max_lag = max_lag
+        self.client_timeout = client_timeout
+        self._owns_executor = executor is None
+        self._executor = ThreadPoolExecutor(max_workers) if executor is None\
+            else executor
+        self.buffers = {name: SnapshotBuffer(RegionState(region))
+                        for name, region in regions.items()}
+        self._commands = {name: deque() for name in regions}
+        self.ticks = {name: 0 for name in regions}
+        self.skipped_ticks = {name: 0 for name in regions}
+        self._stop = None
+        self._servers = []
+        self._clients = set()
+
+    # Simulation
+
+    def _step(self, name: str):
+        # Runs in the executor: apply queued commands, step and publish
+        region = self.regions[name]
+        commands = self._commands[name]
+        while commands:
+            commands.popleft()(region)
+        region.step(self.dt)
+        self.buffers[name].publish(RegionState(region))
+        self.ticks[name] += 1
+
+    async def _drive(self, name: str):
+        # Fixed timestep loop of one region
+        loop = asyncio.get_running_loop()
+        interval = self.intervals[name]
+        due = loop.time()
+        while not self._stop.is_set():
+            delay = due - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), delay)
+                    break
+                except asyncio.TimeoutError:
+                    pass
+            await loop.run_in_executor(self._executor, self._step, name)
+            due += interval
+            lag = loop.time() - due
+            if lag > self.max_lag * interval:
+                skipped = int(lag // interval)
+                due += skipped * interval
+                self.skipped_ticks[name] += skipped
+
+    async def run(self, duration=None):
+        # Tick every region until stop() is called, or for 'duration'
+        # seconds. Steps in progress are finished before returning. If a
+        # region's step raises, the other regions are cancelled and the
+        # error is raised here
+        self._stop = asyncio.Event()
+        tasks = [asyncio.create_task(self._drive(name))
+                 for name in self.regions]
+        timer = None
+        if duration is not None:
+            timer = asyncio.get_running_loop().call_later(duration, self.stop)
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if timer is not None:
+                timer.cancel()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    def submit(self, name: str, command: Callable[[RegionSimulation], None]):
+        # Queue 'command(region)' to run before the region's next step
+        self._commands[name].append(command)
+
+    def set_on_screen(self, name: str, on_screen: bool):
+        self.submit(name, lambda region: region.set_on_screen(on_screen))
+
+    # Queries
+
+    def state(self, name: str) -> RegionState:
+        return self.buffers[name].read()
+
+    def stats(self) -> Dict:
+        return {"ticks": dict(self.ticks),
+                "skipped_ticks": dict(self.skipped_ticks)}
+
+    def query(self, request: Dict) -> Dict:
+        # Answer one query: {"query": "regions" | "counts" | "creatures" |
+        # "stats" | "set_on_screen", "region": name, ...}. "creatures"
+        # takes optional "bounds" [x_min, y_min, x_max, y_max] and "limit".
+        # Errors are returned as {"error": message}
+        try:
+            kind = request["query"]
+            if kind not in QUERIES:
+                return {"error": f"Unknown query '{kind}'"}
+            if kind == "regions":
+                return {"result": [self.state(name).summary()
+                                   for name in self.regions]}
+            if kind == "stats":
+                return {"result": self.stats()}
+
+            name = request["region"]
+            if name not in self.regions:
+                return {"error": f"Unknown region '{name}'"}
+            if kind == "counts":
+                return {"result": self.state(name).count_dict()}
+            if kind == "creatures":
+                return {"result": self.state(name).creatures(
+                    request.get("bounds"), request.get("limit"))}
+            self.set_on_screen(name, bool(request["on_screen"]))
+            return {"result": True}
+        except KeyError as error:
+            return {"error": f"Missing {error}"}
+        except (TypeError, ValueError) as error:
+            return {"error": f"Bad request: {error!r}"}
+
+    # Socket server
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter):
+        # One JSON request per line, one JSON response per line. Clients
+        # that don't read their responses within 'client_timeout' seconds
+        # are disconnected
+        self._clients.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {"error": "Invalid JSON"}
+                else:
+                    response = self.query(request) if isinstance(
+                        request, dict) else {"error": "Expected an object"}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await asyncio.wait_for(writer.drain(), self.client_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
+
+    async def serve(self, path: str = None, host="127.0.0.1", port=0):
+        # Start serving queries on the Unix socket 'path', or on TCP
+        # 'host':'port' (0 picks a free port). Returns the asyncio Server
+        if path is not None:
+            server = await asyncio.start_unix_server(self._handle_client,
+                                                     path)
+        else:
+            server = await asyncio.start_server(self._handle_client, host,
+                                                port)
+        self._servers.append(server)
+        return server
+
+    async def close(self):
+        # Stop ticking, close the servers and the executor if it's ours
+        self.stop()
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        # Dropping the connections ends the client handlers, including any
+        # waiting for a slow client to read
+        for writer in list(self._clients):
+            writer.transport.abort()
+        await asyncio.sleep(0)
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def addresses(self) -> List:
+        return [socket.getsockname() for server in self._servers
+                for socket in server.sockets]
@@ -0,0 +1,291 @@
+# Uniform-grid spatial index for neighbour, threat and food queries
+import numpy as np
+from typing import List, Tuple
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.population import species_key
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    # Concatenate arange(start, start + count) for every (start, count)
+    total = counts.sum()
+    if not total:
+        return np.empty(0, dtype=np.intp)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(total)
+
+
+def _first_per_group(groups: np.ndarray) -> np.ndarray:
+    # Index of the first element of each run in sorted 'groups'
+    if not len(groups):
+        return np.empty(0, dtype=np.intp)
+    return np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+
+def _nearest_per_group(groups: np.ndarray, ids: np.ndarray,
+                       distance: np.ndarray) -> np.ndarray:
+    # Index of the element with the smallest 'distance' (then the lowest
+    # ID) in each run of sorted 'groups', in linear time
+    starts = _first_per_group(groups)
+    if not len(starts):
+        return starts
+    counts = np.diff(np.r_[starts, len(groups)])
+    best = np.repeat(np.minimum.reduceat(distance, starts), counts)
+    candidate = np.where(distance == best, ids, np.iinfo(np.intp).max)
+    best = np.repeat(np.minimum.reduceat(candidate, starts), counts)
+    return np.flatnonzero(candidate == best)
+
+
+def _counting_order(keys: np.ndarray, num_keys: int) -> np.ndarray:
+    # Stable order of the integer 'keys' (all below 'num_keys') in O(N).
+    # numpy's stable sort of 16-bit integers is a radix sort, so wider keys
+    # are sorted 16 bits at a time, least significant digit first
+    order = np.argsort(keys.astype(np.uint16), kind="stable")
+    shift = 16
+    while num_keys - 1 >> shift:
+        digit = (keys[order] >> shift).astype(np.uint16)
+        order = order[np.argsort(digit, kind="stable")]
+        shift += 16
+    return order
+
+
+class SpatialHash:
+    # Buckets points into the Grid's tiles so radius & k-nearest queries
+    # only look at nearby tiles instead of every pair of points. Points are
+    # sorted by tile (by input order within a tile), 'cell_start[c]:
+    # cell_start[c + 1]' is the range of sorted points in tile 'c'
+    def __init__(self, grid: Grid) -> None:
+        self.grid = grid
+        self.num_cells = grid.tile_shape[0] * grid.tile_shape[1]
+        self.cell_start = np.zeros(self.num_cells + 1, dtype=np.intp)
+        self.ids = np.empty(0, dtype=np.intp)  # sorted IDs of the points
+        self.positions = np.empty((0, 2))  # sorted positions
+        self._cell = np.empty(0, dtype=np.intp)  # unsorted tile of points
+        self._order = np.empty(0, dtype=np.intp)
+        self._unsorted_ids = np.empty(0, dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _cells(self, positions: np.ndarray) -> np.ndarray:
+        tiles = self.grid.tile_idxs(positions)
+        return tiles[:, 0] * self.grid.tile_shape[1] + tiles[:, 1]
+
+    def build(self, positions: np.ndarray, ids=None) -> bool:
+        # Index 'positions' (N, 2), identified by 'ids' (default 0..N-1).
+        # When the same points are re-indexed only the ones that changed
+        # tile are moved, if none did only the positions are refreshed.
+        # Returns whether points were re-bucketed
+        positions = np.asarray(positions, dtype=float)
+        ids = np.arange(len(positions)) if ids is None else np.asarray(ids)
+        cell = self._cells(positions)
+
+        if len(ids) == len(self._unsorted_ids) and\
+                np.array_equal(ids, self._unsorted_ids):
+            moved = np.flatnonzero(cell != self._cell)
+            if len(moved):
+                self._move(moved, cell)
+            self.positions = positions[self._order]
+            return bool(len(moved))
+
+        # Counting sort: tile counts give each bucket's offset and points
+        # within a bucket stay in input order
+        counts = np.bincount(cell, minlength=self.num_cells)
+        np.cumsum(counts, out=self.cell_start[1:])
+        self._order = _counting_order(cell, self.num_cells)
+        self._cell = cell
+        self._unsorted_ids = ids.copy()
+        self.ids = ids[self._order]
+        self.positions = positions[self._order]
+        return True
+
+    def _move(self, moved: np.ndarray, cell: np.ndarray):
+        # Re-bucket the points at (unsorted, ascending) indices 'moved' into
+        # their new tiles in 'cell'. The other points are still in order of
+        # (tile, index), so the moved ones are merged into them at the
+        # positions found by binary search rather than sorting everything
+        n = len(cell)
+        change = np.bincount(cell[moved], minlength=self.num_cells) -\
+            np.bincount(self._cell[moved], minlength=self.num_cells)
+        self.cell_start[1:] += np.cumsum(change)
+
+        stays = np.ones(n, dtype=bool)
+        stays[moved] = False
+        rest = self._order[stays[self._order]]
+        moved = moved[_counting_order(cell[moved], self.num_cells)]
+        at = np.searchsorted(cell[rest] * n + rest, cell[moved] * n + moved)
+        at += np.arange(len(moved))
+        inserted = np.zeros(n, dtype=bool)
+        inserted[at] = True
+        self._order = np.empty(n, dtype=np.intp)
+        self._order[at] = moved
+        self._order[~inserted] = rest
+        self._cell = cell
+        self.ids = self._unsorted_ids[self._order]
+
+    def build_population(self, population) -> bool:
+        # Index the living creatures of a CreaturePopulation by slot
+        slots = population.active
+        return self.build(population.position[slots], slots)
+
+    def first_in_tile(self, points: np.ndarray) -> np.ndarray:
+        # ID of the first point (lowest ID) in the tile under each of
+        # 'points' (N, 2), -1 for empty tiles
+        cell = self._cells(np.asarray(points, dtype=float).reshape(-1, 2))
+        start = self.cell_start[cell]
+        found = self.cell_start[cell + 1] > start
+        ids = np.full(len(cell), -1, dtype=np.intp)
+        ids[found] = self.ids[start[found]]
+        return ids
+
+    def query_radius(self, points: np.ndarray, radius: float,
+                     exclude=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # All (query, neighbour) pairs within 'radius' of each of 'points'
+        # (N, 2). Returns the query index, the neighbour ID and the distance,
+        # grouped by query. Pairs where the neighbour ID equals 'exclude'
+        # (N,) of the query are dropped, e.g. a creature finding itself
+        points = np.asarray(points, dtype=float)
+        tiles = self.grid.tile_idxs(points)
+        nx, ny = self.grid.tile_shape
+        dx, dy = abs(self.grid.dx), abs(self.grid.dy)
+        reach_x = int(np.ceil(radius / dx))
+        # Rows further away are at least (|di| - 1) dx from the point, so
+        # fewer of their tiles can be in reach
+        di = np.arange(-reach_x, reach_x + 1)
+        gap = np.maximum(np.abs(di) - 1, 0) * dx
+        reach_y = np.ceil(np.sqrt(np.maximum(radius**2 - gap**2, 0.)) /
+                          dy).astype(np.intp)
+
+        # The tiles in reach on one row are consecutive cells, so their
+        # points are one range of the sorted points: (query, row) ranges
+        rows = tiles[:, 0:1] + di
+        valid = (rows >= 0) & (rows < nx)
+        first = np.maximum(tiles[:, 1:2] - reach_y, 0)
+        last = np.minimum(tiles[:, 1:2] + reach_y, ny - 1)
+        rows = np.clip(rows, 0, nx - 1) * ny
+        starts = self.cell_start[rows + first]
+        counts = np.where(valid, self.cell_start[rows + last + 1] - starts, 0)
+        query = np.repeat(np.arange(len(points)), counts.sum(axis=1))
+        neighbour = _expand_ranges(starts.ravel(), counts.ravel())
+
+        offset = self.positions[neighbour] - points[query]
+        squared = np.einsum("ij,ij->i", offset, offset)
+        keep = squared <= radius**2
+        query, neighbour = query[keep], self.ids[neighbour[keep]]
+        distance = np.sqrt(squared[keep])
+        if exclude is not None:
+            keep = neighbour != np.asarray(exclude)[query]
+            query, neighbour, distance = query[keep], neighbour[keep],\
+                distance[keep]
+
+        return query, neighbour, distance
+
+    def query_knn(self, points: np.ndarray, k: int, radius: float,
+                  exclude=None) -> Tuple[np.ndarray, np.ndarray]:
+        # The 'k' nearest neighbour IDs (N, k) within 'radius' of each of
+        # 'points' and their distances, nearest first. Missing neighbours
+        # have ID -1 and distance inf
+        query, neighbour, distance = self.query_radius(points, radius,
+                                                       exclude=exclude)
+        order = np.lexsort((distance, query))
+        query, neighbour, distance = query[order], neighbour[order],\
+            distance[order]
+        first = _first_per_group(query)
+        rank = np.arange(len(query)) -\
+            np.repeat(first, np.diff(np.r_[first, len(query)]))
+        keep = rank < k
+
+        ids = np.full((len(points), k), -1, dtype=np.intp)
+        distances = np.full((len(points), k), np.inf)
+        ids[query[keep], rank[keep]] = neighbour[keep]
+        distances[query[keep], rank[keep]] = distance[keep]
+        return ids, distances
+
+
+def predation_matrix(species_table: List[Creature]) -> np.ndarray:
+    # Boolean (S, S) matrix, True where species 'i' hunts species 'j',
+    # from the prey lists on each Creature template. Prey are matched by
+    # species_key like CreaturePopulation.add_species, not by name
+    species_ids = {}
+    for i, creature in enumerate(species_table):
+        species_ids.setdefault(species_key(creature), []).append(i)
+    eats = np.zeros((len(species_table), len(species_table)), dtype=bool)
+    for i, creature in enumerate(species_table):
+        for prey in creature.prey:
+            eats[i, species_ids.get(species_key(prey), [])] = True
+
+    return eats
+
+
+def neighbour_pairs(population, index: SpatialHash, radius: float
+                    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (slot, neighbour slot, distance) of every pair of living creatures in
+    # a CreaturePopulation (indexed in 'index' by slot) within 'radius'.
+    # One query at the largest radius of a tick can be shared by every
+    # neighbour search of that tick, see within()
+    slots = population.active
+    query, neighbour, distance = index.query_radius(
+        population.position[slots], radius, exclude=slots)
+    return slots[query], neighbour, distance
+
+
+def within(pairs: Tuple[np.ndarray, np.ndarray, np.ndarray],
+           radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # The neighbour_pairs in 'pairs' within 'radius'
+    slot, neighbour, distance = pairs
+    keep = distance <= radius
+    return slot[keep], neighbour[keep], distance[keep]
+
+
+def nearest_predator(population, index: SpatialHash, radius: float,
+                     eats=None, pairs=None) -> Tuple[np.ndarray, np.ndarray]:
+    # Slot of the nearest living predator within 'radius' of every creature
+    # in a CreaturePopulation (indexed in 'index' by slot), -1 if none, and
+    # its distance. 'eats' is a predation matrix over the population's
+    # species IDs, built from the species templates if not given. 'pairs'
+    # from neighbour_pairs() at 'radius' or more saves querying 'index'
+    if eats is None:
+        eats = predation_matrix(population.species_table)
+    slot, neighbour, distance = neighbour_pairs(population, index, radius)\
+        if pairs is None else within(pairs, radius)
+    hunts = eats[population.species[neighbour], population.species[slot]]
+    slot, neighbour, distance = slot[hunts], neighbour[hunts], distance[hunts]
+
+    # Pairs are grouped by slot already
+    first = _nearest_per_group(slot, neighbour, distance)
+    predator = np.full(population.capacity, -1, dtype=np.intp)
+    predator_distance = np.full(population.capacity, np.inf)
+    predator[slot[first]] = neighbour[first]
+    predator_distance[slot[first]] = distance[first]
+    return predator, predator_distance
+
+
+def nearest_tile(grid: Grid, points: np.ndarray, tile_mask: np.ndarray,
+                 radius: float) -> Tuple[np.ndarray, np.ndarray]:
+    # Indices (N, 2) of the nearest tile where 'tile_mask' is True (e.g.
+    # food tiles with food left) within 'radius' of each of 'points', by
+    # distance to the tile centre, -1 if none. Also returns the distances
+    points = np.asarray(points, dtype=float)
+    tiles = grid.tile_idxs(points)
+    nx, ny = grid.tile_shape
+    reach_x = int(np.ceil(radius / abs(grid.dx)))
+    reach_y = int(np.ceil(radius / abs(grid.dy)))
+
+    best = np.full((len(points), 2), -1, dtype=np.intp)
+    best_distance = np.full(len(points), np.inf)
+    for di in range(-reach_x, reach_x + 1):
+        ci = np.clip(tiles[:, 0] + di, 0, nx - 1)
+        for dj in range(-reach_y, reach_y + 1):
+            cj = np.clip(tiles[:, 1] + dj, 0, ny - 1)
+            centre_x = grid.x[ci] + 0.5 * grid.dx
+            centre_y = grid.y[cj] + 0.5 * grid.dy
+            distance = np.hypot(centre_x - points[:, 0],
+                                centre_y - points[:, 1])
+            better = tile_mask[ci, cj] & (distance < best_distance) &\
+                (distance <= radius)
+            best[better, 0] = ci[better]
+            best[better, 1] = cj[better]
+            best_distance[better] = distance[better]
+
+    return best, best_distance
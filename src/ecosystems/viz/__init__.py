@@ -1,2 +1,8 @@
-from .color_utils import *
-from .pgv_nx import *
\ No newline at end of file
+from ecosystems._lazy import lazy_exports
+
+__getattr__, __dir__, __all__ = lazy_exports(__name__, {
+    "color_utils": ["tabcmapper"],
+    "grid_raster": ["GridRenderer", "plot_grid_raster"],
+    "grid_tile": ["plot_grid"],
+    "pgv_nx": ["visualize_taxonomy"],
+})
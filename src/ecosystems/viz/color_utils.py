@@ -1,7 +1,9 @@
 import matplotlib.colors as colors
 import matplotlib as mpl
 
-def tabcmapper(i: int, cmap=mpl.colormaps["tab20"], mod=19):
-    # Returns the i mod-(n-1)th color from cmap, only use with qualitative
-    # color maps
+def tabcmapper(i: int, cmap=None, mod=19):
+    # Returns the i mod-(n-1)th color from cmap (default "tab20"), only use
+    # with qualitative color maps
+    if cmap is None:
+        cmap = mpl.colormaps["tab20"]
     return colors.rgb2hex(cmap(i % mod), keep_alpha=True)
@@ -0,0 +1,99 @@
+# Raster rendering & blitted animation of a Grid and its creatures
+from matplotlib.animation import FuncAnimation
+from matplotlib.colors import BoundaryNorm, ListedColormap, to_rgba
+import matplotlib.pyplot as plt
+import numpy as np
+
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.tile import (BlankTile, FoodTile, RockTile,
+                                        TILE_CLASSES, WaterTile)
+from ecosystems.viz.color_utils import tabcmapper
+
+
+class GridRenderer:
+    # Draws the tile layer as one image (categorical colormap over tile
+    # codes, depleted food in its own colour) and creatures as one scatter
+    # coloured by species, so the cost doesn't grow with patches per tile.
+    # update() only pushes new data into those two artists
+    def __init__(self, grid: Grid, ax=None, tile_colors={
+        FoodTile: "green",
+        BlankTile: "white",
+        WaterTile: "royalblue",
+        RockTile: "dimgrey",
+    }, depleted_color="darkkhaki", creature_size=9.) -> None:
+        self.grid = grid
+        if ax is None:
+            _, ax = plt.subplots(1, 1)
+        self.ax = ax
+
+        # Display codes: tile codes in order, then depleted food
+        self.codes = sorted(TILE_CLASSES)
+        colors = [tile_colors.get(TILE_CLASSES[code], "lightgrey")
+                  for code in self.codes] + [depleted_color]
+        self._lookup = np.zeros(max(self.codes) + 1, dtype=np.int8)
+        self._lookup[self.codes] = np.arange(len(self.codes))
+        self._depleted = len(self.codes)
+        cmap = ListedColormap(colors)
+        norm = BoundaryNorm(np.arange(len(colors) + 1) - 0.5, cmap.N)
+
+        self._tiles = self._tile_image()
+        extent = (grid.x[0], grid.x[-1], grid.y[0], grid.y[-1])
+        self.image = ax.imshow(self._tiles.T, origin="lower", extent=extent,
+                               cmap=cmap, norm=norm, interpolation="nearest",
+                               aspect="auto", animated=True)
+        self.scatter = ax.scatter(np.empty(0), np.empty(0), s=creature_size,
+                                  edgecolors="none", animated=True)
+        self._species_colors = np.empty((0, 4))
+
+    def _tile_image(self) -> np.ndarray:
+        grid = self.grid
+        tiles = self._lookup[grid.tile_type]
+        tiles[(grid.tile_type == FoodTile.code) &
+              (grid.food_quantity <= 0.)] = self._depleted
+        return tiles
+
+    def _colors(self, species: np.ndarray) -> np.ndarray:
+        # RGBA per creature from its species ID
+        num_species = species.max() + 1 if len(species) else 0
+        while len(self._species_colors) < num_species:
+            self._species_colors = np.vstack([
+                self._species_colors,
+                to_rgba(tabcmapper(len(self._species_colors)))])
+        return self._species_colors[species]
+
+    def update(self, population=None):
+        # Refresh the tile image if any tile changed and the creature
+        # positions from a CreaturePopulation. Returns the animated artists
+        tiles = self._tile_image()
+        if not np.array_equal(tiles, self._tiles):
+            self._tiles = tiles
+            self.image.set_data(tiles.T)
+        if population is not None:
+            slots = population.active
+            self.scatter.set_offsets(population.position[slots])
+            self.scatter.set_facecolor(
+                self._colors(population.species[slots]))
+        return self.image, self.scatter
+
+    def animate(self, step, population=None, frames=None,
+                interval=50) -> FuncAnimation:
+        # Animate by calling 'step()' (one simulation tick) before each
+        # frame, redrawing with blitting. Keep a reference to the result
+        def frame(_):
+            step()
+            return self.update(population)
+
+        return FuncAnimation(self.ax.figure, frame, frames=frames,
+                             init_func=lambda: self.update(population),
+                             interval=interval, blit=True,
+                             cache_frame_data=False)
+
+
+def plot_grid_raster(grid: Grid, population=None, **kwargs):
+    # Raster version of plot_grid, optionally with creatures on top
+    renderer = GridRenderer(grid, **kwargs)
+    renderer.update(population)
+    # Artists are only drawn by the animation when animated, draw them here
+    renderer.image.set_animated(False)
+    renderer.scatter.set_animated(False)
+    return renderer.ax.figure, renderer.ax
@@ -0,0 +1,71 @@
+import numpy as np
+
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.carcass import CarcassPool
+from ecosystems.simulation.regrowth import DEPLETED, SPAWNED
+
+
+def pool(**kwargs) -> CarcassPool:
+    return CarcassPool(Grid(11, 11, 0., 10., 0., 10.), **kwargs)
+
+
+def test_freed_slots_are_reused_first():
+    carcasses = pool(capacity=4)
+    slots = carcasses.spawn(np.full((3, 2), 1.5), 10.)
+    np.testing.assert_array_equal(slots, [0, 1, 2])
+    carcasses.remove([2, 0])
+    # Last freed first
+    np.testing.assert_array_equal(carcasses.spawn([[2.5, 2.5]], 10.), [0])
+    np.testing.assert_array_equal(carcasses.spawn([[2.5, 2.5]] * 2, 10.),
+                                  [2, 3])
+    assert carcasses.capacity == 4
+    assert carcasses.stats()["grown"] == 0
+
+
+def test_growth_keeps_live_carcasses():
+    carcasses = pool(capacity=2)
+    rng = np.random.default_rng(0)
+    position = rng.random((2, 2)) * 10.
+    first = carcasses.spawn(position, [5., 7.], species=[1, 2])
+    carcasses.advance(3.)
+    more = carcasses.spawn(rng.random((5, 2)) * 10., 1.)
+
+    assert carcasses.capacity == 7
+    assert len(carcasses) == 7
+    assert len(np.intersect1d(first, more)) == 0
+    np.testing.assert_array_equal(carcasses.position[first], position)
+    np.testing.assert_array_equal(carcasses.meat[first], [5., 7.])
+    np.testing.assert_array_equal(carcasses.species[first], [1, 2])
+    np.testing.assert_array_equal(carcasses.decay[first], [97., 97.])
+    np.testing.assert_array_equal(carcasses.decay[more], 100.)
+
+
+def test_max_capacity_drops_the_rest():
+    carcasses = pool(capacity=2, max_capacity=3)
+    slots = carcasses.spawn(np.ones((5, 2)), 1.)
+    assert len(slots) == 3
+    assert carcasses.capacity == 3
+    assert carcasses.stats()["dropped"] == 2
+
+
+def test_decay_eating_and_statistics():
+    carcasses = pool(capacity=4, decay_time=10.)
+    carcasses.spawn([[0.5, 0.5], [0.6, 0.6], [5.5, 5.5]], [4., 4., 4.])
+    assert carcasses.drain_events()[0][0] == SPAWNED
+
+    # Served in order, the second eater gets what's left
+    slots = carcasses.on_tiles([[0.5, 0.5], [0.5, 0.5]])
+    np.testing.assert_array_equal(slots, [0, 0])
+    np.testing.assert_array_equal(carcasses.eat(slots, 3.), [3., 1.])
+    assert not carcasses.present[0]
+    # The tile still has carcass 1, so it isn't depleted yet
+    assert carcasses.drain_events() == []
+    np.testing.assert_array_equal(carcasses.on_tiles([[0.5, 0.5]]), [1])
+
+    assert carcasses.advance(10.) == 2
+    kinds = [kind for kind, _ in carcasses.drain_events()]
+    assert kinds == [DEPLETED]
+    assert carcasses.stats() == {
+        "capacity": 4, "initial_capacity": 4, "in_use": 0, "peak": 3,
+        "grown": 0, "spawned": 3, "decayed": 2, "eaten": 1, "dropped": 0}
+    np.testing.assert_array_equal(carcasses.on_tiles([[0.5, 0.5]]), [-1])
@@ -0,0 +1,59 @@
+import numpy as np
+
+from ecosystems.generation.chains import (
+    CHAIN_HEADER, NUM_STAGES, PROGRESSION_PATHS, generate_chain_arrays,
+    write_chain_csv)
+from ecosystems.generation.probability import Sampler
+
+
+TRAITS = {"affinity": ["Fire", "Water", "Earth", "Air"],
+          "family": ["Canine", "Feline", "Avian"]}
+
+
+def test_secondary_never_equals_primary():
+    chains = generate_chain_arrays(TRAITS, 5000, Sampler(0))
+    for primary, secondary in (("affinity1", "affinity2"),
+                               ("family1", "family2")):
+        assert chains[secondary].shape == (5000, NUM_STAGES)
+        assert np.all(chains[secondary] != chains[primary][:, None])
+        assert np.all(chains[secondary] < len(TRAITS[secondary[:-1]]))
+        # Once picked, a secondary is kept for the later stages
+        picked = chains[secondary][:, :-1] >= 0
+        assert np.all(chains[secondary][:, 1:][picked] ==
+                      chains[secondary][:, :-1][picked])
+    assert np.all(chains["family2"][:, 0] == -1)
+    assert np.any(chains["affinity2"] >= 0)
+    assert np.all(chains["progression_path"] < len(PROGRESSION_PATHS))
+
+
+def test_single_trait_has_no_secondary():
+    traits = {"affinity": ["Fire"], "family": ["Canine"]}
+    chains = generate_chain_arrays(traits, 10, Sampler(0))
+    assert np.all(chains["affinity2"] == -1)
+    assert np.all(chains["family2"] == -1)
+
+
+def test_csv_is_the_same_with_workers(tmp_path):
+    serial, parallel = tmp_path / "serial.csv", tmp_path / "parallel.csv"
+    write_chain_csv(TRAITS, 1050, serial, chunk_size=100, seed=7)
+    write_chain_csv(TRAITS, 1050, parallel, chunk_size=100, seed=7,
+                    num_workers=2)
+    text = serial.read_text(encoding="utf-8")
+    assert text == parallel.read_text(encoding="utf-8")
+
+    lines = text.splitlines()
+    assert lines[0] + "\n" == CHAIN_HEADER
+    assert len(lines) == 1 + 1050 * NUM_STAGES
+    rows = [line.split(",") for line in lines[1:]]
+    assert all(len(row) == 7 for row in rows)
+    assert [row[0] for row in rows[-3:]] == ["1049_1", "1049_2", "1049_3"]
+    assert [row[6] for row in rows[:3]] == ["", "0_1", "0_2"]
+    for _, family1, family2, affinity1, affinity2, path, _ in rows:
+        assert family1 != family2 and affinity1 != affinity2
+        assert path in PROGRESSION_PATHS
+
+
+def test_empty_csv_has_only_the_header(tmp_path):
+    output = tmp_path / "empty.csv"
+    write_chain_csv(TRAITS, 0, output)
+    assert output.read_text(encoding="utf-8") == CHAIN_HEADER
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid, TILE_LAYERS
+from ecosystems.generation.tile import FoodTile, RockTile, WaterTile
+from ecosystems.simulation.checkpoint import (load_snapshot, save_delta,
+                                              save_snapshot)
+from ecosystems.simulation.population import (CreaturePopulation,
+                                              POPULATION_FIELDS)
+
+SPECIES = [Creature(["Overgrown"], "Cow-like", "Natural",
+                    creature_name="Prey"),
+           Creature(["Overgrown"], "Canine", "Natural",
+                    creature_name="Hunter")]
+
+
+def world(rng: np.random.Generator):
+    grid = Grid(17, 13, 0., 16., 0., 12.)
+    grid.init_tiles(tile_type=FoodTile, mask=rng.random(grid.tile_shape) < .5)
+    population = CreaturePopulation(capacity=8)
+    for creature in SPECIES:
+        population.add_species(creature)
+    population.spawn(rng.integers(0, 2, 6), rng.random((6, 2)) * 12.)
+    return grid, population
+
+
+def mutate(grid: Grid, population: CreaturePopulation,
+           rng: np.random.Generator):
+    # Random tile edits, births (growing past the capacity) and deaths
+    for _ in range(rng.integers(1, 6)):
+        mask = rng.random(grid.tile_shape) < .1
+        tile = [FoodTile, RockTile, WaterTile][rng.integers(3)]
+        grid.init_tiles(tile_type=tile, mask=mask)
+    grid.food_quantity *= rng.random(grid.tile_shape).astype(np.float32)
+    n = int(rng.integers(0, 8))
+    population.spawn(rng.integers(0, 2, n), rng.random((n, 2)) * 12.)
+    active = population.active
+    population.kill(rng.choice(active, rng.integers(0, len(active) + 1),
+                               replace=False))
+    population.energy[population.active] -= 1.
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_delta_restores_the_state(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    grid, population = world(rng)
+    base = str(tmp_path / "base.snap")
+    save_snapshot(base, grid, population, rng=rng, tick=1)
+
+    for tick in range(2, 5):
+        mutate(grid, population, rng)
+        delta = str(tmp_path / f"delta{tick}.snap")
+        save_delta(delta, base, grid, population, rng=rng, tick=tick)
+
+        restored = load_snapshot(base, delta)
+        assert restored.tick == tick
+        for layer in TILE_LAYERS:
+            np.testing.assert_array_equal(getattr(restored.grid, layer),
+                                          getattr(grid, layer))
+        assert restored.population.capacity == population.capacity
+        for field in POPULATION_FIELDS:
+            np.testing.assert_array_equal(
+                getattr(restored.population, field),
+                getattr(population, field))
+        np.testing.assert_array_equal(restored.population.active,
+                                      population.active)
+        assert restored.rng.bit_generator.state == rng.bit_generator.state
+
+        # Both agree on where the next creatures go
+        position = np.zeros((3, 2))
+        slots = population.spawn(np.zeros(3, dtype=int), position)
+        np.testing.assert_array_equal(
+            restored.population.spawn(np.zeros(3, dtype=int), position),
+            slots)
+        population.kill(slots)
+
+
+def test_snapshot_grid_maps_the_file(tmp_path):
+    grid, population = world(np.random.default_rng(0))
+    path = str(tmp_path / "base.snap")
+    save_snapshot(path, grid, population)
+
+    restored = load_snapshot(path)
+    for layer in TILE_LAYERS:
+        assert isinstance(getattr(restored.grid, layer), np.memmap)
+        np.testing.assert_array_equal(getattr(restored.grid, layer),
+                                      getattr(grid, layer))
+    np.testing.assert_array_equal(restored.grid.x, grid.x)
+    np.testing.assert_array_equal(restored.grid.y, grid.y)
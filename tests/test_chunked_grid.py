@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.chunked_grid import ChunkedGrid
+from ecosystems.generation.grid import Grid, TILE_LAYERS
+from ecosystems.generation.tile import (BlankTile, FoodTile, RockTile,
+                                        WaterTile)
+
+TILES = [BlankTile, FoodTile, RockTile, WaterTile]
+
+
+def assert_same(chunked: ChunkedGrid, dense: Grid):
+    for name in TILE_LAYERS:
+        np.testing.assert_array_equal(getattr(chunked, name)[:, :],
+                                      getattr(dense, name))
+    for tile_class in TILES[1:]:
+        found = chunked.find_tiles(tile_class)
+        np.testing.assert_array_equal(
+            found[np.lexsort(found.T[::-1])],
+            np.argwhere(dense.tile_mask(tile_class)))
+    assert chunked.resident_chunks <= chunked.max_resident
+
+
+def random_window(rng: np.random.Generator, shape):
+    i0, j0 = rng.integers(0, shape[0]), rng.integers(0, shape[1])
+    nx = rng.integers(1, shape[0] - i0 + 1)
+    ny = rng.integers(1, shape[1] - j0 + 1)
+    return (i0, j0), (nx, ny)
+
+
+@pytest.mark.parametrize("max_resident", [1, 3, 64])
+@pytest.mark.parametrize("seed", range(3))
+def test_matches_a_dense_grid(seed, max_resident):
+    rng = np.random.default_rng(seed)
+    args = (43, 37, 0., 42., -5., 31.)
+    dense = Grid(*args)
+    with ChunkedGrid(*args, chunk_size=8,
+                     max_resident=max_resident) as chunked:
+        shape = dense.tile_shape
+        for _ in range(60):
+            action = rng.integers(6)
+            if action == 0:
+                # Scattered writes to one layer
+                name = list(TILE_LAYERS)[rng.integers(len(TILE_LAYERS))]
+                n = rng.integers(1, 40)
+                i, j = np.divmod(rng.choice(shape[0] * shape[1], n,
+                                            replace=False), shape[1])
+                value = rng.integers(0, 4, n).astype(TILE_LAYERS[name][0])
+                getattr(chunked, name)[i, j] = value
+                getattr(dense, name)[i, j] = value
+            elif action == 1:
+                # Bulk tiles under a mask in a window
+                origin, size = random_window(rng, shape)
+                mask = rng.random(size) < 0.5
+                tile = TILES[rng.integers(len(TILES))]
+                chunked.init_tiles(tile_type=tile, mask=mask, origin=origin)
+                full = np.zeros(shape, dtype=bool)
+                full[origin[0]:origin[0] + size[0],
+                     origin[1]:origin[1] + size[1]] = mask
+                dense.init_tiles(tile_type=tile, mask=full)
+            elif action == 2:
+                # Blank a window again, so whole chunks can be dropped
+                origin, size = random_window(rng, shape)
+                chunked.init_tiles(tile_type=BlankTile,
+                                   mask=np.ones(size, dtype=bool),
+                                   origin=origin)
+                full = np.zeros(shape, dtype=bool)
+                full[origin[0]:origin[0] + size[0],
+                     origin[1]:origin[1] + size[1]] = True
+                dense.init_tiles(tile_type=BlankTile, mask=full)
+            elif action == 3:
+                # Edit a dense window and write it back
+                origin, size = random_window(rng, shape)
+                window = chunked.to_grid(origin, size)
+                window.init_tiles(tile_type=WaterTile,
+                                  mask=rng.random(size) < 0.3)
+                chunked.write_grid(window, origin)
+                view = (slice(origin[0], origin[0] + size[0]),
+                        slice(origin[1], origin[1] + size[1]))
+                for name in TILE_LAYERS:
+                    getattr(dense, name)[view] = getattr(window, name)
+            elif action == 4:
+                chunked.flush()
+            else:
+                # Single tiles through the tile view
+                key = (int(rng.integers(shape[0])),
+                       int(rng.integers(shape[1])))
+                tile = TILES[rng.integers(len(TILES))]()
+                chunked.tile_data[key] = tile
+                dense.tile_data[key] = tile
+                assert type(chunked.tile_data[key]) is\
+                    type(dense.tile_data[key])
+
+            assert_same(chunked, dense)
+            points = rng.uniform([-2., -8.], [45., 34.], (50, 2))
+            np.testing.assert_array_equal(chunked.is_passable(points),
+                                          dense.is_passable(points))
+
+
+def test_coords_match_dense_grid():
+    chunked = ChunkedGrid(13, 9, -5., 7., 0., 4., chunk_size=4)
+    dense = Grid(13, 9, -5., 7., 0., 4.)
+    assert chunked.coords.shape == dense.coords.shape
+    np.testing.assert_array_equal(np.asarray(chunked.coords), dense.coords)
+    i, j = np.array([0, 12, 3]), np.array([[8], [0]])
+    for key in [(3, 4), (-1, 2), (slice(2, 9, 3), slice(None, 5)),
+                (i, j), (slice(1, 4), 7), (5, slice(None)), 2,
+                (i, -1)]:
+        np.testing.assert_array_equal(chunked.coords[key],
+                                      dense.coords[key])
+    assert chunked.resident_chunks == 0
@@ -0,0 +1,66 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from ecosystems.generation.config import (CACHE_FILE, CONFIG_FILES,
+                                          ConfigError, _configs,
+                                          load_config, validate_regions)
+
+RES_DIR = os.path.join(os.path.dirname(__file__), "..", "res")
+
+
+@pytest.fixture
+def res_dir(tmp_path):
+    for filename in CONFIG_FILES.values():
+        shutil.copy(os.path.join(RES_DIR, filename), tmp_path)
+    return str(tmp_path)
+
+
+def test_memo_reloads_changed_files(res_dir):
+    config = load_config(res_dir)
+    assert load_config(res_dir) is config
+
+    path = os.path.join(res_dir, CONFIG_FILES["regions"])
+    with open(path, encoding="utf-8") as infile:
+        data = json.load(infile)
+    data["region"].append({"name": "Crater", "affinities": []})
+    with open(path, "w", encoding="utf-8") as outfile:
+        json.dump(data, outfile)
+
+    reloaded = load_config(res_dir)
+    assert "Crater" in reloaded.regions
+    assert "Crater" not in config.regions
+    assert load_config(res_dir) is reloaded
+
+
+@pytest.mark.parametrize("regions", [
+    {"region": ["Beach"]},
+    {"region": [{"name": "Beach", "affinities": "Submerged"}]},
+    {"region": [{"name": "Beach"}]},
+    {"regions": []},
+    [],
+])
+def test_malformed_regions(regions):
+    with pytest.raises(ConfigError):
+        validate_regions(regions, ["Submerged"])
+
+
+@pytest.mark.parametrize("size", [0, 10, 0.5])
+def test_truncated_cache_is_rebuilt(res_dir, size):
+    config = load_config(res_dir)
+    cache_path = os.path.join(res_dir, CACHE_FILE)
+    with open(cache_path, "rb") as infile:
+        data = infile.read()
+    if isinstance(size, float):
+        size = int(len(data) * size)
+    with open(cache_path, "wb") as outfile:
+        outfile.write(data[:size])
+
+    _configs.clear()
+    reloaded = load_config(res_dir)
+    assert reloaded is not config
+    assert reloaded.regions == config.regions
+    with open(cache_path, "rb") as infile:
+        assert infile.read() == data
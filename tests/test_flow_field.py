@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.flow_field import FlowField
+
+
+@pytest.mark.parametrize("max_distance", [np.inf, 6.])
+@pytest.mark.parametrize("seed", range(3))
+def test_updates_match_a_recompute(seed, max_distance):
+    rng = np.random.default_rng(seed)
+    grid = Grid(31, 25, 0., 30., 0., 36.)
+    passable = rng.random(grid.tile_shape) > 0.25
+    sources = rng.random(grid.tile_shape) < 0.02
+    field = FlowField(grid, sources, passable, max_distance)
+
+    for _ in range(30):
+        tiles = rng.choice(passable.size, rng.integers(1, 6), replace=False)
+        if rng.random() < 0.5:
+            field.add_sources(tiles)
+        else:
+            field.remove_sources(np.flatnonzero(field.sources)[:len(tiles)]
+                                 if rng.random() < 0.5 else tiles)
+        direction = field.direction
+
+        fresh = FlowField(grid, field.sources, passable, max_distance)
+        np.testing.assert_allclose(field.distance, fresh.distance, rtol=1e-5)
+        reached = np.isfinite(field.distance)
+        assert (field.nearest[~reached] == -1).all()
+        assert field.sources.ravel()[field.nearest[reached]].all()
+        np.testing.assert_array_equal(direction, fresh.direction)
+        moving = reached & ~field.sources
+        assert np.abs(direction[moving]).sum(axis=1).all()
+        assert not np.abs(direction[~moving]).any()
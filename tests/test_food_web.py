@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.food_web import FoodWeb
+
+
+def check_against_edges(web: FoodWeb, edges):
+    # CSR lookups agree with a plain edge set
+    edges = set(map(tuple, edges))
+    n = web.num_species
+    assert web.num_edges == len(edges)
+    for i in range(n):
+        assert sorted(web.prey_of(i).tolist()) ==\
+            sorted(j for p, j in edges if p == i)
+        assert sorted(web.predators_of(i).tolist()) ==\
+            sorted(p for p, j in edges if j == i)
+    predators, prey = np.divmod(np.arange(n * n), n)
+    np.testing.assert_array_equal(
+        web.can_eat(predators, prey),
+        [(p, j) in edges for p, j in zip(predators, prey)])
+
+
+def test_csr_matches_edge_list():
+    rng = np.random.default_rng(0)
+    edges = rng.integers(0, 12, (60, 2))  # with duplicates and self-loops
+    web = FoodWeb([f"S{k}" for k in range(12)], edges)
+    check_against_edges(web, edges.tolist())
+    assert sorted(web.edges()) ==\
+        sorted({(f"S{p}", f"S{j}") for p, j in edges.tolist()})
+
+
+def test_edge_changes_rebuild_csr():
+    web = FoodWeb(list("ABCD"), [(0, 1), (1, 2)])
+    edges = {(0, 1), (1, 2)}
+    changes = []
+    web.listeners.append(lambda *change: changes.append(change))
+    version = web.version
+
+    assert web.add_edge(3, 0)
+    assert not web.add_edge(0, 1)
+    assert web.remove_edge(1, 2)
+    assert not web.remove_edge(2, 1)
+    edges = (edges | {(3, 0)}) - {(1, 2)}
+    check_against_edges(web, edges)
+    assert changes == [(3, 0, True), (1, 2, False)]
+    assert web.version == version + 2
+
+    assert web.add_edge(2, 2)
+    check_against_edges(web, edges | {(2, 2)})
+
+
+def test_empty_and_invalid_webs():
+    check_against_edges(FoodWeb(list("AB")), [])
+    with pytest.raises(ValueError):
+        FoodWeb(list("AA"))
+    with pytest.raises(ValueError):
+        FoodWeb(list("AB"), [(0, 2)])
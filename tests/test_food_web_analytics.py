@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.food_web import FoodWeb
+from ecosystems.generation.food_web_analytics import (FoodWebAnalytics,
+                                                      web_analytics)
+
+
+def test_trophic_levels_of_a_chain():
+    web = FoodWeb(["Apex", "Middle", "Prey", "Other"],
+                  [(0, 1), (0, 3), (1, 2), (3, 2)])
+    np.testing.assert_allclose(web_analytics(web).trophic_levels,
+                               [3., 2., 1., 2.])
+
+
+def test_no_trophic_level_without_a_way_down():
+    # A closed loop, and species feeding on one
+    web = FoodWeb(list("ABCDEF"),
+                  [(0, 1), (1, 2), (2, 0), (3, 0), (3, 5), (4, 5)])
+    levels = web_analytics(web).trophic_levels
+    assert np.isnan(levels[:4]).all()
+    np.testing.assert_allclose(levels[4:], [2., 1.])
+
+    # Every species has prey
+    web = FoodWeb(list("ABCD"), [(0, 1), (1, 2), (2, 3), (3, 0)])
+    analytics = web_analytics(web)
+    assert np.isnan(analytics.trophic_levels).all()
+    assert np.isnan(analytics.summary()["max_trophic_level"])
+
+
+def test_loops_with_a_way_down_have_levels():
+    # A & B eat each other, A also eats basal C
+    web = FoodWeb(list("ABC"), [(0, 1), (1, 0), (0, 2)])
+    np.testing.assert_allclose(web_analytics(web).trophic_levels,
+                               [4., 5., 1.])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_edge_changes_match_a_recompute(seed):
+    rng = np.random.default_rng(seed)
+    n = 8
+    web = FoodWeb([f"S{k}" for k in range(n)],
+                  rng.integers(0, n, (10, 2)))
+    analytics = web_analytics(web)
+    for _ in range(40):
+        # Read everything so the cached results are used & invalidated
+        analytics.trophic_levels
+        analytics.cycle_species
+        predator, prey = rng.integers(0, n, 2)
+        if rng.random() < 0.5:
+            web.add_edge(predator, prey)
+        else:
+            # Mostly an existing edge
+            if web.num_edges and rng.random() < 0.8:
+                k = rng.integers(web.num_edges)
+                predator, prey = web.predators[k], web.prey[k]
+            web.remove_edge(predator, prey)
+
+        assert web_analytics(web) is analytics
+        fresh = FoodWebAnalytics(web)
+        np.testing.assert_array_equal(analytics.generality,
+                                      fresh.generality)
+        np.testing.assert_array_equal(analytics.vulnerability,
+                                      fresh.vulnerability)
+        np.testing.assert_allclose(analytics.trophic_levels,
+                                   fresh.trophic_levels)
+        np.testing.assert_array_equal(analytics.cycle_species,
+                                      fresh.cycle_species)
+        assert analytics.has_cycles == fresh.has_cycles
+        assert analytics.summary() == pytest.approx(fresh.summary(),
+                                                    nan_ok=True)
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.chunked_grid import ChunkedGrid
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.tile import RockTile, WaterTile
+
+
+def painted(tile_type, grid_class=Grid):
+    grid = grid_class(11, 11, 0., 10., 0., 10.)
+    mask = np.zeros(grid.tile_shape, dtype=bool)
+    mask[2:5, 3:7] = True
+    if isinstance(tile_type, str):
+        codes = np.where(mask, RockTile.code, WaterTile.code)
+        grid.init_tiles(tile_type=codes, mask=np.ones_like(mask))
+    else:
+        grid.init_tiles(tile_type=tile_type, mask=mask)
+    return grid, mask
+
+
+@pytest.mark.parametrize("tile_type", [RockTile, RockTile(), RockTile.code,
+                                       "codes"])
+@pytest.mark.parametrize("grid_class", [Grid, ChunkedGrid])
+def test_bulk_rock_is_blocked(tile_type, grid_class):
+    grid, mask = painted(tile_type, grid_class)
+    tile_type = grid.tile_type[:, :]
+    assert (tile_type[mask] == RockTile.code).all()
+    assert not grid.passable[:, :][mask].any()
+    assert (grid.speed_multiplier[:, :][mask] == 0.).all()
+    # Tile (2, 3) covers [2, 3) x [3, 4)
+    assert not grid.is_passable(np.array([2.5, 3.5]))
+    assert grid.is_passable(np.array([0.5, 0.5]))
+
+
+@pytest.mark.parametrize("tile_type", [WaterTile, WaterTile.code])
+def test_bulk_water_is_slow(tile_type):
+    grid, mask = painted(tile_type)
+    assert grid.passable[mask].all()
+    assert (grid.speed_multiplier[mask] == 0.5).all()
+    assert (grid.speed_multiplier[~mask] == 1.).all()
+
+
+def test_bulk_codes_set_terrain_per_code():
+    grid, mask = painted("codes")
+    assert (grid.tile_type[~mask] == WaterTile.code).all()
+    assert grid.passable[~mask].all()
+    assert (grid.speed_multiplier[~mask] == 0.5).all()
+    assert not grid.passable[mask].any()
+
+
+def test_explicit_layers_override_code_terrain():
+    grid = Grid(5, 5)
+    grid.init_tiles(tile_type=RockTile, passable=True)
+    assert (grid.tile_type == RockTile.code).all()
+    assert grid.passable.all()
+
+
+def test_unknown_code_rejected():
+    with pytest.raises(ValueError):
+        Grid(5, 5).init_tiles(tile_type=99)
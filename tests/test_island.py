@@ -0,0 +1,51 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.region import Region
+from ecosystems.simulation.island import IslandSimulation, WorkerError
+from ecosystems.simulation.lod import RegionSimulation
+
+SPECIES = [Creature(["Overgrown"], "Cow-like", "Natural",
+                    creature_name="Prey")]
+
+
+class FailingRegion(RegionSimulation):
+    def step(self, dt=1.):
+        if self.tick >= 2:
+            raise RuntimeError("boom")
+        super().step(dt)
+
+
+def island(failing: str = None):
+    graph = nx.DiGraph()
+    regions = {}
+    for name in ("North", "South", "East"):
+        graph.add_node(Region(name, "Grassland", ["Overgrown"]))
+        region_class = FailingRegion if name == failing else RegionSimulation
+        regions[name] = region_class(
+            name, Grid(11, 11, 0., 10., 0., 10.), SPECIES,
+            np.zeros((1, 1), dtype=bool), [10.], on_screen=False, seed=1)
+    nodes = list(graph.nodes())
+    graph.add_edges_from([(a, b) for a in nodes for b in nodes if a is not b])
+    return graph, regions
+
+
+def test_workers_step_every_region():
+    graph, regions = island()
+    with IslandSimulation(graph, regions, num_workers=2) as simulation:
+        for _ in range(3):
+            simulation.step()
+    assert all(region.tick == 3 for region in simulation.regions.values())
+
+
+def test_worker_error_is_raised():
+    graph, regions = island(failing="South")
+    simulation = IslandSimulation(graph, regions, num_workers=2)
+    with pytest.raises(WorkerError, match="boom"):
+        with simulation:
+            for _ in range(5):
+                simulation.step()
+    assert not simulation._workers
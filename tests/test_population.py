@@ -0,0 +1,24 @@
+from ecosystems.generation.creature import Creature
+from ecosystems.simulation.population import CreaturePopulation
+
+
+def test_unnamed_creatures_keep_their_species():
+    cow = Creature(["Toxic", "Overgrown"], "Cow-like", "Natural", speed=2)
+    cat = Creature(["Glacial", "Frozen"], "Feline", "Evolved", speed=3)
+    population = CreaturePopulation.from_creatures([cow, cat, cow])
+    assert len(population.species_table) == 2
+    creatures = population.to_creatures()
+    assert [c.family for c in creatures] == ["Cow-like", "Feline",
+                                             "Cow-like"]
+    assert creatures[1].affinities == ["Glacial", "Frozen"]
+    assert creatures[1].progression_path == "Evolved"
+    assert [c.speed for c in creatures] == [2, 3, 2]
+
+
+def test_same_species_shares_an_id():
+    population = CreaturePopulation()
+    first = population.add_species(Creature(["Toxic"], "Cow-like", "Natural",
+                                            creature_name="Moo"))
+    again = population.add_species(Creature(["Toxic"], "Cow-like",
+                                            "Natural", creature_name="Moo"))
+    assert first == again == population.species_id("Moo")
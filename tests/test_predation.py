@@ -0,0 +1,63 @@
+import numpy as np
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.population import (CreaturePopulation, DEAD,
+                                              EATING, HUNTING)
+from ecosystems.simulation.predation import resolve_hunts
+from ecosystems.simulation.spatial import SpatialHash
+
+
+def setup(positions, species, eats, health=100.):
+    grid = Grid(21, 21, 0., 20., 0., 20.)
+    population = CreaturePopulation()
+    for k in range(len(eats)):
+        population.add_species(Creature(["Overgrown"], "Canine", "Natural",
+                                        creature_name=f"Species {k}"))
+    slots = population.spawn(np.asarray(species), np.asarray(positions,
+                                                             dtype=float))
+    population.state[slots] = HUNTING
+    population.health[slots] = health
+    population.hunger[slots] = 10.
+    index = SpatialHash(grid)
+    index.build_population(population)
+    return population, index, slots
+
+
+def test_closest_hunter_wins_contested_prey():
+    eats = np.array([[False, True], [False, False]])
+    population, index, (far, prey, near) = setup(
+        [[5., 5.], [5.8, 5.], [6.2, 5.]], [0, 1, 0], eats)
+    result = resolve_hunts(population, index, eats, damage=10.)
+    assert result.hunters.tolist() == [near]
+    assert result.prey.tolist() == [prey]
+    assert not len(result.killed)
+    assert population.health[prey] == 90.
+
+
+def test_mutual_kills_feed_nobody():
+    # Two species that hunt each other, both one bite from death
+    eats = np.array([[False, True], [True, False]])
+    population, index, (a, b) = setup([[5., 5.], [5.5, 5.]], [0, 1], eats,
+                                      health=10.)
+    result = resolve_hunts(population, index, eats, damage=40.,
+                           carcass_meat=50., meal=10.)
+    assert sorted(result.killed.tolist()) == [a, b]
+    assert not population.alive[[a, b]].any()
+    assert (population.state[[a, b]] == DEAD).all()
+    assert (population.hunger[[a, b]] == 10.).all()
+    # Nobody ate, both carcasses are whole
+    assert (result.meat == 50.).all()
+
+
+def test_killer_eats_and_leaves_the_rest():
+    eats = np.array([[False, True], [False, False]])
+    population, index, (hunter, prey) = setup([[5., 5.], [5.5, 5.]], [0, 1],
+                                              eats, health=10.)
+    result = resolve_hunts(population, index, eats, damage=40.,
+                           carcass_meat=50., meal=10., food_value=5.)
+    assert result.killed.tolist() == [prey]
+    assert result.killers.tolist() == [hunter]
+    assert population.state[hunter] == EATING
+    assert population.hunger[hunter] == 60.
+    assert result.meat.tolist() == [40.]
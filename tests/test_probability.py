@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.probability import AliasTable, Sampler
+
+
+@pytest.mark.parametrize("weights", [
+    [1., 1., 1., 1.],
+    [5., 1., 0.5, 3.5],
+    [0., 2., 0., 1., 7., 0.],
+    [1e-3, 1., 1e3],
+])
+def test_alias_sampling_matches_the_weights(weights):
+    weights = np.array(weights)
+    table = AliasTable(weights)
+    draws = table.sample(np.random.default_rng(0), 200_000)
+    frequency = np.bincount(draws, minlength=len(weights)) / len(draws)
+    np.testing.assert_allclose(frequency, weights / weights.sum(),
+                               atol=5e-3)
+
+
+def test_zero_weights_are_never_drawn():
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        weights = rng.random(rng.integers(2, 30))
+        weights[rng.random(len(weights)) < 0.5] = 0.
+        weights[rng.integers(len(weights))] += 0.1
+        draws = AliasTable(weights).sample(rng, 5000)
+        assert (weights[draws] > 0.).all()
+
+
+def test_spawn_is_deterministic_per_key():
+    sampler = Sampler(42)
+    first = sampler.spawn("Beach").rng.random(5)
+    np.testing.assert_array_equal(Sampler(42).spawn("Beach").rng.random(5),
+                                  first)
+    # Drawing from the parent doesn't change the children
+    sampler.rng.random(100)
+    np.testing.assert_array_equal(sampler.spawn("Beach").rng.random(5),
+                                  first)
+    assert not np.array_equal(sampler.spawn("Jungle").rng.random(5), first)
+    assert not np.array_equal(Sampler(43).spawn("Beach").rng.random(5), first)
+    # Nested streams depend on the whole path
+    assert not np.array_equal(
+        sampler.spawn("Beach").spawn("Jungle").rng.random(5),
+        sampler.spawn("Jungle").rng.random(5))
+
+
+def test_weighted_randint_range_and_batches():
+    sampler = Sampler(0)
+    draws = sampler.weighted_randint(2, 6, size=10_000)
+    assert draws.min() == 2 and draws.max() == 6
+    counts = np.bincount(draws - 2)
+    assert (np.diff(counts) < 0).all()
+    assert isinstance(sampler.weighted_randint(2, 6), int)
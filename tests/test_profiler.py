@@ -0,0 +1,51 @@
+import csv
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.lod import RegionSimulation
+from ecosystems.simulation.profiler import TickProfiler
+
+SPECIES = [Creature(["Overgrown"], "Cow-like", "Natural",
+                    creature_name="Prey")]
+
+
+def test_phases_and_counters():
+    profiler = TickProfiler()
+    for _ in range(3):
+        with profiler.tick():
+            with profiler.phase("needs"):
+                pass
+            profiler.count("creatures", 5)
+    snapshot = profiler.snapshot()
+    assert snapshot["ticks"] == 3
+    assert snapshot["phases"]["needs"]["calls"] == 3
+    assert snapshot["counters"] == {"creatures": 15}
+
+
+@pytest.mark.parametrize("extension", [".json", ".csv"])
+def test_periodic_dumps_are_named_by_region(tmp_path, extension):
+    path = str(tmp_path / f"profile{extension}")
+    regions = [RegionSimulation(name, Grid(11, 11, 0., 10., 0., 10.),
+                                SPECIES, np.zeros((1, 1), dtype=bool), [5.], on_screen=True,
+                                profiler=TickProfiler(dump_path=path,
+                                                      dump_every=2))
+               for name in ("Beach", "Jungle")]
+    for region in regions:
+        for _ in range(2):
+            region.step()
+
+    for name in ("Beach", "Jungle"):
+        dumped = str(tmp_path / f"profile.{name}{extension}")
+        assert os.path.exists(dumped)
+        with open(dumped, encoding="utf-8") as infile:
+            if extension == ".json":
+                assert list(json.load(infile)) == [name]
+            else:
+                assert {row["region"] for row in csv.DictReader(infile)} ==\
+                    {name}
+    assert not os.path.exists(path)
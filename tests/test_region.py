@@ -0,0 +1,83 @@
+import numpy as np
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.tile import RockTile, WaterTile
+from ecosystems.simulation.lod import RegionSimulation
+from ecosystems.simulation.population import NEED_FIELDS, TRAIT_FIELDS
+
+SPECIES = [Creature(["Overgrown"], "Cow-like", "Natural",
+                    creature_name="Prey"),
+           Creature(["Overgrown"], "Canine", "Natural",
+                    creature_name="Hunter")]
+EATS = np.array([[False, False], [True, False]])
+
+
+def region(grid: Grid) -> RegionSimulation:
+    return RegionSimulation("Test", grid, SPECIES, EATS, [0., 0.],
+                            on_screen=True, seed=1)
+
+
+def immigrants(n: int):
+    values = np.full((n, len(NEED_FIELDS + TRAIT_FIELDS)), 100.,
+                     dtype=np.float32)
+    return np.zeros(n, dtype=np.int32), values
+
+
+def test_immigrants_avoid_blocked_edge_tiles():
+    grid = Grid(21, 21, 0., 20., 0., 20.)
+    edge = np.zeros(grid.tile_shape, dtype=bool)
+    edge[[0, -1], :] = True
+    edge[:, [0, -1]] = True
+    # Only a few edge tiles are open
+    blocked = edge.copy()
+    blocked[0, 5:8] = False
+    grid.init_tiles(tile_type=RockTile, mask=blocked)
+    sim = region(grid)
+    sim.immigrate(*immigrants(200))
+
+    tiles = grid.tile_idxs(sim.population.position[sim.population.active])
+    assert len(tiles) == 200
+    assert grid.passable[tiles[:, 0], tiles[:, 1]].all()
+    assert edge[tiles[:, 0], tiles[:, 1]].all()
+
+
+def test_immigrants_fall_back_to_open_tiles():
+    grid = Grid(21, 21, 0., 20., 0., 20.)
+    edge = np.zeros(grid.tile_shape, dtype=bool)
+    edge[[0, -1], :] = True
+    edge[:, [0, -1]] = True
+    grid.init_tiles(tile_type=RockTile, mask=edge)
+    grid.init_tiles(tile_type=WaterTile, mask=~edge)
+    grid.init_tiles(speed_multiplier=0., mask=~edge & (np.arange(20) < 10))
+    sim = region(grid)
+    sim.immigrate(*immigrants(200))
+
+    tiles = grid.tile_idxs(sim.population.position[sim.population.active])
+    assert grid.passable[tiles[:, 0], tiles[:, 1]].all()
+    assert (grid.speed_multiplier[tiles[:, 0], tiles[:, 1]] > 0.).all()
+
+
+def test_promote_demote_round_trip():
+    sim = RegionSimulation("Test", Grid(21, 21, 0., 20., 0., 20.), SPECIES,
+                           EATS, [3.6, 2.6], on_screen=False, seed=1)
+    sim.promote()
+    assert sim.population.counts().sum() == 6
+    np.testing.assert_allclose(sim.counts(), [3.6, 2.6])
+    sim.demote()
+    np.testing.assert_allclose(sim.aggregate.counts, [3.6, 2.6])
+    assert not len(sim.population.active)
+
+
+def test_demote_after_a_rounded_up_species_dies_out():
+    sim = RegionSimulation("Test", Grid(21, 21, 0., 20., 0., 20.), SPECIES,
+                           EATS, [0.6, 0.6], on_screen=True, seed=1)
+    # One creature for the two fractions, the rounded up species dies out
+    np.testing.assert_array_equal(sim.population.counts(), [1, 0])
+    sim.population.kill(sim.population.active)
+    np.testing.assert_allclose(sim.counts(), [0., 0.6])
+
+    sim.demote()
+    np.testing.assert_allclose(sim.aggregate.counts, [0., 0.6])
+    sim.emigrate(0.5)
+    assert (sim.aggregate.counts >= 0.).all()
@@ -0,0 +1,81 @@
+import numpy as np
+
+from ecosystems.generation.grid import Grid
+from ecosystems.generation.tile import FoodTile
+from ecosystems.simulation.regrowth import (
+    DEPLETED, REGROWN, RegrowthScheduler, SpawnArea, serve_in_order)
+
+
+def test_serve_in_order_matches_loop():
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, 5, 40)
+    amount = rng.integers(0, 4, 40).astype(np.float32)
+    available = rng.integers(0, 10, 5).astype(np.float32)
+
+    expected, left = [], available.copy()
+    for key, want in zip(keys, amount):
+        got = min(want, max(left[key], 0.))
+        left[key] -= got
+        expected.append(got)
+
+    taken = serve_in_order(keys, amount, available)
+    np.testing.assert_array_equal(taken, expected)
+    np.testing.assert_array_equal(available, left)
+
+
+def test_regrowth_matches_per_tick_loop():
+    rng = np.random.default_rng(1)
+    grid = Grid(9, 9)
+    shape = grid.tile_shape
+    grid.init_tiles(tile_type=FoodTile,
+                    regrowth_time=rng.integers(0, 6, shape),
+                    food_capacity=rng.integers(1, 5, shape).astype(float))
+    grid.food_quantity[rng.random(shape) < 0.3] = 0.
+    capacity = grid.food_capacity.ravel().copy()
+    regrowth_time = np.maximum(grid.regrowth_time.ravel(), 1)
+
+    # Naive model, a countdown per tile ticked every step
+    quantity = grid.food_quantity.ravel().copy()
+    timer = np.where(quantity <= 0., regrowth_time, 0)
+    scheduler = RegrowthScheduler(grid, rng=np.random.default_rng(2))
+
+    for _ in range(40):
+        tiles = rng.integers(0, quantity.size, 30)
+        amount = rng.integers(1, 3, 30).astype(np.float32)
+        expected, depleted = [], set()
+        for tile, want in zip(tiles, amount):
+            got = min(want, quantity[tile])
+            quantity[tile] -= got
+            expected.append(got)
+            if got and quantity[tile] <= 0.:
+                timer[tile] = regrowth_time[tile]
+                depleted.add(tile)
+        eaten = scheduler.consume(tiles, amount)
+        np.testing.assert_array_equal(eaten, expected)
+
+        waiting = timer > 0
+        timer[waiting] -= 1
+        regrown = np.flatnonzero(waiting & (timer == 0))
+        quantity[regrown] = capacity[regrown]
+        assert scheduler.advance() == len(regrown)
+
+        events = scheduler.drain_events()
+        changed = {kind: [] for kind in (DEPLETED, REGROWN)}
+        for kind, tiles in events:
+            changed[kind].extend(tiles.tolist())
+        assert sorted(changed[DEPLETED]) == sorted(depleted)
+        assert sorted(changed[REGROWN]) == regrown.tolist()
+        np.testing.assert_array_equal(grid.food_quantity.ravel(), quantity)
+        assert len(scheduler) == np.count_nonzero(timer)
+
+
+def test_spawn_area_stops_at_max_food():
+    grid = Grid(9, 9)
+    area = SpawnArea((0, 4), (0, 4), max_food=5, spawn_chance=1.,
+                     batch_size=2, quantity=3.)
+    scheduler = RegrowthScheduler(grid, [area], np.random.default_rng(0))
+    scheduler.advance(10)
+
+    assert np.count_nonzero(grid.tile_mask(FoodTile)) == 5
+    assert np.count_nonzero(grid.tile_mask(FoodTile)[:4, :4]) == 5
+    assert np.all(grid.food_quantity[grid.tile_mask(FoodTile)] == 3.)
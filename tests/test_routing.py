@@ -0,0 +1,58 @@
+import networkx as nx
+import numpy as np
+import pytest
+
+from ecosystems.generation.region import Region
+from ecosystems.simulation.routing import IslandRouter
+
+AFFINITIES = ["Submerged", "Overgrown", "Frozen"]
+
+
+def random_island(rng: np.random.Generator, n=12) -> nx.DiGraph:
+    graph = nx.DiGraph()
+    regions = [Region(f"R{k}", "Grassland",
+                      list(rng.choice(AFFINITIES, rng.integers(0, 3))))
+               for k in range(n)]
+    graph.add_nodes_from(regions)
+    for _ in range(3 * n):
+        a, b = rng.choice(n, 2, replace=False)
+        graph.add_edge(regions[a], regions[b], weight=int(rng.integers(1, 5)))
+    return graph
+
+
+def open_subgraph(island: nx.DiGraph, router: IslandRouter) -> nx.DiGraph:
+    graph = nx.DiGraph()
+    graph.add_nodes_from(island.nodes())
+    graph.add_edges_from(
+        (a, b, data) for a, b, data in island.edges(data=True)
+        if router.is_open(str(a), str(b)))
+    return graph
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_edge_changes_match_a_recompute(seed):
+    rng = np.random.default_rng(seed)
+    island = random_island(rng)
+    edges = [(str(a), str(b)) for a, b in island.edges()]
+    router = IslandRouter(island)
+
+    for _ in range(40):
+        source, destination = edges[rng.integers(len(edges))]
+        router.set_edge(source, destination, bool(rng.random() < 0.4))
+
+        fresh = IslandRouter(open_subgraph(island, router))
+        np.testing.assert_array_equal(router.distance, fresh.distance)
+        np.testing.assert_array_equal(router.nearest_distance,
+                                      fresh.nearest_distance)
+        # Following the next hops takes a shortest route over open edges
+        for i in range(len(router.names)):
+            for j in range(len(router.names)):
+                route = router.route(router.names[i], router.names[j])
+                if not np.isfinite(router.distance[i, j]):
+                    assert route == []
+                    continue
+                cost = sum(router.weights[router.ids[a], router.ids[b]]
+                           for a, b in zip(route, route[1:]))
+                assert all(router.is_open(a, b)
+                           for a, b in zip(route, route[1:]))
+                assert cost == router.distance[i, j]
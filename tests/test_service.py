@@ -0,0 +1,49 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.lod import RegionSimulation
+from ecosystems.simulation.service import SimulationHost
+
+SPECIES = [Creature(["Overgrown"], "Cow-like", "Natural",
+                    creature_name="Prey")]
+
+
+def region(name: str) -> RegionSimulation:
+    return RegionSimulation(name, Grid(11, 11, 0., 10., 0., 10.), SPECIES,
+                            np.zeros((1, 1), dtype=bool), [0.],
+                            on_screen=False, seed=1)
+
+
+def test_queries():
+    host = SimulationHost({"North": region("North")})
+    assert host.query({"query": "nope"}) == {"error": "Unknown query 'nope'"}
+    assert host.query({"query": "counts"}) == {"error": "Missing 'region'"}
+    assert host.query({"query": "counts", "region": "South"}) ==\
+        {"error": "Unknown region 'South'"}
+    assert host.query({"query": "counts", "region": "North"}) ==\
+        {"result": {}}
+    assert host.query({"query": "regions"})["result"][0]["region"] == "North"
+
+
+def test_failed_step_cancels_the_other_regions():
+    host = SimulationHost({"North": region("North"), "South": region("South")},
+                          tick_seconds=0.01)
+
+    def fail(region):
+        raise RuntimeError("boom")
+
+    host.submit("South", fail)
+
+    async def main():
+        with pytest.raises(RuntimeError, match="boom"):
+            await asyncio.wait_for(host.run(), 5.)
+        others = [task for task in asyncio.all_tasks()
+                  if task is not asyncio.current_task()]
+        assert not others
+        await host.close()
+
+    asyncio.run(main())
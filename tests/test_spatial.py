@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+
+from ecosystems.generation.creature import Creature
+from ecosystems.generation.grid import Grid
+from ecosystems.simulation.population import CreaturePopulation, HUNTING
+from ecosystems.simulation.predation import nearest_prey
+from ecosystems.simulation.spatial import (nearest_predator, neighbour_pairs,
+                                           predation_matrix, SpatialHash)
+
+
+def brute_force(positions, ids, points, radius):
+    pairs = set()
+    for q, point in enumerate(points):
+        distance = np.hypot(*(positions - point).T)
+        pairs.update((q, ids[k]) for k in np.flatnonzero(distance <= radius))
+    return pairs
+
+
+def assert_same_index(index: SpatialHash, fresh: SpatialHash):
+    np.testing.assert_array_equal(index.cell_start, fresh.cell_start)
+    np.testing.assert_array_equal(index.ids, fresh.ids)
+    np.testing.assert_array_equal(index.positions, fresh.positions)
+
+
+# The large grid has more tiles than fit in 16 bits
+@pytest.mark.parametrize("num", [21, 301])
+def test_moves_match_a_rebuild(num):
+    rng = np.random.default_rng(num)
+    grid = Grid(num, num, 0., 100., 0., 100.)
+    positions = rng.random((500, 2)) * 100.
+    ids = np.sort(rng.choice(5000, 500, replace=False))
+    index = SpatialHash(grid)
+    assert index.build(positions, ids)
+
+    for _ in range(20):
+        # Move a random subset, some by a little (mostly staying in their
+        # tile), some anywhere
+        moving = rng.random(len(positions)) < 0.2
+        positions = positions.copy()
+        positions[moving] += rng.normal(0., 1., (moving.sum(), 2))
+        jumping = rng.random(len(positions)) < 0.02
+        positions[jumping] = rng.random((jumping.sum(), 2)) * 100.
+        index.build(positions, ids)
+
+        fresh = SpatialHash(grid)
+        fresh.build(positions, ids)
+        assert_same_index(index, fresh)
+
+        points = rng.random((30, 2)) * 100.
+        query, neighbour, _ = index.query_radius(points, 7.)
+        assert set(zip(query.tolist(), neighbour.tolist())) ==\
+            brute_force(positions, ids, points, 7.)
+
+
+def test_unmoved_points_are_not_rebucketed():
+    grid = Grid(21, 21, 0., 100., 0., 100.)
+    positions = np.random.default_rng(0).random((100, 2)) * 100.
+    index = SpatialHash(grid)
+    assert index.build(positions)
+    assert not index.build(positions + 1e-6)
+    np.testing.assert_array_equal(
+        index.positions[np.argsort(index.ids)], positions + 1e-6)
+
+
+def test_predation_matrix_keeps_unnamed_species_apart():
+    cow = Creature(["Overgrown"], "Cow-like", "Natural")
+    feline = Creature(["Toxic"], "Feline", "Natural", prey=[cow])
+    assert cow.name == feline.name
+    np.testing.assert_array_equal(predation_matrix([cow, feline]),
+                                  [[False, False], [True, False]])
+
+    # Prey given as equal templates rather than the same object
+    population = CreaturePopulation(capacity=4)
+    for creature in (Creature(["Overgrown"], "Cow-like", "Natural"),
+                     Creature(["Toxic"], "Feline", "Natural",
+                              prey=[Creature(["Overgrown"], "Cow-like",
+                                             "Natural")])):
+        population.add_species(creature)
+    np.testing.assert_array_equal(
+        predation_matrix(population.species_table),
+        [[False, False], [True, False]])
+
+
+@pytest.mark.parametrize("radius", [0.3, 2.5, 11.])
+def test_query_radius_on_uneven_tiles(radius):
+    rng = np.random.default_rng(3)
+    grid = Grid(17, 41, 0., 16., -20., 0.)
+    positions = rng.uniform([0., -20.], [16., 0.], (300, 2))
+    index = SpatialHash(grid)
+    index.build(positions)
+    points = rng.uniform([-2., -22.], [18., 2.], (40, 2))
+    query, neighbour, distance = index.query_radius(points, radius)
+    assert set(zip(query.tolist(), neighbour.tolist())) ==\
+        brute_force(positions, np.arange(300), points, radius)
+    np.testing.assert_allclose(
+        distance, np.hypot(*(positions[neighbour] - points[query]).T))
+
+
+def test_shared_pairs_find_the_same_predators_and_prey():
+    rng = np.random.default_rng(4)
+    cow = Creature(["Overgrown"], "Cow-like", "Natural",
+                   creature_name="Cow")
+    wolf = Creature(["Overgrown"], "Canine", "Natural", creature_name="Wolf",
+                    prey=[cow])
+    population = CreaturePopulation(capacity=8)
+    for creature in (cow, wolf):
+        population.add_species(creature)
+    population.spawn(rng.integers(0, 2, 300), rng.random((300, 2)) * 40.)
+    population.kill(rng.choice(300, 50, replace=False))
+    population.state[population.active] = HUNTING
+    grid = Grid(41, 41, 0., 40., 0., 40.)
+    index = SpatialHash(grid)
+    index.build_population(population)
+    eats = predation_matrix(population.species_table)
+    pairs = neighbour_pairs(population, index, 6.)
+
+    # Brute force nearest predator, the lowest slot on ties
+    slots = population.active
+    position = population.position
+    species = population.species
+    expected = np.full(population.capacity, -1)
+    for slot in slots:
+        distance = np.hypot(*(position[slots] - position[slot]).T)
+        candidates = [(d, other) for d, other in zip(distance, slots)
+                      if other != slot and d <= 4. and
+                      eats[species[other], species[slot]]]
+        if candidates:
+            expected[slot] = min(candidates)[1]
+    for shared in (None, pairs):
+        predator, _ = nearest_predator(population, index, 4., eats,
+                                       pairs=shared)
+        np.testing.assert_array_equal(predator, expected)
+
+    prey, _ = nearest_prey(population, index, 5., eats)
+    np.testing.assert_array_equal(
+        nearest_prey(population, index, 5., eats, pairs=pairs)[0], prey)
+    assert (prey[slots] >= 0).any()